@@ -0,0 +1,104 @@
+import threading  # Pour protéger le cache partagé entre sessions
+from collections import OrderedDict  # Pour l'éviction LRU
+
+import numpy as np  # Pour la similarité cosinus
+
+
+class SemanticAnswerCache:
+    """
+    Cache sémantique des réponses du chatbot.
+    Une réponse est réutilisée lorsque la nouvelle question a récupéré exactement les mêmes
+    documents et que son embedding est à une similarité cosinus d'au moins `threshold`
+    d'une question déjà traitée. Les entrées sont regroupées par ensemble de documents :
+    seule la comparaison des embeddings d'un même groupe est nécessaire.
+    Args:
+        threshold (float): Similarité cosinus minimale pour servir une réponse en cache.
+        max_entries (int): Nombre maximal de réponses conservées (éviction LRU).
+    """
+
+    def __init__(self, threshold=0.95, max_entries=256):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries = OrderedDict()  # {(documents, n°): (embedding normalisé, réponse)}
+        self._groups = {}  # {documents: [clés d'entrées]}
+        self._counter = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "stale": 0}
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        group = self._groups.get(key[0])
+        if group is not None:
+            group.remove(key)
+            if not group:
+                del self._groups[key[0]]
+
+    def lookup(self, embedding, doc_ids):
+        """
+        Cherche une réponse pour une question proche ayant récupéré les mêmes documents.
+        Args:
+            embedding (list): Embedding de la question.
+            doc_ids (iterable): Identifiants des documents récupérés.
+        Returns:
+            str | None: La réponse en cache, ou None.
+        """
+        documents = frozenset(doc_ids)
+        vector = self._unit(embedding)
+        with self._lock:
+            keys = self._groups.get(documents, [])
+            if keys:
+                similarities = np.stack([self._entries[key][0] for key in keys]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self._stats["hits"] += 1
+                    return self._entries[keys[best]][1]
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, embedding, doc_ids, answer, generation=None):
+        """
+        Met une réponse en cache.
+        Args:
+            embedding (list): Embedding de la question.
+            doc_ids (iterable): Identifiants des documents récupérés.
+            answer (str): La réponse générée.
+            generation (int, optionnel): Valeur de `generation` lue avant la recherche des documents ;
+                si le cache a été invalidé depuis, la réponse (construite sur un contexte périmé) est ignorée.
+        """
+        documents = frozenset(doc_ids)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                self._stats["stale"] += 1
+                return
+            self._counter += 1
+            key = (documents, self._counter)
+            self._entries[key] = (self._unit(embedding), answer)
+            self._groups.setdefault(documents, []).append(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self):
+        # À appeler lorsque la base vectorielle change : les réponses peuvent citer des documents périmés
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self.generation += 1
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["generation"] = self.generation
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
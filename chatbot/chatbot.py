@@ -1,9 +1,8 @@
 import streamlit as st  # Pour créer l'interface utilisateur web
-from openai import OpenAI  # Pour l'intégration avec l'API OpenAI
 import pandas as pd  # Pour la manipulation des données
-from langchain.vectorstores import Chroma  # Pour la base de données vectorielle
-from langchain.embeddings import OpenAIEmbeddings  # Pour la création d'embeddings
-import os  # Pour les opérations sur le système de fichiers
+from chatbot.resources import ChatbotResources  # Pour les ressources partagées du chatbot
+from chatbot.context_builder import DEFAULT_CONTEXT_TOKENS, ContextBuilder, count_tokens  # Pour le contexte sous budget de jetons
+from utils.utils import get_data_reloader  # Pour le rechargement à chaud des données
 
 # Configuration du style CSS pour l'interface utilisateur
 st.markdown("""
@@ -20,6 +19,22 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_chatbot_resources():
+    # Ressources lourdes (données, clients, base vectorielle) créées une seule fois par processus
+    resources = ChatbotResources(
+        api_key=st.secrets["OPENAI_API_KEY"],
+        on_invalid=lambda title: st.warning(f"Erreur lors de la préparation du document pour {title}: date invalide")
+    )
+    # Rechargement à chaud des données : la base vectorielle reçoit le delta de chaque génération publiée
+    # (la recherche hybride et le routeur sont reconstruits avec la génération, voir `ChatbotResources`) ;
+    # abonnement nommé : des ressources recréées remplacent les précédentes au lieu de s'y ajouter
+    get_data_reloader().subscribe(resources.sync_vectorstore_delta, name="chatbot.vectorstore")
+    return resources
+
+# Avertissement ajouté à une réponse dont la génération a été interrompue
+INTERRUPTED_NOTICE = "\n\n⚠️ *Réponse interrompue : la génération a échoué. Posez à nouveau votre question.*"
+
 class MovieChatbot:
     @staticmethod
     def initialize_session_state():
@@ -58,130 +73,109 @@ class MovieChatbot:
                 }
             ]
 
-    def __init__(self):
+    # Nombre de rapports de taille de prompt conservés par session
+    PROMPT_REPORTS = 50
+
+    def __init__(self, stream=True, client=None, resources=None, context_tokens=DEFAULT_CONTEXT_TOKENS):
         try:
-            # Initialisation de l'état de session en premier
+            # Initialisation de l'état de session en premier (propre à chaque session)
             self.initialize_session_state()
-            
-            # Configuration des clients API
-            self.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])  # Client pour l'API OpenAI
-            self.embeddings = OpenAIEmbeddings(openai_api_key=st.secrets["OPENAI_API_KEY"])  # Configuration des embeddings
-            
-            # Chargement des fichiers CSV contenant les données des films
-            self.films = pd.read_csv("csv/films_def.csv")  # Données principales des films
-            self.intervenants = pd.read_csv("csv/intervenants_def.csv")  # Données des acteurs/réalisateurs
-            self.lien = pd.read_csv("csv/lien_def.csv")  # Liens entre films et intervenants
-            
-            # Création ou chargement de la base de données vectorielle
-            self.vectorstore = self._create_or_load_vectorstore()
+            self.stream = stream  # Affichage progressif des réponses
+            self._client = client  # Client local injecté (voir chatbot.fake_client), sinon client partagé
+            self.stream_interrupted = False  # Vrai si la dernière réponse en streaming a été interrompue
+            self.context_builder = ContextBuilder(budget_tokens=context_tokens)  # Contexte des films borné en jetons
+
+            # Ressources partagées, créées paresseusement au premier usage
+            self.resources = resources or get_chatbot_resources()
+
+            # Vérification peu coûteuse, sans appel à l'API d'embedding
+            self.status = self.resources.health()
+            if not self.status["api_key"]:
+                st.warning("Clé API OpenAI manquante : le chatbot ne pourra pas répondre.")
                 
         except Exception as e:
             st.error(f"Erreur d'initialisation du chatbot: {str(e)}")
 
-    def _create_or_load_vectorstore(self):
-        persist_directory = "./chroma_db"  # Répertoire de stockage de la base vectorielle
-        
-        # Création du répertoire s'il n'existe pas
-        if not os.path.exists(persist_directory):
-            os.makedirs(persist_directory)
-            
-        try:
-            # Tentative de chargement d'une base existante
-            vectorstore = Chroma(
-                persist_directory=persist_directory,
-                embedding_function=self.embeddings
-            )
-            vectorstore.similarity_search("test", k=1)  # Test de fonctionnement
-            return vectorstore
-            
-        except Exception:
-            # Création d'une nouvelle base si le chargement échoue
-            documents = self._prepare_movie_documents()  # Préparation des documents
-            vectorstore = Chroma.from_texts(
-                texts=[doc["content"] for doc in documents],
-                metadatas=[doc["metadata"] for doc in documents],
-                embedding_function=self.embeddings,
-                persist_directory=persist_directory
-            )
-            vectorstore.persist()  # Sauvegarde de la base
-            return vectorstore
-    
+    @property
+    def client(self):
+        return self._client or self.resources.client
+
+    @property
+    def embeddings(self):
+        return self.resources.embeddings
+
+    @property
+    def query_embeddings(self):
+        return self.resources.query_embeddings
+
+    @property
+    def answer_cache(self):
+        return self.resources.answer_cache
+
+    @property
+    def vectorstore(self):
+        return self.resources.vectorstore
+
+    @property
+    def retriever(self):
+        return self.resources.retriever
+
+    @property
+    def router(self):
+        return self.resources.router
+
+    def _embed_query(self, text):
+        # Embedding de la requête utilisateur, calculé seulement s'il n'est pas déjà en cache
+        return self.query_embeddings.get_or_compute(text, lambda query: self.embeddings.embed_documents([query])[0])
+
+    def _vector_search(self, embedding, k, where):
+        # Recherche des films similaires dans la base vectorielle (identifiants seulement)
+        movies = self.vectorstore.similarity_search_by_vector(embedding, k=k, filter=where)
+        return [movie.metadata.get("tconst") for movie in movies]
+
     def _prepare_movie_documents(self):
-        documents = []  # Liste pour stocker les documents préparés
-        for _, movie in self.films.iterrows():
-            try:
-                # Extraction et validation de l'année du film
-                year = int(movie['release_date'][:4]) if pd.notna(movie['release_date']) else 0
-                
-                # Filtrage des films après 2000
-                if year > 2000:
-                    continue
-                    
-                # Formatage du titre avec style HTML
-                title = f"**<span style='color: pink'>{movie['title']}</span>**"
-                
-                # Construction du contenu du document avec toutes les informations
-                content = f"Titre: {title}\n"  # Titre du film
-                content += f"📅 Année: {year if year != 0 else 'Non disponible'}\n"  # Année
-                content += f"🎭 Genre: {movie['genres'] if pd.notna(movie['genres']) else 'Non spécifié'}\n"  # Genre
-                content += f"⭐ Note: {movie['averageRating'] if pd.notna(movie['averageRating']) else 'Non disponible'}/10\n"  # Note
-                content += f"📝 Synopsis: {movie['overview'] if pd.notna(movie['overview']) else 'Non disponible'}\n"  # Synopsis
-                
-                # Récupération et ajout des acteurs
-                movie_actors = self.lien[
-                    (self.lien['tconst'] == movie['tconst']) & 
-                    (self.lien['category'] == 'actor')
-                ]
-                actors = self.intervenants[
-                    self.intervenants['nconst'].isin(movie_actors['nconst'])
-                ]
-                content += f"🎬 Acteurs: {', '.join(actors['primaryName'])}\n"
-                
-                # Ajout du lien vers la bande-annonce si disponible
-                if pd.notna(movie['trailer_link']):
-                    content += f"🎥 Bande-annonce: [Regarder le trailer]({movie['trailer_link']})\n"
-                    if pd.notna(movie['langue_trailer']):
-                        content += f"🌍 Langue du trailer: {movie['langue_trailer']}\n"
-                
-                # Ajout du tagline si disponible
-                if pd.notna(movie['tagline']) and movie['tagline'] != '':
-                    content += f"💫 Tagline: {movie['tagline']}\n"
-                
-                # Création du document avec métadonnées
-                documents.append({
-                    "content": content,
-                    "metadata": {  # Métadonnées pour la recherche
-                        "tconst": movie['tconst'],
-                        "year": year,
-                        "title": movie['title'],
-                        "genres": movie['genres'] if pd.notna(movie['genres']) else '',
-                        "rating": float(movie['averageRating']) if pd.notna(movie['averageRating']) else 0.0,
-                        "trailer_link": movie['trailer_link'] if pd.notna(movie['trailer_link']) else '',
-                        "langue_trailer": movie['langue_trailer'] if pd.notna(movie['langue_trailer']) else ''
-                    }
-                })
-            except Exception as e:
-                st.warning(f"Erreur lors de la préparation du document pour {movie['title']}: {str(e)}")
-                continue
-                
-        return documents
+        # Liste complète des documents préparés (tous les lots)
+        return [doc for batch in self.resources.iter_movie_document_batches() for doc in batch]
 
-    def get_response(self, user_input: str) -> str:
+    def get_response(self, user_input: str, stream: bool = False):
+        """
+        Génère la réponse du chatbot à une question.
+        Args:
+            user_input (str): Question de l'utilisateur.
+            stream (bool): Si vrai, retourne un itérateur de fragments de texte au fil de la génération.
+        Returns:
+            str | Iterator[str]: La réponse complète, ou ses fragments en mode streaming.
+        """
         try:
-            # Création de l'embedding pour la requête utilisateur
-            embedding_response = self.embeddings.embed_documents([user_input])[0]
-            
-            # Recherche des films similaires dans la base vectorielle
-            similar_movies = self.vectorstore.similarity_search_by_vector(
-                embedding_response, 
+            # Questions factuelles (réalisateur, films d'un acteur, meilleurs films d'un genre ou d'une époque) :
+            # réponse directe depuis les index du catalogue, sans embedding ni appel au modèle
+            routed_answer = self.router.answer(user_input)
+            if routed_answer is not None:
+                return iter([routed_answer]) if stream else routed_answer
+
+            # Génération du cache lue avant la recherche : une réponse construite sur des documents
+            # récupérés avant une synchronisation de la base vectorielle n'est pas mise en cache
+            cache_generation = self.answer_cache.generation
+
+            # Recherche hybride : filtres (année, genre, note) tirés de la question, BM25 local
+            # et recherche vectorielle fusionnés ; si l'embedding tarde, BM25 seul
+            similar_movies, embedding_response, _ = self.retriever.retrieve(
+                user_input,
                 k=10,  # Nombre de résultats à retourner
-                filter={"year": {"$lte": 2000}}  # Filtre pour les films avant 2000
+                embed=self._embed_query,
+                vector_search=self._vector_search
             )
             
-            # Préparation du contexte pour la réponse
-            context = "Information sur les films disponibles:\n"
-            for movie in similar_movies:
-                context += f"\n---\n{movie.page_content}\n"
+            # Réponse déjà générée pour une question proche ayant récupéré les mêmes films
+            doc_ids = [movie["metadata"].get("tconst") for movie in similar_movies]
+            if embedding_response is not None:
+                cached_answer = self.answer_cache.lookup(embedding_response, doc_ids)
+                if cached_answer is not None:
+                    return iter([cached_answer]) if stream else cached_answer
+
+            # Préparation du contexte pour la réponse : documents par ordre de pertinence,
+            # raccourcis puis écartés (les moins pertinents d'abord) pour tenir dans le budget de jetons
+            context, prompt_report = self.context_builder.build(similar_movies)
             
             # Configuration du prompt système
             system_prompt = """Tu es CineBot, un assistant cinéma passionné 🎬. 
@@ -209,7 +203,12 @@ class MovieChatbot:
                 {"role": "system", "content": system_prompt.format(context=context)},
                 {"role": "user", "content": user_input}
             ]
+            self._record_prompt(prompt_report, messages)
             
+            # En mode streaming, les fragments sont transmis dès leur réception
+            if stream:
+                return self._stream_answer(messages, embedding_response, doc_ids, cache_generation)
+
             # Appel à l'API OpenAI pour générer la réponse
             response = self.client.chat.completions.create(
                 model="gpt-3.5-turbo",
@@ -218,12 +217,69 @@ class MovieChatbot:
                 max_tokens=800  # Longueur maximale de la réponse
             )
             
-            return response.choices[0].message.content
+            answer = response.choices[0].message.content
+            if embedding_response is not None:
+                self.answer_cache.store(embedding_response, doc_ids, answer, cache_generation)
+            return answer
 
         except Exception as e:
-            error_message = f"Désolé, une erreur s'est produite: {str(e)}"
-            st.error(error_message)
-            return "Je suis désolé, je ne peux pas répondre pour le moment. 😔"
+            fallback = self._report_error(e)
+            return iter([fallback]) if stream else fallback
+
+    def _record_prompt(self, report, messages):
+        # Taille du prompt envoyé (jetons), conservée dans la session pour suivi
+        report["prompt_tokens"] = sum(count_tokens(message["content"]) for message in messages)
+        self.last_prompt_report = report
+        reports = st.session_state.setdefault("prompt_reports", [])
+        reports.append(report)
+        del reports[:-self.PROMPT_REPORTS]
+
+    @staticmethod
+    def _report_error(error):
+        error_message = f"Désolé, une erreur s'est produite: {str(error)}"
+        st.error(error_message)
+        return "Je suis désolé, je ne peux pas répondre pour le moment. 😔"
+
+    def _stream_answer(self, messages, embedding_response, doc_ids, cache_generation=None):
+        # Générateur des fragments de la réponse ; la réponse complète est mise en cache à la fin
+        parts = []
+        try:
+            stream = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=messages,
+                temperature=0.7,  # Contrôle de la créativité
+                max_tokens=800,  # Longueur maximale de la réponse
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        except Exception as e:
+            fallback = self._report_error(e)
+            if not parts:
+                yield fallback
+            else:
+                # Réponse tronquée : signalée à l'utilisateur, ni mise en cache ni conservée comme complète
+                self.stream_interrupted = True
+                yield INTERRUPTED_NOTICE
+            return
+        if embedding_response is not None:
+            self.answer_cache.store(embedding_response, doc_ids, "".join(parts), cache_generation)
+
+    @staticmethod
+    def render_stream(chunks):
+        """
+        Affiche les fragments d'une réponse au fur et à mesure et retourne le texte complet.
+        """
+        placeholder = st.empty()
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            placeholder.markdown(text + "▌", unsafe_allow_html=True)
+        placeholder.markdown(text, unsafe_allow_html=True)
+        return text
 
     def display(self):
         try:
@@ -242,9 +298,17 @@ class MovieChatbot:
 
                     # Génération et affichage de la réponse
                     with st.chat_message("assistant"):
-                        response = self.get_response(prompt)
-                        st.markdown(response, unsafe_allow_html=True)
-                        st.session_state.messages.append({"role": "assistant", "content": response})
+                        self.stream_interrupted = False
+                        if self.stream:
+                            # Rendu progressif : le premier fragment s'affiche dès sa génération
+                            response = self.render_stream(self.get_response(prompt, stream=True))
+                        else:
+                            response = self.get_response(prompt)
+                            st.markdown(response, unsafe_allow_html=True)
+                        message = {"role": "assistant", "content": response}
+                        if self.stream_interrupted:
+                            message["interrupted"] = True  # Réponse partielle, avec l'avertissement affiché
+                        st.session_state.messages.append(message)
                         
         except Exception as e:
             st.error(f"Erreur d'affichage du chat: {str(e)}")
@@ -0,0 +1,181 @@
+import functools  # Pour le chargement unique de l'encodeur
+import re  # Pour le découpage approximatif en jetons
+
+# Budget par défaut (jetons) du contexte des films dans le prompt système
+DEFAULT_CONTEXT_TOKENS = 1500
+
+# Valeurs de remplissage des documents : le champ n'apporte rien au modèle
+EMPTY_VALUES = {"", "Non disponible", "Non disponible/10", "Non spécifié", "nan", "nan/10", "None"}
+
+# Libellés des champs des documents (voir `chatbot.documents`)
+FIELDS = ("Titre", "📅 Année", "🎭 Genre", "⭐ Note", "📝 Synopsis", "🎬 Acteurs",
+          "🎥 Bande-annonce", "🌍 Langue du trailer", "💫 Tagline")
+
+# Niveaux de détail successifs : (mots du synopsis, acteurs, champs conservés) ; None = pas de limite
+LEVELS = [
+    (None, None, None),
+    (60, 6, None),
+    (30, 3, ("Titre", "📅 Année", "🎭 Genre", "⭐ Note", "📝 Synopsis", "🎬 Acteurs", "🎥 Bande-annonce")),
+    (0, 0, ("Titre", "📅 Année", "🎭 Genre", "⭐ Note")),
+]
+
+# Champs regroupés en tête du contexte lorsque tous les films ont la même valeur
+SHARED_FIELDS = ("🌍 Langue du trailer",)
+
+PIECE = re.compile(r"\w+|[^\w\s]")
+
+
+@functools.lru_cache(maxsize=4)
+def _encoding(model):
+    try:
+        import tiktoken  # Import différé : décompte exact des jetons (dépendance de langchain/openai)
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Nombre de jetons du texte pour le modèle (tiktoken), ou estimation par mots
+    et ponctuation si tiktoken n'est pas installé.
+    """
+    encoding = _encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    pieces = PIECE.findall(text)
+    return sum(1 + len(piece) // 6 for piece in pieces)
+
+
+def parse_fields(content):
+    """
+    Découpe le texte d'un document (voir `chatbot.documents`) en champs (libellé, valeur), dans l'ordre.
+    Les lignes sans libellé connu (synopsis sur plusieurs lignes) complètent le champ précédent.
+    """
+    fields = []
+    for line in content.splitlines():
+        label, separator, value = line.partition(": ")
+        if separator and label.strip() in FIELDS:
+            fields.append((label.strip(), value.strip()))
+        elif line.strip() and fields:
+            fields[-1] = (fields[-1][0], f"{fields[-1][1]} {line.strip()}".strip())
+        elif line.strip():
+            fields.append(("", line.strip()))
+    return fields
+
+
+def _truncate_words(text, limit):
+    words = text.split()
+    return text if limit is None or len(words) <= limit else " ".join(words[:limit]) + " …"
+
+
+def _unique_names(cast):
+    # Noms d'acteurs dédupliqués, dans l'ordre
+    return list(dict.fromkeys(name.strip() for name in cast.split(",") if name.strip()))
+
+
+def render_document(fields, level, shared=()):
+    """
+    Rend un document au niveau de détail `level` (voir `LEVELS`), sans les champs vides
+    ni les champs regroupés en tête du contexte.
+    """
+    synopsis_words, actors, kept = LEVELS[level]
+    lines = []
+    for label, value in fields:
+        if value in EMPTY_VALUES or label in shared or (kept is not None and label not in kept):
+            continue
+        if label == "📝 Synopsis":
+            if synopsis_words == 0:
+                continue
+            value = _truncate_words(value, synopsis_words)
+        elif label == "🎬 Acteurs":
+            names = _unique_names(value)
+            if actors == 0 or not names:
+                continue
+            value = ", ".join(names[:actors]) + (" …" if actors is not None and len(names) > actors else "")
+        elif label == "💫 Tagline" and any(l == "📝 Synopsis" and value in v for l, v in fields):
+            continue  # Tagline reprise dans le synopsis
+        lines.append(f"{label}: {value}" if label else value)
+    return "\n".join(lines)
+
+
+# :blue_book: Construction du contexte sous budget de jetons
+class ContextBuilder:
+    """
+    Assemble le contexte des films du prompt système dans un budget de jetons.
+    Les documents sont pris par ordre de pertinence ; tant que le contexte dépasse le budget,
+    les documents passent un à un, du moins pertinent au plus pertinent, au niveau de détail suivant
+    (synopsis et distribution raccourcis, puis champs secondaires retirés) ; en dernier recours,
+    les documents les moins pertinents sont écartés. Les champs vides, les documents en double
+    et les valeurs communes à tous les films ne sont écrits qu'une fois.
+    Args:
+        budget_tokens (int): Budget de jetons du contexte.
+        model (str): Modèle utilisé pour le décompte des jetons.
+        header (str): En-tête du contexte.
+    """
+
+    def __init__(self, budget_tokens=DEFAULT_CONTEXT_TOKENS, model="gpt-3.5-turbo",
+                 header="Information sur les films disponibles:"):
+        self.budget_tokens = budget_tokens
+        self.model = model
+        self.header = header
+
+    def build(self, documents):
+        """
+        Args:
+            documents (list): Documents {"content": str, "metadata": dict}, du plus au moins pertinent.
+        Returns:
+            tuple: (contexte, rapport) ; le rapport donne les jetons du contexte, le budget,
+                le nombre de documents retenus et écartés et le niveau de détail de chacun.
+        """
+        seen, parsed = set(), []
+        for document in documents:
+            key = document.get("metadata", {}).get("tconst") or document["content"]
+            if key not in seen:
+                seen.add(key)
+                parsed.append(parse_fields(document["content"]))
+        duplicates = len(documents) - len(parsed)
+
+        # Valeurs identiques pour tous les films : écrites une seule fois en tête
+        shared = {}
+        for label in SHARED_FIELDS:
+            values = {dict(fields).get(label) for fields in parsed}
+            if len(parsed) > 1 and len(values) == 1 and None not in values and values != {""}:
+                shared[label] = values.pop()
+        header = "\n".join([self.header] + [f"{label} (tous les films): {value}" for label, value in shared.items()])
+
+        renders = [[None] * len(LEVELS) for _ in parsed]
+        costs = [[None] * len(LEVELS) for _ in parsed]
+
+        def cost(i, level):
+            if costs[i][level] is None:
+                renders[i][level] = f"\n---\n{render_document(parsed[i], level, shared)}\n"
+                costs[i][level] = count_tokens(renders[i][level], self.model)
+            return costs[i][level]
+
+        levels = [0] * len(parsed)
+        kept = len(parsed)
+        header_cost = count_tokens(header, self.model)
+        total = header_cost + sum(cost(i, 0) for i in range(kept))
+        while total > self.budget_tokens and kept:
+            # Parmi les documents les plus détaillés, le moins pertinent perd un niveau de détail
+            reducible = [i for i in range(kept) if levels[i] < len(LEVELS) - 1]
+            if reducible:
+                i = min(reducible, key=lambda i: (levels[i], -i))
+                total += cost(i, levels[i] + 1) - cost(i, levels[i])
+                levels[i] += 1
+            else:
+                kept -= 1
+                total -= cost(kept, levels[kept])
+        context = header + "".join(renders[i][levels[i]] or "" for i in range(kept))
+        report = {
+            "context_tokens": count_tokens(context, self.model),
+            "budget_tokens": self.budget_tokens,
+            "documents": kept,
+            "dropped": len(parsed) - kept,
+            "duplicates": duplicates,
+            "levels": levels[:kept],
+        }
+        return context, report
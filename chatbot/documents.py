@@ -0,0 +1,98 @@
+import pandas as pd  # Pour la manipulation des données
+from utils.compact import exact_float64  # Pour les notes stockées en float32
+
+# Année maximale des films indexés par le chatbot
+MAX_YEAR = 2000
+
+
+def actor_names_by_film(intervenants, lien):
+    # Jointure unique lien × intervenants : liste des noms d'acteurs pour chaque tconst
+    # Identifiants en chaînes : jointure et regroupement limités aux valeurs présentes (pas aux catégories)
+    actor_links = lien.loc[lien['category'] == 'actor', ['tconst', 'nconst']].astype(str).drop_duplicates()
+    people = intervenants[['nconst', 'primaryName']].astype({'nconst': str}).assign(person_order=range(len(intervenants)))
+    actors = actor_links.merge(people, on='nconst', how='inner')
+    # Les noms suivent l'ordre de la table des intervenants, comme le filtrage `isin` d'origine
+    actors = actors.sort_values(['tconst', 'person_order'], kind='stable')
+    return actors.groupby('tconst', sort=False)['primaryName'].agg(lambda names: ', '.join(names.astype(str)))
+
+
+def _with_years(films, max_year):
+    # Extraction vectorisée de l'année ; les dates illisibles sont signalées et ignorées
+    release_date = films['release_date']
+    years = pd.to_numeric(release_date.astype(str).str[:4], errors='coerce')
+    invalid = release_date.notna() & years.isna()
+    years = years.fillna(0).astype(int)
+    keep = ~invalid & (years <= max_year)
+    return films.loc[keep].assign(_year=years[keep]), films.loc[invalid, 'title']
+
+
+def _document_contents(batch, actors):
+    # Assemblage colonne par colonne du texte des documents
+    year = batch['_year'].astype(str).where(batch['_year'] != 0, 'Non disponible')
+    genres = batch['genres'].astype(str).where(batch['genres'].notna(), 'Non spécifié')
+    rating = batch['averageRating'].astype(str).where(batch['averageRating'].notna(), 'Non disponible')
+    overview = batch['overview'].astype(str).where(batch['overview'].notna(), 'Non disponible')
+    has_trailer = batch['trailer_link'].notna()
+    trailer = ("🎥 Bande-annonce: [Regarder le trailer](" + batch['trailer_link'].astype(str) + ")\n").where(has_trailer, '')
+    language = ("🌍 Langue du trailer: " + batch['langue_trailer'].astype(str) + "\n").where(
+        has_trailer & batch['langue_trailer'].notna(), '')
+    has_tagline = batch['tagline'].notna() & (batch['tagline'] != '')
+    tagline = ("💫 Tagline: " + batch['tagline'].astype(str) + "\n").where(has_tagline, '')
+    return (
+        "Titre: **<span style='color: pink'>" + batch['title'].astype(str) + "</span>**\n"
+        + "📅 Année: " + year + "\n"
+        + "🎭 Genre: " + genres + "\n"
+        + "⭐ Note: " + rating + "/10\n"
+        + "📝 Synopsis: " + overview + "\n"
+        + "🎬 Acteurs: " + batch['tconst'].astype(str).map(actors).fillna('') + "\n"
+        + trailer + language + tagline
+    )
+
+
+def _document_metadatas(batch):
+    # Métadonnées construites à partir des colonnes, sans itérer sur les lignes du DataFrame
+    return [
+        {
+            "tconst": tconst,
+            "year": year,
+            "title": title,
+            "genres": genres,
+            "rating": rating,
+            "trailer_link": trailer_link,
+            "langue_trailer": langue_trailer,
+        }
+        for tconst, year, title, genres, rating, trailer_link, langue_trailer in zip(
+            batch['tconst'].astype(str).tolist(),
+            batch['_year'].tolist(),
+            batch['title'].tolist(),
+            batch['genres'].astype(object).fillna('').tolist(),
+            exact_float64(batch['averageRating']).fillna(0.0).tolist(),
+            batch['trailer_link'].fillna('').tolist(),
+            batch['langue_trailer'].astype(object).fillna('').tolist(),
+        )
+    ]
+
+
+def iter_movie_document_batches(films, intervenants, lien, batch_size=500, max_year=MAX_YEAR, on_invalid=None):
+    """
+    Construit les documents de la base vectorielle (un par film jusqu'à `max_year`) et les produit par lots.
+    Les acteurs sont joints une seule fois pour tout le catalogue ; le texte et les métadonnées
+    sont assemblés colonne par colonne.
+    Args:
+        films, intervenants, lien (pd.DataFrame): Les trois tables du catalogue.
+        batch_size (int): Nombre de documents par lot.
+        max_year (int): Année maximale des films retenus.
+        on_invalid (callable, optionnel): Appelé avec le titre de chaque film dont la date est illisible.
+    Yields:
+        list: Lots de documents {"content": str, "metadata": dict}.
+    """
+    actors = actor_names_by_film(intervenants, lien)
+    kept, invalid_titles = _with_years(films, max_year)
+    if on_invalid is not None:
+        for title in invalid_titles.tolist():
+            on_invalid(title)
+    for start in range(0, len(kept), batch_size):
+        batch = kept.iloc[start:start + batch_size]
+        contents = _document_contents(batch, actors).tolist()
+        metadatas = _document_metadatas(batch)
+        yield [{"content": content, "metadata": metadata} for content, metadata in zip(contents, metadatas)]
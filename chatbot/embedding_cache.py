@@ -0,0 +1,127 @@
+import hashlib  # Pour les clés du cache
+import os  # Pour les opérations sur le système de fichiers
+import re  # Pour la normalisation des espaces
+import sqlite3  # Pour le cache disque partagé entre processus
+import threading  # Pour protéger le cache mémoire entre sessions
+import time  # Pour la durée de vie des entrées
+import unicodedata  # Pour la normalisation Unicode
+from collections import OrderedDict  # Pour l'éviction LRU
+
+import numpy as np  # Pour la sérialisation compacte des vecteurs
+
+# Emplacement par défaut du cache disque des embeddings de requêtes
+DEFAULT_CACHE_PATH = "cache/query_embeddings.sqlite3"
+
+
+def normalize_query(text):
+    # Deux questions équivalentes (casse, espaces, forme Unicode) partagent la même entrée
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Cache à deux niveaux des embeddings de requêtes utilisateur.
+    - Niveau 1 : LRU en mémoire, borné en nombre d'entrées, partagé par les sessions du processus.
+    - Niveau 2 : base SQLite sur disque avec durée de vie (TTL), partagée entre processus.
+    Les deux niveaux exposent leurs compteurs de succès et d'échecs via `stats()`.
+    Args:
+        path (str): Chemin de la base SQLite (None pour désactiver le niveau disque).
+        max_entries (int): Taille maximale du LRU en mémoire.
+        ttl (float): Durée de vie des entrées disque, en secondes.
+        namespace (str): Préfixe des clés (par exemple le nom du modèle d'embedding).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=1024, ttl=7 * 24 * 3600, namespace="default"):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.namespace = namespace
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "memory_misses": 0, "disk_hits": 0, "disk_misses": 0, "evictions": 0}
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._connect() as connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, created REAL)"
+                )
+
+    def _connect(self):
+        # Une connexion par opération : sûr entre threads et entre processus
+        return sqlite3.connect(self.path, timeout=5)
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.namespace}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get(self, text):
+        # Recherche dans le LRU puis sur disque ; None si absent ou expiré
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return vector
+            self._stats["memory_misses"] += 1
+        if self.path is None:
+            return None
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            row = None
+        if row is None or time.time() - row[1] > self.ttl:
+            with self._lock:
+                self._stats["disk_misses"] += 1
+            return None
+        vector = np.frombuffer(row[0], dtype=np.float64).tolist()
+        with self._lock:
+            self._stats["disk_hits"] += 1
+        self._remember(key, vector)
+        return vector
+
+    def put(self, text, vector):
+        key = self.key(text)
+        self._remember(key, list(vector))
+        if self.path is None:
+            return
+        now = time.time()
+        try:
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, created) VALUES (?, ?, ?)",
+                    (key, np.asarray(vector, dtype=np.float64).tobytes(), now)
+                )
+                # Éviction des entrées expirées
+                connection.execute("DELETE FROM embeddings WHERE created < ?", (now - self.ttl,))
+        except sqlite3.Error:
+            pass  # Le cache disque est facultatif : une erreur ne doit pas bloquer la réponse
+
+    def get_or_compute(self, text, compute):
+        """
+        Retourne l'embedding de `text` depuis le cache, ou le calcule avec `compute(text)` et le mémorise.
+        """
+        vector = self.get(text)
+        if vector is None:
+            vector = compute(text)
+            self.put(text, vector)
+        return vector
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["memory_misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
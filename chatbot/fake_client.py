@@ -0,0 +1,125 @@
+import hashlib  # Pour des embeddings déterministes
+import threading  # Pour les appels d'embedding concurrents de la synchronisation
+import time  # Pour simuler la latence entre deux fragments
+from types import SimpleNamespace  # Pour imiter les objets de réponse de l'API OpenAI
+
+import numpy as np  # Pour les vecteurs des embeddings factices
+
+
+class FakeChatClient:
+    """
+    Client local imitant `OpenAI().chat.completions.create`, sans appel réseau.
+    Retourne des fragments prédéfinis, en streaming ou en une seule réponse :
+    utile pour développer et vérifier l'affichage progressif du chatbot.
+    Args:
+        chunks (list): Fragments de texte à produire.
+        delay (float): Pause en secondes entre deux fragments.
+        fail_after (int, optionnel): En streaming, coupe la connexion après ce nombre de fragments
+            (vérification de l'affichage d'une réponse interrompue).
+    """
+
+    def __init__(self, chunks=None, delay=0.0, fail_after=None):
+        self.chunks = list(chunks or ["Bonjour ", "! 🎬 ", "Voici ", "quelques ", "films."])
+        self.delay = delay
+        self.fail_after = fail_after
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        self.calls.append({"model": model, "messages": messages, "stream": stream, **kwargs})
+        if not stream:
+            message = SimpleNamespace(content="".join(self.chunks))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._stream()
+
+    def _stream(self):
+        for position, chunk in enumerate(self.chunks):
+            if position == self.fail_after:
+                raise ConnectionError("Connexion interrompue pendant le streaming")
+            if self.delay:
+                time.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=chunk))])
+        # Dernier fragment sans contenu, comme l'API
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None))])
+
+
+class FakeEmbeddings:
+    """
+    Embeddings locaux et déterministes imitant `OpenAIEmbeddings.embed_documents`, sans appel réseau :
+    un même texte donne toujours le même vecteur normé (dérivé de son empreinte).
+    Utile pour vérifier la synchronisation de la base vectorielle (voir `chatbot.vectorstore_sync`).
+    Args:
+        dimensions (int): Taille des vecteurs.
+        failures (int): Nombre de premiers appels en échec (vérification des nouvelles tentatives).
+    """
+
+    model = "fake-embeddings"
+
+    def __init__(self, dimensions=16, failures=0):
+        self.dimensions = dimensions
+        self.failures = failures
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def embed_text(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.calls.append(len(texts))
+            if self.failures > 0:
+                self.failures -= 1
+                raise ConnectionError("Service d'embedding indisponible")
+        return [self.embed_text(text) for text in texts]
+
+
+class InMemoryVectorStore:
+    """
+    Magasin vectoriel en mémoire exposant l'interface de `ChromaStore` (`entries`, `get`, `upsert`,
+    `delete`) : `sync_vectorstore` peut être exécuté sans Chroma ni OpenAI.
+    Args:
+        records (dict, optionnel): Contenu initial {id: (embedding, texte, métadonnées)}.
+    """
+
+    def __init__(self, records=None):
+        self.records = dict(records or {})
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.records)
+
+    def entries(self):
+        return [(doc_id, dict(metadata)) for doc_id, (_, _, metadata) in list(self.records.items())]
+
+    def get(self, ids):
+        return [(doc_id, *self.records[doc_id]) for doc_id in ids if doc_id in self.records]
+
+    def upsert(self, ids, embeddings, texts, metadatas):
+        with self._lock:
+            for doc_id, embedding, text, metadata in zip(ids, embeddings, texts, metadatas):
+                self.records[doc_id] = (list(embedding), text, dict(metadata))
+            self.writes += len(ids)
+
+    def delete(self, ids):
+        with self._lock:
+            for doc_id in ids:
+                self.records.pop(doc_id, None)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None):
+        # Plus proches voisins (produit scalaire), filtre {"champ": {"$gte"/"$lte": valeur}} ou {"$and": [...]}
+        clauses = (filter or {}).get("$and", [filter] if filter else [])
+        def accepted(metadata):
+            for clause in clauses:
+                for key, condition in clause.items():
+                    for operator, value in condition.items():
+                        if (operator == "$gte" and not metadata.get(key, 0) >= value) or \
+                                (operator == "$lte" and not metadata.get(key, 0) <= value):
+                            return False
+            return True
+        candidates = [(float(np.dot(vector, embedding)), doc_id, text, metadata)
+                      for doc_id, (vector, text, metadata) in self.records.items() if accepted(metadata)]
+        candidates.sort(key=lambda item: -item[0])
+        return [SimpleNamespace(page_content=text, metadata=metadata) for _, _, text, metadata in candidates[:k]]
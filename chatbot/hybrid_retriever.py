@@ -0,0 +1,280 @@
+import functools  # Pour la résolution unique des erreurs passagères
+import re  # Pour l'extraction des filtres de la question
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError  # Pour borner la durée de la recherche vectorielle
+
+import numpy as np  # Pour les calculs vectorisés
+
+from utils.text_index import WORD, fold_query  # Pour la normalisation (accents et casse) commune aux index
+from chatbot.documents import MAX_YEAR  # Pour la limite d'année des films du chatbot
+
+# Paramètres BM25 usuels
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Constante de la fusion par rangs réciproques (RRF)
+RRF_K = 60
+
+# Alias français des genres du catalogue (forme normalisée → genre)
+GENRE_ALIASES = {
+    "comedie": "Comedy", "drame": "Drama", "horreur": "Horror", "epouvante": "Horror",
+    "aventure": "Adventure", "policier": "Crime", "famille": "Family", "familial": "Family",
+    "romantique": "Romance", "romance": "Romance", "science fiction": "Science Fiction",
+    "sf": "Science Fiction", "guerre": "War", "fantastique": "Fantasy", "mystere": "Mystery",
+    "documentaire": "Documentary", "historique": "History", "musical": "Music",
+}
+
+DECADE = re.compile(r"\bannees\s+(?:19)?([0-9])0\b|\b19([0-9])0s\b")
+BEFORE = re.compile(r"\b(?:avant|before)\s+(1[89][0-9]{2}|20[0-9]{2})\b")
+AFTER = re.compile(r"\b(?:apres|depuis|after|since)\s+(1[89][0-9]{2}|20[0-9]{2})\b")
+YEAR = re.compile(r"\b(?:en|de|in)\s+(1[89][0-9]{2}|20[0-9]{2})\b")
+MIN_RATING = re.compile(r"\b(?:note|notes|notee?s?|rating)\s*(?:>=?|superieure?s?\s+a|de plus de|plus de|au moins|sup(?:erieur)?\s+a)\s*([0-9](?:[.,][0-9])?)")
+
+
+@functools.lru_cache(maxsize=1)
+def transient_errors():
+    """
+    Erreurs passagères de la recherche vectorielle, pour lesquelles le classement BM25 seul suffit :
+    délai dépassé, connexion, limite de débit ou erreur serveur de l'API d'embedding.
+    Les autres erreurs (filtre invalide, bogue) ne sont pas masquées.
+    """
+    errors = (FutureTimeoutError, TimeoutError, ConnectionError)
+    try:
+        import openai  # Import différé : seulement après un échec de la recherche vectorielle
+    except ImportError:
+        return errors
+    return errors + (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def tokenize(text):
+    # Mots normalisés (accents et casse ignorés), comme l'index de recherche des films
+    return WORD.findall(fold_query(text))
+
+
+# :blue_book: Index BM25 local sur les documents du chatbot
+class BM25Index:
+    """
+    Index BM25 sur le texte des documents de la base vectorielle.
+    Les poids BM25 de chaque couple (document, terme) sont calculés une fois à la construction
+    et stockés en matrice creuse par colonnes : une requête ne lit que les colonnes de ses termes.
+    Args:
+        texts (list): Texte de chaque document.
+        k1 (float): Saturation de la fréquence des termes.
+        b (float): Normalisation par la longueur des documents.
+    """
+
+    def __init__(self, texts, k1=BM25_K1, b=BM25_B):
+        from sklearn.feature_extraction.text import CountVectorizer  # Import différé : seulement à la construction
+
+        self.size = len(texts)
+        vectorizer = CountVectorizer(analyzer=tokenize)
+        try:
+            counts = vectorizer.fit_transform(texts).tocsc().astype(np.float32)
+        except ValueError:
+            self.vocabulary, self.weights = {}, None
+            return
+        self.vocabulary = vectorizer.vocabulary_
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        document_frequency = np.diff(counts.indptr)
+        idf = np.log1p((self.size - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1e-9))
+        tf = counts.data
+        counts.data = (tf * (k1 + 1) / (tf + norm[counts.indices])
+                       * np.repeat(idf, document_frequency)).astype(np.float32)
+        self.weights = counts
+
+    def scores(self, query):
+        """
+        Score BM25 de chaque document pour la requête.
+        Returns:
+            np.ndarray: Scores float32 (0 pour les documents sans terme commun).
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        if self.weights is None:
+            return scores
+        for term in set(tokenize(query)):
+            column = self.vocabulary.get(term)
+            if column is not None:
+                start, end = self.weights.indptr[column], self.weights.indptr[column + 1]
+                scores[self.weights.indices[start:end]] += self.weights.data[start:end]
+        return scores
+
+    def search(self, query, limit=50, mask=None):
+        """
+        Retourne les positions des documents les mieux classés, parmi ceux du masque.
+        """
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        docs = np.flatnonzero(scores)
+        if len(docs) > limit:
+            docs = docs[np.argpartition(-scores[docs], limit - 1)[:limit]]
+        return docs[np.lexsort((docs, -scores[docs]))]
+
+
+# :blue_book: Index des métadonnées pour le pré-filtrage
+class MetadataIndex:
+    """
+    Colonnes des métadonnées (année, note, genres) des documents, pour résoudre les filtres
+    en masques booléens avant tout calcul de score.
+    Args:
+        metadatas (list): Métadonnées de chaque document.
+    """
+
+    def __init__(self, metadatas):
+        self.year = np.array([metadata.get("year") or 0 for metadata in metadatas], dtype=np.int32)
+        self.rating = np.array([metadata.get("rating") or 0.0 for metadata in metadatas], dtype=np.float32)
+        self.genres = {}
+        for position, metadata in enumerate(metadatas):
+            for genre in str(metadata.get("genres") or "").split(","):
+                if genre.strip():
+                    self.genres.setdefault(genre.strip(), []).append(position)
+        self.genres = {genre: np.array(positions, dtype=np.int32) for genre, positions in self.genres.items()}
+        self.genre_names = {fold_query(genre): genre for genre in self.genres}
+
+    def mask(self, filters):
+        """
+        Masque des documents satisfaisant les filtres {"min_year", "max_year", "genres", "min_rating"}.
+        Plusieurs genres : un document doit les avoir tous.
+        """
+        mask = np.ones(len(self.year), dtype=bool)
+        if filters.get("min_year") is not None:
+            mask &= self.year >= filters["min_year"]
+        if filters.get("max_year") is not None:
+            mask &= self.year <= filters["max_year"]
+        if filters.get("min_rating") is not None:
+            mask &= self.rating >= filters["min_rating"]
+        for genre in filters.get("genres", ()):
+            genre_mask = np.zeros(len(self.year), dtype=bool)
+            genre_mask[self.genres.get(genre, [])] = True
+            mask &= genre_mask
+        return mask
+
+    def parse_filters(self, question):
+        """
+        Extrait de la question les filtres d'année (décennie, « avant », « après », « en »),
+        de genre (noms du catalogue ou alias français) et de note minimale.
+        Returns:
+            dict: Filtres reconnus (vide si aucun).
+        """
+        text = fold_query(question)
+        filters = {}
+        decade = DECADE.search(text)
+        if decade:
+            start = 1900 + 10 * int(decade.group(1) or decade.group(2))
+            filters.update(min_year=start, max_year=start + 9)
+        for pattern, key, offset in ((BEFORE, "max_year", -1), (AFTER, "min_year", 1)):
+            match = pattern.search(text)
+            if match:
+                filters[key] = int(match.group(1)) + offset
+        year = YEAR.search(text)
+        if year and "min_year" not in filters and "max_year" not in filters:
+            filters.update(min_year=int(year.group(1)), max_year=int(year.group(1)))
+        words = " " + " ".join(WORD.findall(text.replace("-", " "))) + " "
+        names = dict(self.genre_names, **{alias: genre for alias, genre in GENRE_ALIASES.items() if genre in self.genres})
+        # Forme exacte ou pluriel (« westerns », « comedies »)
+        genres = {genre for name, genre in names.items() if f" {name} " in words or f" {name}s " in words}
+        if genres:
+            filters["genres"] = sorted(genres)
+        rating = MIN_RATING.search(text)
+        if rating:
+            filters["min_rating"] = float(rating.group(1).replace(",", "."))
+        return filters
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """
+    Fusionne plusieurs classements : score(d) = Σ 1 / (k + rang de d dans chaque classement).
+    Args:
+        rankings (list): Listes d'identifiants, du plus pertinent au moins pertinent.
+    Returns:
+        list: Identifiants fusionnés par score décroissant (à égalité, premier classement d'abord).
+    """
+    scores, first_seen = {}, {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(item, len(first_seen))
+    return sorted(scores, key=lambda item: (-scores[item], first_seen[item]))
+
+
+# :blue_book: Recherche hybride BM25 + vecteurs
+class HybridRetriever:
+    """
+    Recherche des documents du chatbot en trois temps :
+    1. filtres de métadonnées (année, genre, note) extraits de la question et résolus en masque ;
+    2. classement BM25 local parmi les documents du masque (titres et noms exacts) ;
+    3. classement vectoriel, borné par `vector_timeout` : si le service d'embedding est lent,
+       la réponse est construite avec le seul classement BM25.
+    Les deux classements sont fusionnés par rangs réciproques.
+    Args:
+        documents (list): Documents {"content": str, "metadata": dict} (ceux de la base vectorielle).
+        max_year (int): Année maximale, toujours appliquée en plus des filtres de la question.
+        vector_timeout (float): Durée maximale (s) accordée à l'embedding et à la recherche vectorielle.
+        bm25_limit (int): Nombre de candidats BM25 fusionnés.
+    """
+
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="vector-search")
+
+    def __init__(self, documents, max_year=MAX_YEAR, vector_timeout=3.0, bm25_limit=50):
+        self.documents = documents
+        self.max_year = max_year
+        self.vector_timeout = vector_timeout
+        self.bm25_limit = bm25_limit
+        self.positions = {document["metadata"]["tconst"]: i for i, document in enumerate(documents)}
+        self.bm25 = BM25Index([document["content"] for document in documents])
+        self.metadata = MetadataIndex([document["metadata"] for document in documents])
+
+    @staticmethod
+    def vector_filter(filters):
+        # Filtres d'intervalle transmis à la base vectorielle (les genres sont vérifiés sur le masque)
+        clauses = []
+        if filters.get("min_year") is not None:
+            clauses.append({"year": {"$gte": filters["min_year"]}})
+        if filters.get("max_year") is not None:
+            clauses.append({"year": {"$lte": filters["max_year"]}})
+        if filters.get("min_rating") is not None:
+            clauses.append({"rating": {"$gte": filters["min_rating"]}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def retrieve(self, question, k=10, embed=None, vector_search=None):
+        """
+        Retourne les documents les plus pertinents pour la question.
+        Args:
+            question (str): Question de l'utilisateur.
+            k (int): Nombre de documents retournés.
+            embed (callable, optionnel): question -> embedding.
+            vector_search (callable, optionnel): (embedding, k, filter) -> liste de `tconst`.
+        Returns:
+            tuple: (documents, embedding ou None si la recherche vectorielle n'a pas abouti, filtres).
+        Raises:
+            Exception: Toute erreur de la recherche vectorielle autre qu'une erreur passagère (voir `transient_errors`).
+        """
+        filters = self.metadata.parse_filters(question)
+        filters["max_year"] = min(filters.get("max_year", self.max_year), self.max_year)
+        mask = self.metadata.mask(filters)
+        future = None
+        if embed is not None and vector_search is not None:
+            def search():
+                embedding = embed(question)
+                return embedding, vector_search(embedding, 2 * k, self.vector_filter(filters))
+            future = self._executor.submit(search)
+        lexical = self.bm25.search(question, self.bm25_limit, mask).tolist()
+
+        embedding, semantic = None, []
+        if future is not None:
+            try:
+                embedding, tconsts = future.result(timeout=self.vector_timeout)
+                positions = (self.positions.get(tconst) for tconst in tconsts)
+                semantic = [position for position in positions if position is not None and mask[position]]
+            except transient_errors():
+                # Service d'embedding lent ou indisponible : classement BM25 seul
+                # (en cas de lenteur, l'embedding sera tout de même mis en cache à son arrivée)
+                pass
+        ranked = reciprocal_rank_fusion([lexical, semantic])
+        if not ranked:
+            # Aucun terme ni vecteur : films les mieux notés parmi ceux du masque
+            candidates = np.flatnonzero(mask)
+            ranked = candidates[np.argsort(-self.metadata.rating[candidates], kind="stable")].tolist()
+        return [self.documents[position] for position in ranked[:k]], embedding, filters
@@ -0,0 +1,207 @@
+import re  # Pour la reconnaissance des intentions
+import threading  # Pour les compteurs partagés entre sessions
+
+import numpy as np  # Pour les calculs vectorisés
+import pandas as pd  # Pour la manipulation des données
+
+from utils.compact import exact_float64  # Pour les notes stockées en float32
+from utils.text_index import WORD, fold_query, fold_text  # Pour la normalisation (accents et casse)
+from chatbot.documents import MAX_YEAR  # Pour la limite d'année des films du chatbot
+from chatbot.hybrid_retriever import (  # Pour l'extraction des filtres de genre et d'année
+    AFTER, BEFORE, DECADE, GENRE_ALIASES, MIN_RATING, YEAR, MetadataIndex
+)
+
+# Intentions reconnues sur la question normalisée (accents et casse ignorés)
+DIRECTOR = re.compile(
+    r"\b(?:qui a (?:realise|dirige|tourne)|qui est (?:le )?realisateur (?:de|du|d')|"
+    r"(?:le |les )?realisateurs? (?:de|du|d')|who directed)\s*(?:le film\s+)?(?P<title>.+?)\s*[?!.]*$"
+)
+ACTOR = re.compile(
+    r"\b(?:films? (?:avec|ou joue|de l'acteur|de l'actrice|with)|dans quels films (?:joue|a joue|apparait)|"
+    r"filmographie (?:de|d')|movies with)\s*(?P<name>.+?)\s*[?!.]*$"
+)
+BEST_RATED = re.compile(r"\b(?:meilleure?s?|mieux notee?s?|best(?:[- ]rated)?|top)\b")
+# Nombre explicite de films demandés (« top 3 », « les 10 meilleurs »)
+COUNT = re.compile(r"\b(?:top|les)\s+([0-9]{1,2})\b|\b([0-9]{1,2})\s+(?:meilleure?s?|mieux|best|films?)\b")
+QUOTES = "\"'«»“”‘’ "
+
+# Mots sans contenu propre : une question « meilleurs films » ne doit contenir rien d'autre
+# que ces mots, l'intention et ses filtres pour être traitée sans le modèle
+FILLER_WORDS = {
+    "quel", "quels", "quelle", "quelles", "est", "sont", "c", "ce", "qu", "que", "le", "la", "les", "l",
+    "un", "une", "des", "de", "du", "d", "en", "et", "avec", "films", "film", "cinema", "genre", "donne", "donnez",
+    "moi", "me", "nous", "liste", "propose", "proposez", "recommande", "recommandes", "recommandez",
+    "conseille", "conseilles", "conseillez", "peux", "pouvez", "tu", "vous", "plus", "tous", "temps",
+    "svp", "stp", "what", "are", "the", "movies", "movie", "of", "in", "show", "give", "me", "all", "time",
+}
+
+# Nombre de films listés dans les réponses (sans nombre explicite dans la question)
+LIST_SIZE = 5
+# Nombre maximal de films listés sur demande explicite
+MAX_LIST_SIZE = 20
+# Intervenants examinés pour décider si un nom désigne une seule personne
+NAME_CANDIDATES = 50
+
+
+def format_title(title):
+    # Même mise en forme des titres que les réponses du modèle
+    return f"**<span style='color: pink'>{title}</span>**"
+
+
+# :blue_book: Routeur des questions factuelles sur le catalogue
+class QueryRouter:
+    """
+    Répond directement, sans appel au modèle de langage, aux questions qui sont de simples
+    recherches dans le catalogue :
+    - « qui a réalisé Y ? » : titre exact (accents et casse ignorés) puis graphe films–intervenants ;
+    - « films avec X » : index des noms d'intervenants et adjacence intervenant → films ; seulement
+      si le nom désigne une seule personne (« Adele » ou « Pitt » seuls vont au modèle) ;
+    - « meilleures comédies des années 80 » : filtres de genre et d'année résolus en masque, tri par note ;
+      seulement si l'intention et ses filtres couvrent toute la question (« meilleur réalisateur… »
+      ou « top 3 des films où Tom Hanks… » vont au modèle), avec le nombre demandé (« top 3 »).
+    Les autres questions (ou les entités introuvables) sont laissées au modèle.
+    Les films postérieurs à `max_year` sont ignorés, comme dans les réponses du modèle.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        intervenants (pd.DataFrame): Le DataFrame des intervenants.
+        graph (FilmPersonGraph): L'index graphe construit sur les mêmes tables.
+        person_index (PersonSearchIndex): L'index des noms d'intervenants.
+        max_year (int): Année maximale des films cités.
+    """
+
+    def __init__(self, films, intervenants, graph, person_index, max_year=MAX_YEAR):
+        self.graph = graph
+        self.person_index = person_index
+        self.titles = films['title'].astype(str).to_numpy()
+        self.tconst = films['tconst'].astype(str).to_numpy()
+        self.names = intervenants['primaryName'].astype(str).to_numpy()
+        self.year = pd.to_numeric(films['release_date'].astype(str).str[:4], errors='coerce').fillna(0).astype(int).to_numpy()
+        self.rating = exact_float64(films['averageRating']).fillna(0).to_numpy()
+        self.popularity = films['popularity'].fillna(0).to_numpy(dtype=np.float64)
+        self.genres = films['genres'].astype(object).fillna('').astype(str).to_numpy()
+        self.allowed = self.year <= max_year
+        # Titres normalisés → positions, la plus populaire d'abord
+        order = np.argsort(-self.popularity, kind='stable')
+        self.title_positions = {}
+        for position, title in zip(order.tolist(), fold_text(films['title']).to_numpy()[order].tolist()):
+            self.title_positions.setdefault(title, position)
+        self.metadata = MetadataIndex([{"year": year, "rating": rating, "genres": genres}
+                                       for year, rating, genres in zip(self.year.tolist(), self.rating.tolist(),
+                                                                       self.genres.tolist())])
+        self._lock = threading.Lock()
+        self.counts = {"director": 0, "actor": 0, "best_rated": 0, "fallback": 0}
+
+    def _film_line(self, position):
+        return (f"{format_title(self.titles[position])} — 📅 {self.year[position]} · "
+                f"🎭 {self.genres[position] or 'Non spécifié'} · ⭐ {self.rating[position]:.1f}/10")
+
+    def _film_list(self, positions):
+        return "\n".join(f"{rank}. {self._film_line(position)}" for rank, position in enumerate(positions, 1))
+
+    def _director(self, title):
+        position = self.title_positions.get(fold_query(title.strip(QUOTES)))
+        if position is None or not self.allowed[position]:
+            return None
+        people = self.graph.person_table_rows(self.graph.people(self.tconst[position], 'director'))
+        if len(people) == 0:
+            return None
+        names = " et ".join(f"**{name}**" for name in self.names[people])
+        return (f"🎥 {format_title(self.titles[position])} (📅 {self.year[position]}) "
+                f"a été réalisé par {names}. 🎬")
+
+    def _person(self, name):
+        # Intervenant désigné sans ambiguïté : seul nom trouvé par préfixes, ou seul nom contenant
+        # chaque mot de la requête comme mot entier ; None sinon (nom partiel ou ambigu)
+        people = self.person_index.search(name, limit=NAME_CANDIDATES)
+        if len(people) == 1:
+            return people[0]
+        tokens = set(WORD.findall(fold_query(name)))
+        whole = [person for person in people.tolist() if tokens <= set(WORD.findall(fold_query(self.names[person])))]
+        return whole[0] if len(whole) == 1 else None
+
+    def _actor(self, name):
+        person = self._person(name.strip(QUOTES))
+        if person is None:
+            return None
+        films = self.person_index.films(person)
+        films = films[self.allowed[films]][:LIST_SIZE]
+        if len(films) == 0:
+            return None
+        return f"🎭 Films avec **{self.names[person]}** :\n\n{self._film_list(films)}"
+
+    def _leftover(self, text):
+        # Mots de la question qui ne sont ni l'intention, ni ses filtres, ni des mots outils
+        for pattern in (DECADE, BEFORE, AFTER, YEAR, MIN_RATING, COUNT, BEST_RATED):
+            text = pattern.sub(" ", text)
+        words = " " + " ".join(WORD.findall(text.replace("-", " "))) + " "
+        names = set(self.metadata.genre_names) | {alias for alias, genre in GENRE_ALIASES.items()
+                                                  if genre in self.metadata.genres}
+        for name in sorted(names, key=len, reverse=True):
+            words = words.replace(f" {name}s ", " ").replace(f" {name} ", " ")
+        return [word for word in words.split() if word not in FILLER_WORDS]
+
+    def _best_rated(self, question):
+        filters = self.metadata.parse_filters(question)
+        text = fold_query(question)
+        if not filters or self._leftover(text):
+            return None
+        count = COUNT.search(text)
+        size = min(int(count.group(1) or count.group(2)), MAX_LIST_SIZE) if count else LIST_SIZE
+        mask = self.metadata.mask(filters) & self.allowed
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0 or size == 0:
+            return None
+        best = candidates[np.lexsort((-self.popularity[candidates], -self.rating[candidates]))][:size]
+        description = []
+        if filters.get("genres"):
+            description.append(", ".join(filters["genres"]))
+        if filters.get("min_year") is not None and filters.get("max_year") is not None:
+            description.append(f"{filters['min_year']}–{filters['max_year']}")
+        elif filters.get("min_year") is not None:
+            description.append(f"après {filters['min_year'] - 1}")
+        elif filters.get("max_year") is not None:
+            description.append(f"avant {filters['max_year'] + 1}")
+        if filters.get("min_rating") is not None:
+            description.append(f"note ≥ {filters['min_rating']:g}")
+        return f"⭐ Les mieux notés ({' · '.join(description)}) :\n\n{self._film_list(best)}"
+
+    def route(self, question):
+        """
+        Reconnaît l'intention de la question et y répond si c'est une recherche dans le catalogue.
+        Args:
+            question (str): Question de l'utilisateur.
+        Returns:
+            tuple: (intention, réponse en markdown), ou (None, None) si la question doit aller au modèle.
+        """
+        text = fold_query(question)
+        intent, answer = None, None
+        match = DIRECTOR.search(text)
+        if match:
+            intent, answer = "director", self._director(match.group("title"))
+        if answer is None:
+            match = ACTOR.search(text)
+            if match:
+                intent, answer = "actor", self._actor(match.group("name"))
+        if answer is None and BEST_RATED.search(text):
+            intent, answer = "best_rated", self._best_rated(question)
+        with self._lock:
+            self.counts[intent if answer is not None else "fallback"] += 1
+        return (intent, answer) if answer is not None else (None, None)
+
+    def answer(self, question):
+        """
+        Returns:
+            str | None: La réponse directe, ou None si la question doit aller au modèle.
+        """
+        return self.route(question)[1]
+
+    def stats(self):
+        """
+        Returns:
+            dict: Nombre de questions traitées par intention et renvoyées au modèle, et part des réponses directes.
+        """
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        counts["routed_rate"] = (total - counts["fallback"]) / total if total else 0.0
+        return counts
@@ -0,0 +1,173 @@
+import os  # Pour les opérations sur le système de fichiers
+import threading  # Pour une initialisation unique entre sessions concurrentes
+
+from utils.utils import current_data, get_graph_index, get_person_index  # Pour les données partagées et leurs index
+from chatbot.documents import iter_movie_document_batches  # Pour la construction vectorisée des documents
+from chatbot.vectorstore_sync import ChromaStore, sync_vectorstore  # Pour la synchronisation incrémentale
+from chatbot.embedding_cache import QueryEmbeddingCache  # Pour le cache des embeddings de requêtes
+from chatbot.answer_cache import SemanticAnswerCache  # Pour le cache sémantique des réponses
+from chatbot.hybrid_retriever import HybridRetriever  # Pour la recherche hybride BM25 + vecteurs
+
+
+class ChatbotResources:
+    """
+    Ressources lourdes du chatbot, partagées par toutes les sessions d'un processus.
+    Chaque ressource (clients API, données, base vectorielle, caches) est créée à son
+    premier usage seulement, une seule fois, sous verrou. La recherche hybride et le routeur
+    de questions dépendent des données : ils sont rattachés à chaque génération de données
+    (`DataGeneration.get`), et une session les atteint par la génération qu'elle a épinglée.
+    L'état propre à chaque session (historique des messages) reste dans `st.session_state`.
+    Args:
+        api_key (str): Clé de l'API OpenAI.
+        persist_directory (str): Répertoire de stockage de la base vectorielle.
+        on_invalid (callable, optionnel): Appelé avec le titre des films dont la date est illisible.
+    """
+
+    def __init__(self, api_key, persist_directory="./chroma_db", on_invalid=None):
+        self.api_key = api_key
+        self.persist_directory = persist_directory
+        self.on_invalid = on_invalid
+        self.sync_report = None
+        self._lock = threading.RLock()
+        self._resources = {}
+
+    def _get(self, name, factory):
+        # Création paresseuse et unique d'une ressource
+        resource = self._resources.get(name)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is None:
+                    resource = factory()
+                    self._resources[name] = resource
+        return resource
+
+    # Les imports d'openai et de langchain sont différés au premier usage : ils n'ont pas
+    # de coût au démarrage des pages tant que personne n'interroge le chatbot
+
+    def _create_client(self):
+        from openai import OpenAI  # Pour l'intégration avec l'API OpenAI
+        return OpenAI(api_key=self.api_key)
+
+    def _create_embeddings(self):
+        from langchain.embeddings import OpenAIEmbeddings  # Pour la création d'embeddings
+        return OpenAIEmbeddings(openai_api_key=self.api_key)
+
+    @property
+    def client(self):
+        return self._get("client", self._create_client)
+
+    @property
+    def embeddings(self):
+        return self._get("embeddings", self._create_embeddings)
+
+    @property
+    def query_embeddings(self):
+        return self._get("query_embeddings", lambda: QueryEmbeddingCache(namespace=self.embeddings.model))
+
+    @property
+    def answer_cache(self):
+        return self._get("answer_cache", SemanticAnswerCache)
+
+    @property
+    def data(self):
+        # Films, intervenants et liens de la génération de données de la session (pas de relecture des CSV) ;
+        # lus sans `load_files`, qui épinglerait la génération dans la session ayant déclenché la création
+        catalog = current_data().catalog
+        return catalog['films'], catalog['intervenants'], catalog['lien']
+
+    @property
+    def vectorstore(self):
+        return self._get("vectorstore", self._create_or_load_vectorstore)
+
+    @property
+    def retriever(self):
+        # Index BM25 et métadonnées sur les mêmes documents que la base vectorielle, par génération de données
+        return current_data().get("retriever", self._create_retriever)
+
+    def _create_retriever(self, generation):
+        catalog = generation.catalog
+        data = (catalog['films'], catalog['intervenants'], catalog['lien'])
+        return HybridRetriever([doc for batch in self.iter_movie_document_batches(data=data) for doc in batch])
+
+    @property
+    def router(self):
+        # Réponses directes aux questions factuelles, sur les index de la génération de données de la session
+        return current_data().get("router", self._create_router)
+
+    @staticmethod
+    def _create_router(generation):
+        from chatbot.query_router import QueryRouter  # Import différé : construit à la première question
+        catalog = generation.catalog
+        return QueryRouter(catalog['films'], catalog['intervenants'],
+                           get_graph_index(generation), get_person_index(generation))
+
+    def iter_movie_document_batches(self, batch_size=500, data=None):
+        films, intervenants, lien = data if data is not None else self.data
+        return iter_movie_document_batches(
+            films, intervenants, lien, batch_size=batch_size, on_invalid=self.on_invalid
+        )
+
+    def _create_or_load_vectorstore(self):
+        from langchain.vectorstores import Chroma  # Pour la base de données vectorielle
+
+        # Création du répertoire s'il n'existe pas
+        os.makedirs(self.persist_directory, exist_ok=True)
+
+        # Chargement de la base existante (ou création d'une base vide)
+        vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings
+        )
+        self._sync(vectorstore, self.data)
+        return vectorstore
+
+    def _sync(self, vectorstore, data):
+        # Synchronisation incrémentale : seuls les documents nouveaux ou modifiés
+        # (empreinte différente) sont vectorisés, les disparus supprimés
+        self.sync_report = sync_vectorstore(
+            ChromaStore(vectorstore),
+            self.iter_movie_document_batches(data=data),
+            self.embeddings.embed_documents,
+            on_change=lambda report: self.answer_cache.invalidate()  # Les réponses en cache sont périmées
+        )
+        report = self.sync_report
+        if report["added"] or report["updated"] or report["deleted"] or report["reused"]:
+            vectorstore.persist()  # Sauvegarde de la base
+
+    def sync_vectorstore_delta(self, generation):
+        """
+        Applique à la base vectorielle le delta d'une nouvelle génération de données
+        (appelé en arrière-plan par `DataReloader`, une fois la génération publiée).
+        Sans effet tant que la base n'a pas été chargée.
+        Args:
+            generation (DataGeneration): La génération publiée.
+        """
+        with self._lock:
+            vectorstore = self._resources.get("vectorstore")
+            if vectorstore is not None:
+                catalog = generation.catalog
+                self._sync(vectorstore, (catalog['films'], catalog['intervenants'], catalog['lien']))
+
+    def health(self):
+        """
+        Vérification peu coûteuse de l'état du chatbot, sans appel à l'API d'embedding
+        et sans forcer le chargement des ressources.
+        Returns:
+            dict: {"ok": bool, "api_key": bool, "vectorstore_on_disk": bool,
+                   "loaded": liste des ressources déjà créées, "documents": nombre de documents ou None}
+        """
+        status = {
+            "api_key": bool(self.api_key),
+            "vectorstore_on_disk": os.path.isdir(self.persist_directory),
+            "loaded": sorted(self._resources),
+            "documents": None,
+        }
+        vectorstore = self._resources.get("vectorstore")
+        if vectorstore is not None:
+            try:
+                status["documents"] = vectorstore._collection.count()  # Lecture locale, sans embedding
+            except Exception:
+                status["documents"] = 0
+        status["ok"] = status["api_key"] and status["documents"] != 0
+        return status
@@ -0,0 +1,169 @@
+import hashlib  # Pour l'empreinte du contenu des documents
+import json  # Pour la sérialisation stable des métadonnées
+import random  # Pour la gigue du délai entre deux tentatives
+import time  # Pour les délais et la mesure de durée
+from concurrent.futures import ThreadPoolExecutor  # Pour les appels d'embedding concurrents
+
+# Clé de métadonnée contenant l'empreinte du document
+HASH_KEY = "content_hash"
+
+
+def content_hash(document):
+    # Empreinte du texte et des métadonnées (hors empreinte elle-même)
+    metadata = {key: value for key, value in document["metadata"].items() if key != HASH_KEY}
+    payload = document["content"] + "\x1f" + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def embed_with_retry(embed_fn, texts, retries=5, base_delay=1.0, max_delay=30.0):
+    """
+    Appelle la fonction d'embedding avec nouvelles tentatives et attente exponentielle.
+    Args:
+        embed_fn (callable): Fonction list[str] -> list[list[float]] (ex. `OpenAIEmbeddings.embed_documents`).
+        texts (list): Textes à vectoriser.
+        retries (int): Nombre maximal de tentatives.
+        base_delay (float): Délai initial en secondes, doublé à chaque échec.
+        max_delay (float): Délai maximal entre deux tentatives.
+    Returns:
+        list: Un vecteur par texte.
+    """
+    for attempt in range(retries):
+        try:
+            return embed_fn(texts)
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+
+class ChromaStore:
+    # Adaptateur minimal autour de la collection Chroma sous-jacente au vectorstore LangChain
+
+    def __init__(self, vectorstore, page_size=5000):
+        self.collection = vectorstore._collection
+        self.page_size = page_size
+
+    def entries(self):
+        # Tous les identifiants et métadonnées, lus par pages
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=self.page_size, offset=offset)
+            if not page["ids"]:
+                break
+            yield from zip(page["ids"], page["metadatas"])
+            offset += len(page["ids"])
+
+    def get(self, ids):
+        page = self.collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+        return list(zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"]))
+
+    def upsert(self, ids, embeddings, texts, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=texts, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+
+
+def sync_vectorstore(store, document_batches, embed_fn, batch_size=100, workers=4, retries=5, base_delay=1.0,
+                     on_change=None):
+    """
+    Synchronise la base vectorielle avec le catalogue en ne traitant que les différences.
+    Chaque document est identifié par son `tconst` et porte l'empreinte de son contenu dans ses
+    métadonnées : seuls les documents nouveaux ou modifiés sont vectorisés puis insérés,
+    les documents disparus sont supprimés. Les documents d'anciennes bases (sans empreinte)
+    dont le contenu est inchangé sont réutilisés sans nouvel appel d'embedding.
+    Args:
+        store: Magasin exposant `entries`, `get`, `upsert` et `delete` (voir `ChromaStore`,
+            ou `chatbot.fake_client.InMemoryVectorStore` pour une vérification locale).
+        document_batches (iterable): Lots de documents {"content", "metadata"} (voir `iter_movie_document_batches`).
+        embed_fn (callable): Fonction d'embedding list[str] -> list[list[float]]
+            (`chatbot.fake_client.FakeEmbeddings.embed_documents` pour une vérification locale).
+        batch_size (int): Nombre de textes par appel d'embedding.
+        workers (int): Nombre d'appels d'embedding simultanés.
+        retries (int): Nombre de tentatives par appel d'embedding.
+        base_delay (float): Délai initial de l'attente exponentielle.
+        on_change (callable, optionnel): Appelé avec le rapport si la base a été modifiée
+            (par exemple pour invalider les caches de réponses).
+    Returns:
+        dict: Compteurs de la synchronisation (ajoutés, mis à jour, supprimés, inchangés, réutilisés, durée).
+            Les anciens identifiants remplacés comptent parmi les supprimés.
+    """
+    start = time.perf_counter()
+    existing = {}
+    legacy = {}
+    for doc_id, metadata in store.entries():
+        metadata = metadata or {}
+        if HASH_KEY in metadata and metadata.get("tconst") == doc_id:
+            existing[doc_id] = metadata[HASH_KEY]
+        else:
+            legacy[doc_id] = metadata.get("tconst")
+
+    report = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "reused": 0}
+    pending = []
+    seen = set()
+    for batch in document_batches:
+        for document in batch:
+            doc_id = str(document["metadata"]["tconst"])
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            digest = content_hash(document)
+            if existing.get(doc_id) == digest:
+                report["unchanged"] += 1
+                continue
+            report["updated" if doc_id in existing else "added"] += 1
+            pending.append((doc_id, digest, document))
+
+    # Réutilisation des embeddings des anciens documents dont le contenu n'a pas changé
+    if legacy and pending:
+        by_tconst = {}
+        for legacy_id, tconst in legacy.items():
+            by_tconst.setdefault(tconst, legacy_id)
+        wanted = {doc_id: (digest, document) for doc_id, digest, document in pending if doc_id in by_tconst}
+        reused = set()
+        legacy_ids = [by_tconst[doc_id] for doc_id in wanted]
+        for offset in range(0, len(legacy_ids), batch_size):
+            ids, embeddings, texts, metadatas = [], [], [], []
+            for _, embedding, text, metadata in store.get(legacy_ids[offset:offset + batch_size]):
+                doc_id = metadata.get("tconst")
+                digest, document = wanted[doc_id]
+                if content_hash({"content": text, "metadata": metadata}) != digest:
+                    continue
+                ids.append(doc_id)
+                embeddings.append(embedding)
+                texts.append(document["content"])
+                metadatas.append({**document["metadata"], HASH_KEY: digest})
+            if ids:
+                store.upsert(ids, embeddings, texts, metadatas)
+                reused.update(ids)
+        report["reused"] = len(reused)
+        report["added"] -= len([doc_id for doc_id in reused if doc_id not in existing])
+        pending = [item for item in pending if item[0] not in reused]
+
+    # Vectorisation par lots bornés, en parallèle, avec écriture au fil de l'eau
+    batches = [pending[offset:offset + batch_size] for offset in range(0, len(pending), batch_size)]
+    if batches:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                (batch, pool.submit(embed_with_retry, embed_fn, [document["content"] for _, _, document in batch],
+                                    retries, base_delay))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                store.upsert(
+                    [doc_id for doc_id, _, _ in batch],
+                    future.result(),
+                    [document["content"] for _, _, document in batch],
+                    [{**document["metadata"], HASH_KEY: digest} for _, digest, document in batch],
+                )
+
+    # Suppression des documents disparus du catalogue et des anciens identifiants
+    stale = [doc_id for doc_id in list(existing) + list(legacy) if doc_id not in seen]
+    for offset in range(0, len(stale), batch_size):
+        store.delete(stale[offset:offset + batch_size])
+    report["deleted"] = len(stale)
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    if on_change is not None and (report["added"] or report["updated"] or report["deleted"] or report["reused"]):
+        on_change(report)
+    return report
@@ -7,17 +7,18 @@ st.set_page_config(
 )
 import pandas as pd
 # Importation des fonctions utilitaires et du chatbot
-from utils.utils import load_css, search_movies, get_recommendations
+from utils.utils import (
+    load_css, search_movies, get_recommendations, load_files,
+    get_person_index, get_text_index, get_tfidf_model, get_title_autocomplete, get_facet_index
+)
 from chatbot.chatbot import MovieChatbot
 
 # Chargement du fichier CSS pour le style de l'application
 load_css('css/style.css')
 
 try:
-    # Chargement des données des films, intervenants et liens depuis des fichiers CSV
-    films = pd.read_csv("csv/films_def.csv")
-    intervenants = pd.read_csv("csv/intervenants_def.csv")
-    lien = pd.read_csv("csv/lien_def.csv")
+    # Chargement des données des films, intervenants et liens depuis l'instantané partagé
+    films, intervenants, lien = load_files(['films', 'intervenants', 'lien'])
 except Exception as e:
     # Affichage d'une erreur si le chargement des données échoue
     st.error(f"Erreur de chargement des données: {str(e)}")
@@ -26,20 +27,8 @@ except Exception as e:
 # Tri des films par popularité décroissante
 films = films.sort_values(by='popularity', ascending=False)
 
-# Préparation des filtres
-# Création d'une colonne 'decade' pour regrouper les films par décennie
-films['decade'] = pd.to_datetime(films['release_date']).dt.year // 10 * 10
-min_decade = films['decade'].min() // 10 * 10
-max_decade = films['decade'].max() // 10 * 10
-# Arrondi de la note moyenne des films
-films['averageRating_rounded'] = films['averageRating'].round()
-
-# Extraction des genres uniques à partir de la colonne 'genres'
-unique_genres = sorted(list({
-    genre.strip() 
-    for genres in films['genres'].dropna() 
-    for genre in genres.split(',')
-}))
+# Préparation des filtres : index de facettes précalculé (bitsets par décennie, genre, pays et note)
+facets = get_facet_index()
 
 # Barre latérale pour l'inscription utilisateur
 with st.sidebar:
@@ -67,13 +56,24 @@ with search_container:
             label_visibility="collapsed",
             key="film_search"
         )
+        # Suggestions de titres classées par popularité (préfixes puis repli tolérant aux fautes)
+        suggestions = get_title_autocomplete().suggest(film_input, limit=5) if film_input else None
+        suggestion_choice = 0
+        if suggestions is not None and not suggestions.empty:
+            suggestion_choice = st.selectbox(
+                "",
+                range(len(suggestions)),
+                format_func=lambda i: suggestions.iloc[i]['title'],
+                label_visibility="collapsed",
+                key="film_suggestion"
+            )
         if st.button("✨ Recommander", key="search_film_btn"):
             if film_input:
-                # Recherche des films correspondant au nom saisi
-                selected_film = films[films['title'].str.contains(film_input, case=False, na=False)]
-                if not selected_film.empty:
-                    if st.session_state.get('selected_film_tconst') != selected_film.iloc[0]['tconst']:
-                        st.session_state['selected_film_tconst'] = selected_film.iloc[0]['tconst']
+                # Film suggéré correspondant au nom saisi
+                if suggestions is not None and not suggestions.empty:
+                    selected_tconst = suggestions.iloc[suggestion_choice]['tconst']
+                    if st.session_state.get('selected_film_tconst') != selected_tconst:
+                        st.session_state['selected_film_tconst'] = selected_tconst
                         st.session_state['go_to_details'] = True
                         st.rerun()
                 else:
@@ -91,7 +91,10 @@ with search_container:
         if st.button("✨ Rechercher", key="search_keyword_btn"):
             if keyword_input:
                 # Recherche des films correspondant au mot-clé ou nom d'acteur saisi
-                search_results = search_movies(keyword_input, films, intervenants, lien)
+                search_results = search_movies(
+                    keyword_input, films, intervenants, lien,
+                    person_index=get_person_index(), text_index=get_text_index(), tfidf_model=get_tfidf_model
+                )
                 if not search_results.empty:
                     st.session_state['search_results'] = search_results
                     st.rerun()
@@ -116,16 +119,32 @@ if 'search_results' in st.session_state:
 st.markdown("---")
 
 # Filtres pour affiner la recherche
+# Sélection courante (valeurs de l'exécution précédente) pour calculer le nombre de films par option
+current_decade = st.session_state.get('decade_filter')
+current_selection = {
+    'decade': int(current_decade[:-1]) if current_decade else None,
+    'genre': st.session_state.get('genre_filter'),
+    'country': st.session_state.get('country_filter'),
+    'rating': st.session_state.get('rating_filter'),
+}
+
+def facet_label(counts, option, label=None):
+    # Libellé d'une option avec le nombre de films qu'elle laisse
+    if option == '':
+        return ''
+    return f"{label or option} ({counts.get(option, 0)})"
+
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     # Filtre par décennie
     st.markdown('<p class="filter-label">Décennie 📅</p>', unsafe_allow_html=True)
-    decades = range(min_decade, max_decade + 10, 10)
-    decade_options = [f"{decade}s" for decade in decades]
+    decade_counts = facets.counts('decade', current_selection)
+    decade_options = [f"{decade}s" for decade in facets.options['decade']]
     selected_decade = st.selectbox(
         "",
         [''] + decade_options,
+        format_func=lambda option: facet_label(decade_counts, int(option[:-1]) if option else '', option),
         label_visibility="collapsed",
         key="decade_filter"
     )
@@ -134,9 +153,11 @@ with col1:
 with col2:
     # Filtre par genre
     st.markdown('<p class="filter-label">Genre 🎭</p>', unsafe_allow_html=True)
+    genre_counts = facets.counts('genre', current_selection)
     genre = st.selectbox(
         "",
-        [''] + unique_genres,
+        [''] + facets.options['genre'],
+        format_func=lambda option: facet_label(genre_counts, option),
         label_visibility="collapsed",
         key="genre_filter"
     )
@@ -144,9 +165,11 @@ with col2:
 with col3:
     # Filtre par pays d'origine
     st.markdown('<p class="filter-label">Pays d\'origine 🌍</p>', unsafe_allow_html=True)
+    country_counts = facets.counts('country', current_selection)
     country = st.selectbox(
         "",
-        [''] + list(films['origin_country'].unique()),
+        [''] + facets.options['country'],
+        format_func=lambda option: facet_label(country_counts, option),
         label_visibility="collapsed",
         key="country_filter"
     )
@@ -154,26 +177,25 @@ with col3:
 with col4:
     # Filtre par note moyenne
     st.markdown('<p class="filter-label">Note ⭐</p>', unsafe_allow_html=True)
+    rating_counts = facets.counts('rating', current_selection)
     rating_options = list(range(5, 11))
     selected_rating = st.selectbox(
         "",
         [''] + rating_options,
+        format_func=lambda option: facet_label(rating_counts, option),
         label_visibility="collapsed",
         key="rating_filter"
     )
 
-# Application des filtres sur la liste des films
+# Application des filtres sur la liste des films (ET bit à bit des facettes sélectionnées)
 try:
-    filtered_films = films.copy()
-
-    if selected_decade:
-        filtered_films = filtered_films[filtered_films['decade'] == selected_decade_start]
-    if genre:
-        filtered_films = filtered_films[filtered_films['genres'].str.contains(genre, na=False, case=False)]
-    if country:
-        filtered_films = filtered_films[filtered_films['origin_country'] == country]
-    if selected_rating:
-        filtered_films = filtered_films[filtered_films['averageRating_rounded'] == selected_rating]
+    filtered_bits = facets.filter({
+        'decade': selected_decade_start,
+        'genre': genre,
+        'country': country,
+        'rating': selected_rating,
+    })
+    filtered_films = films.loc[facets.matches(filtered_bits, limit=4)]
 
     if filtered_films.empty:
         st.warning("Aucun film ne correspond aux filtres sélectionnés.")
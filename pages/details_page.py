@@ -6,15 +6,15 @@ st.set_page_config(
     layout="wide"
 )
 import pandas as pd
-from utils.utils import load_css, get_recommendations, prepare_features
+from utils.utils import load_css, load_files, get_graph_index, get_recommendations, get_recommendation_index, load_neighbor_table, load_ann_index, load_collaborator_table, rows_by_tconst
 from chatbot.chatbot import MovieChatbot
 
 
 # Chargement des ressources
 load_css('css/style.css')
-films = pd.read_csv("csv/films_def.csv")
-intervenants = pd.read_csv("csv/intervenants_def.csv")
-lien = pd.read_csv("csv/lien_def.csv")
+films, intervenants, lien = load_files(['films', 'intervenants', 'lien'])
+graph = get_graph_index()
+collaborator_table = load_collaborator_table()  # None si les tables n'ont pas été précalculées
 
 # Navigation
 st.page_link("home_page.py", label="🏠 Retour à l'accueil")
@@ -60,48 +60,54 @@ try:
 
         st.markdown('</div>', unsafe_allow_html=True)
 
-    # Réalisateurs
-    film_participants = lien[lien['tconst'] == selected_film['tconst']]
-    directors = film_participants[film_participants['category'] == 'director']
+    # Réalisateurs (lecture directe de l'adjacence film → intervenants)
+    directors = intervenants.iloc[graph.person_table_rows(graph.people(selected_film['tconst'], 'director'))]
     
     if not directors.empty:
         st.markdown('<div class="neo-container directors-section">', unsafe_allow_html=True)
         st.markdown("<h3>🎥 Réalisateurs</h3>", unsafe_allow_html=True)
         
         cols = st.columns(len(directors))
-        for i, (_, director_link) in enumerate(directors.iterrows()):
-            director = intervenants[intervenants['nconst'] == director_link['nconst']]
-            if not director.empty:
-                with cols[i]:
-                    director = director.iloc[0]
-                    profile_path = director['profile_path'] if pd.notna(director['profile_path']) else "https://via.placeholder.com/150"
-                    st.markdown(f"""
-                        <div class="person-card">
-                            <img src="{profile_path}" alt="{director['primaryName']}">
-                            <h4>{director['primaryName']}</h4>
-                        </div>
-                    """, unsafe_allow_html=True)
+        for i, (_, director) in enumerate(directors.iterrows()):
+            with cols[i]:
+                profile_path = director['profile_path'] if pd.notna(director['profile_path']) else "https://via.placeholder.com/150"
+                st.markdown(f"""
+                    <div class="person-card">
+                        <img src="{profile_path}" alt="{director['primaryName']}">
+                        <h4>{director['primaryName']}</h4>
+                    </div>
+                """, unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Acteurs principaux
-    actors = film_participants[film_participants['category'] == 'actor'].head(5)
+    actors = intervenants.iloc[graph.person_table_rows(graph.people(selected_film['tconst'], 'actor')[:5])]
     if not actors.empty:
         st.markdown('<div class="neo-container actors-section">', unsafe_allow_html=True)
         st.markdown("<h3>🎭 Acteurs principaux</h3>", unsafe_allow_html=True)
         
         cols = st.columns(len(actors))
-        for i, (_, actor_link) in enumerate(actors.iterrows()):
-            actor = intervenants[intervenants['nconst'] == actor_link['nconst']]
-            if not actor.empty:
-                with cols[i]:
-                    actor = actor.iloc[0]
-                    profile_path = actor['profile_path'] if pd.notna(actor['profile_path']) else "https://via.placeholder.com/150"
-                    st.markdown(f"""
-                        <div class="person-card">
-                            <img src="{profile_path}" alt="{actor['primaryName']}">
-                            <h4>{actor['primaryName']}</h4>
-                        </div>
-                    """, unsafe_allow_html=True)
+        for i, (_, actor) in enumerate(actors.iterrows()):
+            with cols[i]:
+                profile_path = actor['profile_path'] if pd.notna(actor['profile_path']) else "https://via.placeholder.com/150"
+                st.markdown(f"""
+                    <div class="person-card">
+                        <img src="{profile_path}" alt="{actor['primaryName']}">
+                        <h4>{actor['primaryName']}</h4>
+                    </div>
+                """, unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    # Collaborateurs fréquents des réalisateurs (table de co-occurrence précalculée)
+    if collaborator_table is not None and not directors.empty:
+        st.markdown('<div class="neo-container collaborators-section">', unsafe_allow_html=True)
+        st.markdown("<h3>🤝 Collaborateurs fréquents</h3>", unsafe_allow_html=True)
+        names = intervenants.assign(nconst=intervenants['nconst'].astype(str)).set_index('nconst')['primaryName']
+        for _, director in directors.iterrows():
+            partners, shared = collaborator_table.collaborators(str(director['nconst']), n=5)
+            known = [(names[p], int(n)) for p, n in zip(partners, shared) if p in names.index]
+            if known:
+                st.markdown(f"**{director['primaryName']}** a souvent travaillé avec : " +
+                            ", ".join(f"{name} ({n} film{'s' if n > 1 else ''})" for name, n in known))
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Bande annonce
@@ -113,15 +119,19 @@ try:
  # Films similaires
     st.markdown('<div class="neo-container similar-movies">', unsafe_allow_html=True)
     st.markdown("### 🎬 Films similaires")
-    features_matrix = prepare_features(films)
+    recommendation_index = get_recommendation_index()
+    neighbor_table = load_neighbor_table()
+    ann_index = load_ann_index()  # Index approché, s'il a été construit pour ce catalogue
     film_choice = selected_film['title']
 
     try:
         recommended_films = get_recommendations(
             film_choice, 
             films, 
-            features_matrix,
-            n_recommendations=5
+            recommendation_index,
+            n_recommendations=5,
+            neighbor_table=neighbor_table,
+            ann_index=ann_index
         )
 
         cols = st.columns(5)
@@ -139,6 +149,22 @@ try:
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+    # Films avec la même équipe (intervenants partagés, table précalculée)
+    if collaborator_table is not None:
+        crew_tconsts, _ = collaborator_table.crew_recommendations(str(selected_film['tconst']), n=10)
+        crew_films = rows_by_tconst(films, crew_tconsts).head(5)
+        if not crew_films.empty:
+            st.markdown('<div class="neo-container similar-movies">', unsafe_allow_html=True)
+            st.markdown("### 🎞️ Avec la même équipe")
+            cols = st.columns(5)
+            for i, (_, film) in enumerate(crew_films.iterrows()):
+                with cols[i]:
+                    st.image(film['poster_path'], use_container_width=True)
+                    if st.button("✨ Détails", key=f"crew_{i}_{film['tconst']}"):
+                        st.session_state['selected_film_tconst'] = film['tconst']
+                        st.rerun()
+            st.markdown('</div>', unsafe_allow_html=True)
+
 except Exception as e:
     st.error(f"❌ Une erreur est survenue: {str(e)}")
     st.session_state['go_to_details'] = False
@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
-from sklearn.preprocessing import RobustScaler
-from sklearn.neighbors import NearestNeighbors
 import os
-from utils.utils import load_css, prepare_features, get_recommendations, load_files
+from utils.utils import load_css, get_recommendation_index, load_neighbor_table, load_ann_index, get_recommendations, load_files, get_title_autocomplete
 
 # 📘 Configuration de la page Streamlit
 st.set_page_config(
@@ -34,22 +32,29 @@ st.page_link("home_page.py", label="Retour à l'accueil")
 # 📘 Interface utilisateur
 st.title("Recommandations de films")
 
-# 📘 Préparation des caractéristiques des films
-features_matrix = prepare_features(films_def)
+# 📘 Index de recommandation (construit une seule fois, partagé entre les sessions)
+recommendation_index = get_recommendation_index()
+neighbor_table = load_neighbor_table()
+ann_index = load_ann_index()  # Index approché des grands catalogues (None : recherche exacte)
 
 # 📘 Sélection du film par l'utilisateur
 if "search_film" in st.session_state:
     film_choice = st.session_state["search_film"]
 else:
-    film_choice = st.selectbox("Choisissez un film :", films_def['title'].unique())
+    # Suggestions du moteur d'autocomplétion (les plus populaires si la saisie est vide)
+    title_query = st.text_input("Rechercher un film :", key="recommendation_title_query")
+    suggestions = get_title_autocomplete().suggest(title_query, limit=20)
+    film_choice = st.selectbox("Choisissez un film :", suggestions['title'].unique())
 
 try:
     # 📘 Obtenir les recommandations de films
     recommended_films = get_recommendations(
         film_choice, 
         films_def, 
-        features_matrix,
-        n_recommendations=5
+        recommendation_index,
+        n_recommendations=5,
+        neighbor_table=neighbor_table,
+        ann_index=ann_index
     )
     
     # 📘 Affichage des informations du film sélectionné
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.recommendation import RecommendationIndex
+
+# Emplacement par défaut de l’index approché
+DEFAULT_ANN_DIR = 'cache/ann'
+ANN_VERSION = 1
+
+
+def _nearest_centroids(vectors, centroids, block_size=65536):
+    # Affectation de chaque vecteur au centroïde le plus proche, par blocs (mémoire bornée)
+    centroid_norms = (centroids.astype(np.float64) ** 2).sum(axis=1)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size].astype(np.float64)
+        squared = centroid_norms - 2 * block @ centroids.T.astype(np.float64)
+        labels[start:start + block_size] = squared.argmin(axis=1)
+    return labels
+
+
+def kmeans(vectors, n_clusters, n_iter=20, seed=0):
+    """
+    K-moyennes de Lloyd en NumPy pur (quantification grossière de l’index IVF).
+    Les clusters vidés en cours de route sont réinitialisés sur des points tirés au hasard.
+    Args:
+        vectors (np.ndarray): Vecteurs d’entraînement (N × F).
+        n_clusters (int): Nombre de centroïdes.
+        n_iter (int): Nombre d’itérations.
+        seed (int): Graine du générateur aléatoire.
+    Returns:
+        np.ndarray: Centroïdes float32 (n_clusters × F).
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].astype(np.float64)
+    for _ in range(n_iter):
+        labels = _nearest_centroids(vectors, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        # Somme par cluster : tri par étiquette puis réduction par segments (évite `np.add.at`)
+        order = np.argsort(labels, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order].astype(np.float64), starts[filled], axis=0)
+        centroids[filled] = sums[filled] / counts[filled, None]
+        if not filled.all():
+            centroids[~filled] = vectors[rng.choice(len(vectors), int((~filled).sum()), replace=False)]
+    return centroids.astype(np.float32)
+
+
+# :blue_book: Index approché des plus proches voisins (IVF)
+class IVFIndex:
+    """
+    Index approché des plus proches voisins par listes inversées (IVF) pour les grands catalogues.
+    Les vecteurs de `prepare_features` sont répartis en `n_lists` listes par k-moyennes et stockés
+    contigus, liste après liste. Une requête ne parcourt que les `n_probe` listes dont le centroïde
+    est le plus proche : plus `n_probe` est grand, meilleur est le rappel et plus la requête est lente.
+    La pondération des genres du film de référence s’applique aussi bien au choix des listes
+    qu’au calcul exact des distances sur les candidats.
+    Args:
+        centroids (np.ndarray): Centroïdes float32 (L × F).
+        offsets (np.ndarray): Début de chaque liste dans `vectors` (L + 1).
+        vectors (np.ndarray): Vecteurs float32 triés par liste (N × F).
+        ids (np.ndarray): Position d’origine (ligne du DataFrame) de chaque vecteur stocké.
+        genre_mask (np.ndarray): Masque booléen des colonnes de genres.
+        n_probe (int): Nombre de listes parcourues par défaut.
+        tconst (np.ndarray, optionnel): Identifiants des films.
+        source_version (str, optionnel): Version de l’instantané d’origine, pour vérifier la correspondance
+            à la génération de données.
+    """
+
+    def __init__(self, centroids, offsets, vectors, ids, genre_mask, n_probe=8, tconst=None, source_version=None):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.vectors = vectors
+        self.ids = ids
+        self.genre_mask = genre_mask
+        self.n_probe = n_probe
+        self.tconst = tconst
+        self.source_version = source_version
+        self.slots = np.empty(len(ids), dtype=np.int64)
+        self.slots[ids] = np.arange(len(ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, matrix, genre_mask, n_lists=None, n_probe=8, n_iter=20, sample_size=None, seed=0, tconst=None,
+              source_version=None):
+        """
+        Construit l’index à partir de la matrice des caractéristiques.
+        Args:
+            matrix (np.ndarray): Matrice float32 des caractéristiques (N × F).
+            genre_mask (np.ndarray): Masque booléen des colonnes de genres.
+            n_lists (int, optionnel): Nombre de listes ; ≈ √N par défaut.
+            n_probe (int): Nombre de listes parcourues par défaut à la requête.
+            n_iter (int): Itérations des k-moyennes.
+            sample_size (int, optionnel): Taille de l’échantillon d’entraînement des k-moyennes (64 points par liste).
+            seed (int): Graine du générateur aléatoire.
+            tconst (np.ndarray, optionnel): Identifiants des films.
+            source_version (str, optionnel): Version de l’instantané d’origine (voir `films_source_version`).
+        Returns:
+            IVFIndex: L’index construit.
+        """
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        n_lists = min(len(matrix), n_lists or max(1, int(np.sqrt(len(matrix)))))
+        sample_size = min(len(matrix), sample_size or 64 * n_lists)
+        rng = np.random.default_rng(seed)
+        sample = matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))]
+        centroids = kmeans(sample, n_lists, n_iter=n_iter, seed=seed)
+        labels = _nearest_centroids(matrix, centroids)
+        order = np.argsort(labels, kind='stable').astype(np.int32)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, matrix[order], order, np.asarray(genre_mask, dtype=bool), n_probe, tconst,
+                   source_version)
+
+    @classmethod
+    def from_recommendation_index(cls, index, **kwargs):
+        return cls.build(index.matrix, index.genre_mask, **kwargs)
+
+    def feature_weights(self, movie_index, genre_weight=10):
+        # Même pondération que `RecommendationIndex.feature_weights`
+        seed = self.vectors[self.slots[movie_index]]
+        weights = np.ones(seed.shape[0], dtype=np.float32)
+        weights[self.genre_mask & (seed == 1)] = genre_weight
+        return weights
+
+    def search(self, vector, weights, n_neighbors, n_probe=None):
+        """
+        Recherche approchée des plus proches voisins d’un vecteur quelconque.
+        Args:
+            vector (np.ndarray): Vecteur de requête (F).
+            weights (np.ndarray): Poids par colonne (F).
+            n_neighbors (int): Nombre de voisins à retourner.
+            n_probe (int, optionnel): Nombre de listes parcourues (au moins assez pour `n_neighbors` candidats).
+        Returns:
+            tuple: (distances, indices) triés par distance croissante, indices = lignes du DataFrame.
+        """
+        n_probe = n_probe or self.n_probe
+        n_neighbors = min(n_neighbors, len(self))
+        vector = np.asarray(vector, dtype=np.float32)
+        coarse = (((self.centroids - vector) * weights) ** 2).sum(axis=1)
+        lists = np.argsort(coarse, kind='stable')
+        sizes = np.diff(self.offsets)[lists]
+        # Listes parcourues : les n_probe plus proches, complétées si les candidats sont trop peu nombreux
+        n_lists = max(min(n_probe, len(lists)), int(np.searchsorted(np.cumsum(sizes), n_neighbors)) + 1)
+        slots = np.concatenate([np.arange(self.offsets[l], self.offsets[l + 1]) for l in lists[:n_lists]])
+        diff = self.vectors[slots] - vector
+        diff *= weights
+        squared = np.einsum('ij,ij->i', diff, diff)
+        if n_neighbors < len(slots):
+            best = np.argpartition(squared, n_neighbors - 1)[:n_neighbors]
+        else:
+            best = np.arange(len(slots))
+        candidates = self.ids[slots[best]]
+        order = np.lexsort((candidates, squared[best]))
+        return np.sqrt(squared[best][order]), candidates[order]
+
+    def kneighbors(self, movie_index, n_neighbors, genre_weight=10, n_probe=None):
+        """
+        Même interface que `RecommendationIndex.kneighbors` : le film de référence fait partie des voisins.
+        """
+        weights = self.feature_weights(movie_index, genre_weight)
+        return self.search(self.vectors[self.slots[movie_index]], weights, n_neighbors, n_probe)
+
+    def matches(self, source_version):
+        """
+        Vérifie que l’index a été construit sur la version courante de l’instantané
+        (mêmes films, mêmes caractéristiques).
+        """
+        return source_version is not None and self.source_version == source_version
+
+    def save(self, path=DEFAULT_ANN_DIR):
+        """
+        Enregistre l’index dans `path` (tableaux `.npy` et manifeste JSON), avec publication atomique.
+        """
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        os.makedirs(tmp_path, exist_ok=True)
+        arrays = {'centroids': self.centroids, 'offsets': self.offsets, 'vectors': self.vectors,
+                  'ids': self.ids, 'genre_mask': self.genre_mask}
+        if self.tconst is not None:
+            arrays['tconst'] = np.asarray(self.tconst, dtype=str)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': ANN_VERSION, 'n_lists': len(self.centroids), 'n_probe': self.n_probe,
+                       'n_films': len(self), 'source_version': self.source_version}, f)
+        if os.path.exists(path):
+            old_path = f'{path}.old-{os.getpid()}'
+            os.rename(path, old_path)
+            os.rename(tmp_path, path)
+            for name in os.listdir(old_path):
+                os.remove(os.path.join(old_path, name))
+            os.rmdir(old_path)
+        else:
+            os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_ANN_DIR):
+        """
+        Charge un index enregistré ; les vecteurs sont lus en mémoire mappée.
+        """
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        tconst_path = os.path.join(path, 'tconst.npy')
+        return cls(
+            np.load(os.path.join(path, 'centroids.npy')),
+            np.load(os.path.join(path, 'offsets.npy')),
+            np.load(os.path.join(path, 'vectors.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'ids.npy')),
+            np.load(os.path.join(path, 'genre_mask.npy')),
+            manifest['n_probe'],
+            np.load(tconst_path) if os.path.exists(tconst_path) else None,
+            manifest.get('source_version'),
+        )
+
+    @staticmethod
+    def exists(path=DEFAULT_ANN_DIR):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+
+# :blue_book: Évaluation du rappel de l’index approché
+def _without_seed(indices, seed, k):
+    # Comme `get_recommendations` : film de référence retiré par valeur, puis k premiers voisins
+    return set(indices[indices != seed][:k].tolist())
+
+
+def evaluate_recall(ann_index, exact_index, queries, k=10, probes=(1, 2, 4, 8, 16), genre_weight=10):
+    """
+    Mesure le rappel@k de l’index approché par rapport à la recherche exacte, pour plusieurs valeurs de `n_probe`.
+    Le film de référence est exclu des deux listes de voisins.
+    Args:
+        ann_index (IVFIndex): Index approché.
+        exact_index (RecommendationIndex): Index exact construit sur les mêmes caractéristiques.
+        queries (np.ndarray): Positions des films de référence.
+        k (int): Nombre de voisins comparés.
+        probes (iterable): Valeurs de `n_probe` évaluées.
+        genre_weight (int): Poids attribué aux genres du film de référence.
+    Returns:
+        pd.DataFrame: Rappel@k moyen et latence moyenne (ms) par valeur de `n_probe`, et latence exacte.
+    """
+    start = time.perf_counter()
+    truth = [_without_seed(exact_index.kneighbors(q, k + 1, genre_weight)[1], q, k) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    rows = []
+    for n_probe in probes:
+        start = time.perf_counter()
+        found = [_without_seed(ann_index.kneighbors(q, k + 1, genre_weight, n_probe)[1], q, k) for q in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        recall = np.mean([len(f & t) / max(1, len(t)) for f, t in zip(found, truth)])
+        rows.append({'n_probe': n_probe, f'recall@{k}': round(float(recall), 4),
+                     'ms/requête': round(ann_ms, 3), 'ms/requête (exact)': round(exact_ms, 3)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    from utils.snapshot import films_source_version
+    from utils.utils import prepare_features
+
+    parser = argparse.ArgumentParser(description="Construction et évaluation de l’index approché (IVF).")
+    parser.add_argument('--films', default='csv/films_def.csv', help="Fichier CSV des films")
+    parser.add_argument('--out', default=DEFAULT_ANN_DIR, help="Répertoire de l’index")
+    parser.add_argument('--lists', type=int, default=None, help="Nombre de listes (≈ √N par défaut)")
+    parser.add_argument('--probe', type=int, default=8, help="Nombre de listes parcourues par défaut")
+    parser.add_argument('--evaluate', type=int, default=0, help="Nombre de requêtes d’évaluation (0 : aucune)")
+    parser.add_argument('-k', type=int, default=10, help="k du rappel@k")
+    args = parser.parse_args()
+
+    films = pd.read_csv(args.films)
+    exact = RecommendationIndex(prepare_features(films))
+    start = time.perf_counter()
+    ann = IVFIndex.from_recommendation_index(exact, n_lists=args.lists, n_probe=args.probe,
+                                             tconst=films['tconst'].to_numpy(dtype=str),
+                                             source_version=films_source_version(args.films))
+    ann.save(args.out)
+    print({'n_films': len(ann), 'n_lists': len(ann.centroids), 'seconds': round(time.perf_counter() - start, 3)})
+    if args.evaluate:
+        queries = np.random.default_rng(0).choice(len(films), min(args.evaluate, len(films)), replace=False)
+        print(evaluate_recall(ann, exact, queries, k=args.k).to_string(index=False))
@@ -0,0 +1,122 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+
+from utils.text_index import WORD, fold_query, fold_text
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """
+    Distance de Levenshtein entre deux chaînes, interrompue dès qu’elle dépasse `max_distance`.
+    Returns:
+        int: La distance, ou `max_distance + 1` si elle est dépassée.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+# :blue_book: Autocomplétion des titres de films
+class TitleAutocomplete:
+    """
+    Moteur de suggestions de titres pour la saisie au fil de la frappe.
+    - Index de préfixes sur tableau trié : chaque début de mot du titre normalisé
+      (accents et casse ignorés) est une clé ; une recherche par dichotomie retourne
+      les titres dont un mot commence par la saisie.
+    - Repli tolérant aux fautes : génération de candidats par trigrammes communs,
+      puis distance d’édition bornée sur le début des mots.
+    Les suggestions sont classées par popularité.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        max_candidates (int): Nombre de candidats trigrammes vérifiés par la distance d’édition.
+    """
+
+    def __init__(self, films, max_candidates=50):
+        self.max_candidates = max_candidates
+        self.tconst = films['tconst'].to_numpy()
+        self.titles = films['title'].fillna('').astype(str).to_numpy()
+        self.popularity = films['popularity'].fillna(0).to_numpy(dtype=np.float64)
+        self.folded = fold_text(films['title']).tolist()
+
+        keys, docs = [], []
+        for doc, title in enumerate(self.folded):
+            for match in WORD.finditer(title):
+                keys.append(title[match.start():])
+                docs.append(doc)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = [keys[i] for i in order]
+        self.key_docs = np.array([docs[i] for i in order], dtype=np.int32)
+
+        # Postings trigrammes des titres (avec marges) pour le repli tolérant aux fautes
+        from sklearn.feature_extraction.text import CountVectorizer  # Import différé : seulement à la construction
+        vectorizer = CountVectorizer(analyzer='char', ngram_range=(3, 3), lowercase=False, binary=True)
+        try:
+            self.trigrams = vectorizer.fit_transform([f' {title} ' for title in self.folded]).tocsc()
+            self.vocabulary = vectorizer.vocabulary_
+        except ValueError:
+            self.trigrams, self.vocabulary = None, {}
+
+    def _rank(self, docs, limit):
+        docs = np.unique(docs)
+        if len(docs) > limit:
+            docs = docs[np.argpartition(-self.popularity[docs], limit - 1)[:limit]]
+        return docs[np.lexsort((docs, -self.popularity[docs]))]
+
+    def _prefix(self, query, limit):
+        start = bisect.bisect_left(self.keys, query)
+        end = bisect.bisect_left(self.keys, query + '\U0010ffff', start)
+        return self._rank(self.key_docs[start:end], limit)
+
+    def _fuzzy(self, query, limit):
+        if self.trigrams is None:
+            return np.empty(0, dtype=np.int32)
+        padded = f' {query}'
+        columns = [self.vocabulary[gram] for gram in {padded[i:i + 3] for i in range(len(padded) - 2)}
+                   if gram in self.vocabulary]
+        if not columns:
+            return np.empty(0, dtype=np.int32)
+        # Nombre de trigrammes communs par titre, puis vérification des meilleurs candidats
+        shared = np.bincount(self.trigrams[:, columns].indices, minlength=len(self.folded))
+        candidates = np.flatnonzero(shared)
+        if len(candidates) > self.max_candidates:
+            candidates = candidates[np.argpartition(-shared[candidates], self.max_candidates - 1)[:self.max_candidates]]
+        max_distance = 1 if len(query) <= 4 else 2
+        scored = []
+        for doc in candidates.tolist():
+            title = self.folded[doc]
+            distance = min(
+                bounded_edit_distance(query, title[match.start():match.start() + len(query)], max_distance)
+                for match in WORD.finditer(title)
+            ) if title else max_distance + 1
+            if distance <= max_distance:
+                scored.append((distance, -self.popularity[doc], doc))
+        scored.sort()
+        return np.array([doc for _, _, doc in scored[:limit]], dtype=np.int32)
+
+    def suggest(self, query, limit=10):
+        """
+        Retourne les suggestions de titres pour une saisie partielle.
+        Args:
+            query (str): Saisie de l’utilisateur.
+            limit (int): Nombre maximal de suggestions.
+        Returns:
+            pd.DataFrame: Colonnes `tconst` et `title`, de la plus à la moins pertinente.
+        """
+        query = fold_query(query)
+        if not query:
+            docs = self._rank(np.arange(len(self.folded)), limit)
+        else:
+            docs = self._prefix(query, limit)
+            if len(docs) < limit and len(query) >= 3:
+                fuzzy = self._fuzzy(query, limit)
+                docs = np.concatenate([docs, fuzzy[~np.isin(fuzzy, docs)]])[:limit]
+        return pd.DataFrame({'tconst': self.tconst[docs], 'title': self.titles[docs]})
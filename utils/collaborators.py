@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+# Emplacement par défaut des tables de co-occurrence précalculées
+DEFAULT_COLLABORATORS_DIR = 'cache/collaborators'
+COLLABORATORS_VERSION = 1
+
+
+# :blue_book: Matrice d’incidence films × intervenants
+def incidence_matrix(graph, categories=None):
+    """
+    Matrice creuse binaire films × intervenants, construite directement sur l’adjacence CSR
+    du graphe (aucune jointure pandas).
+    Args:
+        graph (FilmPersonGraph): L’index graphe films–intervenants.
+        categories (list, optionnel): Catégories retenues ('actor', 'actress', 'director') ; toutes par défaut.
+    Returns:
+        scipy.sparse.csr_matrix: Matrice float32 (films × intervenants).
+    """
+    from scipy import sparse  # Import différé : calcul hors ligne uniquement
+
+    people = graph.film_people
+    rows = np.repeat(np.arange(len(graph.film_keys), dtype=np.int32), np.diff(graph.film_indptr))
+    if categories is not None:
+        codes = [graph.categories.index(category) for category in categories if category in graph.categories]
+        keep = np.isin(graph.film_categories, codes)
+        rows, people = rows[keep], people[keep]
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, people)),
+                               shape=(len(graph.film_keys), len(graph.person_keys)))
+    matrix.data[:] = 1  # Un intervenant crédité deux fois sur un film ne compte qu’une fois
+    return matrix
+
+
+def sparse_top_k(block, k, row_offset=0):
+    """
+    Garde les k plus fortes valeurs de chaque ligne d’un bloc de matrice creuse, par un tri
+    vectorisé (ligne, score décroissant, colonne). L’élément lui-même (colonne égale
+    à `row_offset` + ligne) est exclu.
+    Args:
+        block (scipy.sparse.spmatrix): Bloc de lignes d’une matrice carrée de scores.
+        k (int): Nombre d’entrées conservées par ligne.
+        row_offset (int): Position de la première ligne du bloc dans la matrice complète.
+    Returns:
+        tuple: (indptr int64, indices int32, scores float32) au format CSR.
+    """
+    coo = block.tocoo()
+    rows, columns, scores = coo.row, coo.col, coo.data
+    keep = (rows + row_offset != columns) & (scores > 0)
+    rows, columns, scores = rows[keep], columns[keep], scores[keep]
+    order = np.lexsort((columns, -scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    counts = np.bincount(rows, minlength=block.shape[0])
+    starts = np.cumsum(counts) - counts
+    keep = np.arange(len(rows)) - starts[rows] < k
+    indptr = np.zeros(block.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.minimum(counts, k), out=indptr[1:])
+    return indptr, columns[keep].astype(np.int32), scores[keep].astype(np.float32)
+
+
+def blocked_top_k(left, right, k, block_size=4096):
+    """
+    Calcule `left @ right` par blocs de lignes et ne garde que les k meilleures entrées de chaque ligne :
+    la mémoire reste bornée par le produit d’un seul bloc.
+    Returns:
+        tuple: (indptr int64, indices int32, scores float32) au format CSR.
+    """
+    indptrs, indices, scores = [np.zeros(1, dtype=np.int64)], [], []
+    for start in range(0, left.shape[0], block_size):
+        block_indptr, block_indices, block_scores = sparse_top_k(left[start:start + block_size] @ right, k, start)
+        indptrs.append(block_indptr[1:] + indptrs[-1][-1])
+        indices.append(block_indices)
+        scores.append(block_scores)
+    return (np.concatenate(indptrs),
+            np.concatenate(indices) if indices else np.empty(0, dtype=np.int32),
+            np.concatenate(scores) if scores else np.empty(0, dtype=np.float32))
+
+
+# :blue_book: Tables des collaborateurs et des films à l’équipe proche
+class CollaboratorTable:
+    """
+    Tables de co-occurrence précalculées à partir de la matrice d’incidence films × intervenants B :
+    - intervenants : Bᵀ·B, nombre de films partagés avec chaque autre intervenant (« collaborateurs fréquents ») ;
+    - films : B·diag(idf)·Bᵀ, somme des idf des intervenants partagés (« films avec la même équipe ») ;
+      l’idf réduit le poids des intervenants très prolifiques.
+    Seules les k meilleures entrées par ligne sont conservées (format CSR, chargé en mémoire mappée).
+    Args:
+        people (tuple): (indptr, indices, scores) des intervenants.
+        films (tuple): (indptr, indices, scores) des films.
+        nconst (np.ndarray): Identifiants des intervenants, dans l’ordre des lignes.
+        tconst (np.ndarray): Identifiants des films, dans l’ordre des lignes.
+        manifest (dict, optionnel): Paramètres du calcul.
+    """
+
+    def __init__(self, people, films, nconst, tconst, manifest=None):
+        self.people = people
+        self.films = films
+        self.nconst = nconst
+        self.tconst = tconst
+        self.manifest = manifest or {}
+        self.person_positions = {key: i for i, key in enumerate(nconst.tolist())}
+        self.film_positions = {key: i for i, key in enumerate(tconst.tolist())}
+
+    @classmethod
+    def build(cls, graph, k=20, categories=None, block_size=4096, source_version=None):
+        """
+        Calcule les deux tables à partir du graphe films–intervenants, par produits creux.
+        Args:
+            graph (FilmPersonGraph): L’index graphe films–intervenants.
+            k (int): Nombre de voisins conservés par ligne.
+            categories (list, optionnel): Catégories d’intervenants prises en compte.
+            block_size (int): Nombre de lignes par bloc de produit.
+            source_version (str, optionnel): Version de l’instantané d’origine.
+        """
+        incidence = incidence_matrix(graph, categories)
+        transposed = incidence.T.tocsr()
+        start = time.perf_counter()
+        people = blocked_top_k(transposed, incidence, k, block_size)
+        people_seconds = time.perf_counter() - start
+        films_per_person = np.asarray(incidence.sum(axis=0)).ravel()
+        idf = np.log1p(incidence.shape[0] / np.maximum(films_per_person, 1)).astype(np.float32)
+        start = time.perf_counter()
+        films = blocked_top_k(incidence.multiply(idf).tocsr(), transposed, k, block_size)
+        manifest = {
+            'version': COLLABORATORS_VERSION, 'k': k, 'categories': categories, 'source_version': source_version,
+            'seconds': {'people': round(people_seconds, 3), 'films': round(time.perf_counter() - start, 3)},
+        }
+        return cls(people, films, np.asarray(graph.person_keys, dtype=str), np.asarray(graph.film_keys, dtype=str),
+                   manifest)
+
+    @staticmethod
+    def _row(table, position, n):
+        indptr, indices, scores = table
+        start = indptr[position]
+        end = min(indptr[position + 1], start + n)
+        return indices[start:end], scores[start:end]
+
+    def collaborators(self, nconst, n=10):
+        """
+        Intervenants ayant le plus de films en commun avec `nconst`.
+        Returns:
+            tuple: (nconst np.ndarray, nombre de films partagés np.ndarray), par ordre décroissant.
+        """
+        position = self.person_positions.get(nconst)
+        if position is None:
+            return np.empty(0, dtype=str), np.empty(0, dtype=np.float32)
+        indices, scores = self._row(self.people, position, n)
+        return self.nconst[indices], scores
+
+    def crew_recommendations(self, tconst, n=10):
+        """
+        Films partageant le plus d’intervenants (pondérés par idf) avec `tconst`.
+        Returns:
+            tuple: (tconst np.ndarray, scores np.ndarray), par ordre décroissant.
+        """
+        position = self.film_positions.get(tconst)
+        if position is None:
+            return np.empty(0, dtype=str), np.empty(0, dtype=np.float32)
+        indices, scores = self._row(self.films, position, n)
+        return self.tconst[indices], scores
+
+    def save(self, path=DEFAULT_COLLABORATORS_DIR):
+        """
+        Enregistre les tables dans `path` (tableaux `.npy` et manifeste JSON), avec publication atomique.
+        """
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name, table in (('people', self.people), ('films', self.films)):
+            for part, array in zip(('indptr', 'indices', 'scores'), table):
+                np.save(os.path.join(tmp_path, f'{name}.{part}.npy'), array)
+        np.save(os.path.join(tmp_path, 'nconst.npy'), self.nconst)
+        np.save(os.path.join(tmp_path, 'tconst.npy'), self.tconst)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_COLLABORATORS_DIR):
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        tables = {name: tuple(np.load(os.path.join(path, f'{name}.{part}.npy'), mmap_mode='r')
+                              for part in ('indptr', 'indices', 'scores'))
+                  for name in ('people', 'films')}
+        return cls(tables['people'], tables['films'], np.load(os.path.join(path, 'nconst.npy')),
+                   np.load(os.path.join(path, 'tconst.npy')), manifest)
+
+    @staticmethod
+    def exists(path=DEFAULT_COLLABORATORS_DIR):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def matches(self, source_version):
+        """
+        Vérifie que les tables ont été calculées sur la version courante de l’instantané.
+        """
+        return self.manifest.get('version') == COLLABORATORS_VERSION \
+            and self.manifest.get('source_version') == source_version
+
+
+if __name__ == '__main__':
+    from utils.graph_index import FilmPersonGraph
+    from utils.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Précalcul des collaborateurs fréquents et des films à l’équipe proche.")
+    parser.add_argument('--k', type=int, default=20, help="Nombre de voisins conservés par ligne")
+    parser.add_argument('--categories', nargs='*', default=None, help="Catégories d’intervenants (toutes par défaut)")
+    parser.add_argument('--block-size', type=int, default=4096, help="Lignes par bloc de produit creux")
+    parser.add_argument('--out', default=DEFAULT_COLLABORATORS_DIR, help="Répertoire de sortie")
+    args = parser.parse_args()
+    version, catalog = load_snapshot()
+    graph = FilmPersonGraph(catalog['films'], catalog['intervenants'], catalog['lien'])
+    table = CollaboratorTable.build(graph, args.k, args.categories, args.block_size, version)
+    table.save(args.out)
+    print(table.manifest)
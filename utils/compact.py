@@ -0,0 +1,303 @@
+import argparse
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def code_dtype(n_values):
+    # Plus petit type entier signé capable d’indexer `n_values` valeurs (-1 pour les manquantes)
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_values < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def is_mapped(array):
+    # Vrai si le tableau est une vue d’un fichier mappé : ses pages sont partagées entre processus
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def exact_float64(series):
+    """
+    Convertit une colonne float32 en float64 sans artefacts d’arrondi binaire
+    (6.9 reste 6.9 et non 6.900000095367432), en passant par la représentation décimale la plus courte.
+    """
+    values = series.to_numpy()
+    if values.dtype == np.float32:
+        values = values.astype(str).astype(np.float64)
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+# :blue_book: Champ multivalué stocké en tableaux d’offsets
+class MultiValue:
+    """
+    Champ multivalué (ex. `genres`, `knownForTitles`) stocké sans chaînes Python :
+    les valeurs de toutes les lignes sont concaténées sous forme de codes entiers
+    dans `values`, la ligne i occupant `values[offsets[i]:offsets[i + 1]]`.
+    Args:
+        values (np.ndarray): Codes des valeurs (int32), concaténés ligne après ligne.
+        offsets (np.ndarray): Offsets (int64) de taille n + 1.
+        vocabulary (pd.Index): Table de correspondance code → chaîne.
+    """
+
+    def __init__(self, values, offsets, vocabulary):
+        self.values = values
+        self.offsets = offsets
+        self.vocabulary = vocabulary
+
+    @classmethod
+    def from_strings(cls, series, vocabulary=None, sep=','):
+        """
+        Construit le champ à partir d’une colonne de chaînes séparées par `sep`.
+        Les espaces sont retirés et les éléments vides ignorés ; les valeurs absentes
+        d’un vocabulaire imposé sont ignorées.
+        """
+        series = series.reset_index(drop=True)  # Labels = positions des lignes
+        items = series.fillna('').astype(str).str.split(sep).explode().str.strip()
+        items = items[items != '']
+        if vocabulary is None:
+            vocabulary = pd.Index(np.sort(items.unique()))
+        codes = vocabulary.get_indexer(items)
+        rows = items.index.to_numpy()
+        known = codes >= 0
+        offsets = np.zeros(len(series) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[known], minlength=len(series)), out=offsets[1:])
+        return cls(codes[known].astype(np.int32), offsets, vocabulary)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def row_positions(self):
+        # Position de la ligne propriétaire de chaque valeur (équivalent d’un `explode`)
+        return np.repeat(np.arange(len(self), dtype=np.int32), self.lengths())
+
+    def row(self, i):
+        return self.vocabulary[self.values[self.offsets[i]:self.offsets[i + 1]]].tolist()
+
+    def take(self, positions):
+        """
+        Retourne le champ restreint aux lignes `positions`, dans cet ordre.
+        """
+        positions = np.asarray(positions)
+        starts, lengths = self.offsets[positions], self.lengths()[positions]
+        offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return MultiValue(self.values[gather], offsets, self.vocabulary)
+
+    def contains(self, value):
+        """
+        Masque booléen des lignes contenant `value`.
+        """
+        code = self.vocabulary.get_indexer([value])[0]
+        if code < 0:
+            return np.zeros(len(self), dtype=bool)
+        return np.bincount(self.row_positions()[self.values == code], minlength=len(self)) > 0
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.offsets.nbytes
+
+
+# :blue_book: Bloc de chaînes UTF-8 partageable entre processus
+class StringBlock:
+    """
+    Chaînes stockées sans objets Python : un bloc UTF-8 contigu (chaque chaîne suivie d’un octet NUL)
+    et des offsets int64 ; la chaîne i occupe `data[offsets[i]:offsets[i + 1] - 1]`.
+    Le bloc est un `bytes` ou, une fois enregistré, un fichier mappé en lecture seule dont les pages
+    sont partagées entre processus. Les chaînes ne sont décodées qu’à la demande.
+    Args:
+        data (bytes ou mmap.mmap): Le bloc UTF-8.
+        offsets (np.ndarray): Offsets de taille n + 1.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, values):
+        encoded = [str(value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) + 1 for value in encoded], out=offsets[1:])
+        return cls(b''.join(value + b'\x00' for value in encoded), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        # Octets de la chaîne i (l’ordre des octets UTF-8 est celui des points de code : `bisect` fonctionne)
+        return self.data[self.offsets[i]:self.offsets[i + 1] - 1]
+
+    def decode(self, i):
+        return self[i].decode('utf-8')
+
+    def find(self, needle):
+        """
+        Positions des chaînes contenant `needle` (octets UTF-8, non vide), par un parcours vectorisé du bloc :
+        positions du premier octet, filtrées par les octets suivants.
+        """
+        data = np.frombuffer(self.data, dtype=np.uint8)
+        positions = np.flatnonzero(data[:max(len(data) - len(needle) + 1, 0)] == needle[0])
+        for shift, byte in enumerate(needle[1:], start=1):
+            positions = positions[data[positions + shift] == byte]
+        rows = np.searchsorted(self.offsets, positions, side='right') - 1
+        return np.unique(rows).astype(np.int32)
+
+    def contains(self, rows, needle):
+        """
+        Masque des chaînes `rows` contenant `needle` (octets UTF-8), sans décodage.
+        """
+        starts, ends = self.offsets[rows], self.offsets[np.asarray(rows) + 1] - 1
+        return np.array([self.data.find(needle, start, end) != -1
+                         for start, end in zip(starts.tolist(), ends.tolist())], dtype=bool)
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.nbytes
+
+    def save(self, base):
+        with open(f'{base}.bin', 'wb') as f:
+            f.write(self.data)
+        np.save(f'{base}.offsets.npy', self.offsets)
+
+    @classmethod
+    def load(cls, base):
+        """
+        Mappe en lecture seule un bloc enregistré par `save`.
+        """
+        # Vue ndarray du mappage : l’accès élément par élément évite le surcoût de `np.memmap`
+        offsets = np.asarray(np.load(f'{base}.offsets.npy', mmap_mode='r'))
+        if os.path.getsize(f'{base}.bin') == 0:
+            return cls(b'', offsets)
+        with open(f'{base}.bin', 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), offsets)
+
+
+# :blue_book: Catalogue compact partagé par les pages
+class CompactCatalog:
+    """
+    Représentation compacte des trois tables :
+    - identifiants (`tconst`, `nconst`) en codes entiers sur une table de correspondance
+      commune à toutes les tables (un seul exemplaire de chaque chaîne) ;
+    - colonnes peu variées en catégories, colonnes numériques en float32 ;
+    - champs multivalués (`genres`, `knownForTitles`) en tableaux d’offsets (`MultiValue`).
+    Les DataFrames restent utilisables comme avant (`==`, `isin`, `.str`) grâce aux catégories.
+    Chargés depuis l’instantané, les tableaux d’entiers et de flottants (codes, valeurs, offsets)
+    restent mappés et partagés entre processus ; les chaînes (catégories, vocabulaires, tables
+    d’identifiants, colonnes de texte) sont des objets Python propres à chaque processus
+    (voir `memory_split`).
+    Args:
+        tables (dict): {nom de table: pd.DataFrame}.
+        fields (dict): {(table, colonne): MultiValue}.
+        ids (dict): {espace d’identifiants: pd.Index}.
+        version (str, optionnel): Version de l’instantané d’origine.
+    """
+
+    def __init__(self, tables, fields, ids, version=None):
+        self.tables = tables
+        self.fields = fields
+        self.ids = ids
+        self.version = version
+
+    def __getitem__(self, table):
+        return self.tables[table]
+
+    def __contains__(self, table):
+        return table in self.tables
+
+    def field(self, table, column):
+        return self.fields[(table, column)]
+
+    def _is_id_table(self, index):
+        return any(index is ids for ids in self.ids.values())
+
+    def memory_split(self):
+        """
+        Mémoire par table, en octets, séparée entre :
+        - « mappé » : tableaux lus en mémoire mappée depuis l’instantané (valeurs numériques, codes
+          des catégories, champs multivalués), partagés entre processus par le cache du système ;
+        - « par processus » : objets Python décodés dans chaque processus (colonnes de chaînes,
+          catégories et vocabulaires, tables d’identifiants).
+        Les tables de correspondance des identifiants sont comptées à part (ligne `ids`), une seule fois.
+        Returns:
+            dict: {table: {'mappé': octets, 'par processus': octets}}.
+        """
+        split = {}
+        for name, df in self.tables.items():
+            mapped, private = 0, int(df.index.memory_usage(deep=True))
+            for column in df.columns:
+                series = df[column]
+                if isinstance(series.dtype, pd.CategoricalDtype):
+                    codes = series.cat.codes.to_numpy()
+                    if is_mapped(series.array.codes):
+                        mapped += codes.nbytes
+                    else:
+                        private += codes.nbytes
+                    if not self._is_id_table(series.cat.categories):
+                        private += int(series.cat.categories.memory_usage(deep=True))
+                elif series.dtype == object:
+                    private += int(series.memory_usage(deep=True, index=False))
+                elif is_mapped(series.to_numpy()):
+                    mapped += series.to_numpy().nbytes
+                else:
+                    private += series.to_numpy().nbytes
+            split[name] = {'mappé': mapped, 'par processus': private}
+        for (name, _), field in self.fields.items():
+            arrays = (field.values, field.offsets)
+            split[name]['mappé'] += sum(array.nbytes for array in arrays if is_mapped(array))
+            split[name]['par processus'] += sum(array.nbytes for array in arrays if not is_mapped(array))
+            if not self._is_id_table(field.vocabulary):
+                split[name]['par processus'] += int(field.vocabulary.memory_usage(deep=True))
+        split['ids'] = {'mappé': 0,
+                        'par processus': sum(int(index.memory_usage(deep=True)) for index in self.ids.values())}
+        return split
+
+    def memory_usage(self):
+        """
+        Mémoire occupée par table, en octets (mappée et par processus, voir `memory_split`).
+        """
+        return {name: sizes['mappé'] + sizes['par processus'] for name, sizes in self.memory_split().items()}
+
+
+def memory_report():
+    """
+    Compare la mémoire des tables chargées avec les types pandas par défaut (`read_csv`)
+    à celle du catalogue compact. La mémoire du catalogue est séparée entre la part mappée
+    (partagée entre les processus d’un même hôte) et la part propre à chaque processus :
+    c’est cette dernière qui s’ajoute à chaque worker Streamlit.
+    Returns:
+        pd.DataFrame: Mémoire par table en Mo (avant, après, dont mappé, dont par processus, gains).
+    """
+    from utils import snapshot
+
+    before = {table: pd.read_csv(snapshot.csv_path(table)).memory_usage(deep=True).sum()
+              for table in snapshot.TABLES}
+    _, catalog = snapshot.load_snapshot()
+    split = catalog.memory_split()
+    report = pd.DataFrame({
+        'avant (Mo)': pd.Series(before, dtype=float),
+        'après (Mo)': pd.Series({name: sum(sizes.values()) for name, sizes in split.items()}, dtype=float),
+        'dont mappé (Mo)': pd.Series({name: sizes['mappé'] for name, sizes in split.items()}, dtype=float),
+        'dont par processus (Mo)': pd.Series({name: sizes['par processus'] for name, sizes in split.items()},
+                                             dtype=float),
+    }).fillna(0) / 2 ** 20
+    report.loc['total'] = report.sum()
+    before_mb = report['avant (Mo)'].where(report['avant (Mo)'] > 0)
+    report['gain'] = 1 - report['après (Mo)'] / before_mb
+    report['gain par processus'] = 1 - report['dont par processus (Mo)'] / before_mb
+    return report.round(2)
+
+
+if __name__ == '__main__':
+    argparse.ArgumentParser(description="Rapport mémoire : types pandas par défaut vs catalogue compact.").parse_args()
+    print(memory_report().to_string())
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+# Nombre de bits à 1 pour chaque valeur d’octet (comptage des bitsets)
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """
+    Compte les bits à 1 d’un bitset (ou de chaque ligne d’un tableau de bitsets).
+    """
+    return POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+def facet_values(films, genres=None):
+    """
+    Calcule les valeurs de facettes de chaque film.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        genres (MultiValue, optionnel): Genres déjà découpés en tableaux d’offsets (voir `utils/compact.py`).
+    Returns:
+        dict: {facette: pd.Series ou MultiValue} ; la facette 'genre' contient des listes de genres.
+    """
+    return {
+        'decade': pd.to_datetime(films['release_date'], errors='coerce').dt.year // 10 * 10,
+        'genre': genres if genres is not None else films['genres'].astype(object).fillna('').str.split(',').apply(
+            lambda values: [genre.strip() for genre in values if genre.strip()]),
+        'country': films['origin_country'].astype(object),
+        'rating': films['averageRating'].round(),
+    }
+
+
+# :blue_book: Index de facettes à base de bitsets
+class FacetIndex:
+    """
+    Index de filtres à facettes (décennie, genre, pays, note arrondie) pour la page d’accueil.
+    Chaque valeur de facette est un bitset compact (un bit par film) ; une combinaison de filtres
+    se résout par un ET bit à bit et le nombre de films restants pour chaque option s’obtient
+    par comptage des bits, sans parcourir le DataFrame.
+    Les bits suivent l’ordre des lignes du DataFrame fourni (par exemple trié par popularité) :
+    les premiers bits à 1 sont donc les premiers films à afficher.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films, dans l’ordre d’affichage souhaité.
+        genres (MultiValue, optionnel): Genres des films dans le même ordre ; évite le découpage des chaînes.
+    """
+
+    def __init__(self, films, genres=None):
+        self.labels = films.index.to_numpy()
+        self.n_films = len(films)
+        self.all_bits = np.packbits(np.ones(self.n_films, dtype=bool))
+        self.options = {}
+        self.bitsets = {}
+        for facet, values in facet_values(films, genres).items():
+            if isinstance(values, pd.Series):
+                # Index positionnel : une ligne explosée garde la position de son film
+                values = values.reset_index(drop=True)
+                exploded = (values.explode() if facet == 'genre' else values).dropna()
+                if facet in ('decade', 'rating'):
+                    exploded = exploded.astype(int)
+                positions = exploded.index.to_numpy()
+                options, codes = np.unique(exploded.to_numpy(), return_inverse=True)
+            else:
+                # Champ multivalué : les codes et positions sont déjà disponibles
+                positions = values.row_positions()
+                used, codes = np.unique(values.values, return_inverse=True)
+                options = values.vocabulary[used].to_numpy()
+            bitsets = np.zeros((len(options), len(self.all_bits)), dtype=np.uint8)
+            np.bitwise_or.at(bitsets, (codes, positions // 8), (128 >> (positions % 8)).astype(np.uint8))
+            self.options[facet] = [option.item() if hasattr(option, 'item') else option for option in options]
+            self.bitsets[facet] = bitsets
+
+    def _option_bits(self, facet, value):
+        try:
+            return self.bitsets[facet][self.options[facet].index(value)]
+        except ValueError:
+            return np.zeros_like(self.all_bits)
+
+    def filter(self, selection, exclude=None):
+        """
+        Combine les filtres sélectionnés par un ET bit à bit.
+        Args:
+            selection (dict): {facette: valeur} ; les valeurs vides ou None sont ignorées.
+            exclude (str, optionnel): Facette à ignorer (pour le calcul de ses propres compteurs).
+        Returns:
+            np.ndarray: Bitset des films correspondant aux filtres.
+        """
+        bits = self.all_bits.copy()
+        for facet, value in selection.items():
+            if facet != exclude and value not in (None, ''):
+                np.bitwise_and(bits, self._option_bits(facet, value), out=bits)
+        return bits
+
+    def counts(self, facet, selection):
+        """
+        Nombre de films restants pour chaque option d’une facette, compte tenu des autres filtres.
+        Args:
+            facet (str): Facette dont on veut les compteurs.
+            selection (dict): Filtres actuellement sélectionnés.
+        Returns:
+            dict: {option: nombre de films}.
+        """
+        base = self.filter(selection, exclude=facet)
+        counts = popcount(self.bitsets[facet] & base)
+        return dict(zip(self.options[facet], counts.tolist()))
+
+    def count(self, bits):
+        return int(popcount(bits))
+
+    def matches(self, bits, limit=None):
+        """
+        Retourne les labels (index du DataFrame d’origine) des films d’un bitset, dans l’ordre de l’index.
+        Args:
+            bits (np.ndarray): Bitset retourné par `filter`.
+            limit (int, optionnel): Nombre maximal de films ; seuls les octets nécessaires sont décodés.
+        Returns:
+            np.ndarray: Labels des films.
+        """
+        if limit is None:
+            positions = np.flatnonzero(np.unpackbits(bits, count=self.n_films))
+        else:
+            # Décodage limité aux premiers octets non nuls nécessaires pour `limit` films
+            nonzero = np.flatnonzero(bits)
+            needed = nonzero[:np.searchsorted(np.cumsum(POPCOUNT[bits[nonzero]]), limit) + 1]
+            rows, offsets = np.nonzero(np.unpackbits(bits[needed]).reshape(-1, 8))
+            positions = (needed[rows] * 8 + offsets)[:limit]
+        return self.labels[positions]
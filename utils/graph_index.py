@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# Codes entiers des catégories de `lien` (les catégories inconnues sont ajoutées à la suite)
+CATEGORIES = ['actor', 'actress', 'director']
+
+
+def _dense_ids(primary, extra):
+    # Identifiants denses : d’abord l’ordre de la table principale, puis les identifiants absents de celle-ci
+    keys = pd.Index(primary).drop_duplicates()
+    missing = pd.Index(extra).drop_duplicates().difference(keys, sort=False)
+    keys = keys.append(missing)
+    rows = np.full(len(keys), -1, dtype=np.int32)
+    first = ~pd.Index(primary).duplicated()
+    rows[keys.get_indexer(pd.Index(primary)[first])] = np.flatnonzero(first)
+    return keys, rows
+
+
+def _csr(sources, targets, categories, n_sources):
+    # Tri stable : l’ordre d’origine de `lien` est conservé à l’intérieur de chaque ligne
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(n_sources + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_sources), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32), categories[order]
+
+
+# :blue_book: Index graphe films–intervenants
+class FilmPersonGraph:
+    """
+    Graphe biparti films–intervenants construit à partir de `lien`.
+    Les `tconst` et `nconst` sont convertis en identifiants entiers denses (int32) et les liens
+    sont stockés sous forme de deux matrices d’adjacence CSR (film → intervenants,
+    intervenant → films), la catégorie étant conservée sous forme de petit code entier.
+    Les recherches de distribution et de filmographie coûtent O(degré) au lieu de O(|lien|).
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        intervenants (pd.DataFrame): Le DataFrame des intervenants.
+        lien (pd.DataFrame): Le DataFrame des liens entre films et intervenants.
+    """
+
+    def __init__(self, films, intervenants, lien):
+        self.film_keys, self.film_rows = _dense_ids(films['tconst'], lien['tconst'])
+        self.person_keys, self.person_rows = _dense_ids(intervenants['nconst'], lien['nconst'])
+        self.film_ids = {key: i for i, key in enumerate(self.film_keys)}
+        self.person_ids = {key: i for i, key in enumerate(self.person_keys)}
+
+        categories = pd.Index(CATEGORIES).append(
+            pd.Index(lien['category'].astype(str).unique()).difference(CATEGORIES, sort=False))
+        self.categories = list(categories)
+        category_codes = categories.get_indexer(lien['category'].astype(str)).astype(np.int8)
+
+        film_codes = self.film_keys.get_indexer(lien['tconst']).astype(np.int32)
+        person_codes = self.person_keys.get_indexer(lien['nconst']).astype(np.int32)
+        self.film_indptr, self.film_people, self.film_categories = _csr(
+            film_codes, person_codes, category_codes, len(self.film_keys))
+        self.person_indptr, self.person_films, self.person_categories = _csr(
+            person_codes, film_codes, category_codes, len(self.person_keys))
+
+    def _category_code(self, category):
+        return self.categories.index(category) if category in self.categories else -1
+
+    def people(self, tconst, category=None):
+        """
+        Retourne les identifiants des intervenants d’un film, dans l’ordre de `lien`.
+        Args:
+            tconst (str): Identifiant du film.
+            category (str, optionnel): Filtre sur la catégorie ('actor', 'actress', 'director').
+        Returns:
+            np.ndarray: Identifiants entiers des intervenants.
+        """
+        film_id = self.film_ids.get(tconst)
+        if film_id is None:
+            return np.empty(0, dtype=np.int32)
+        start, end = self.film_indptr[film_id], self.film_indptr[film_id + 1]
+        people = self.film_people[start:end]
+        if category is not None:
+            people = people[self.film_categories[start:end] == self._category_code(category)]
+        return people
+
+    def films_of(self, nconst, category=None):
+        """
+        Retourne les identifiants des films d’un intervenant, dans l’ordre de `lien`.
+        Args:
+            nconst (str): Identifiant de l’intervenant.
+            category (str, optionnel): Filtre sur la catégorie ('actor', 'actress', 'director').
+        Returns:
+            np.ndarray: Identifiants entiers des films.
+        """
+        person_id = self.person_ids.get(nconst)
+        if person_id is None:
+            return np.empty(0, dtype=np.int32)
+        start, end = self.person_indptr[person_id], self.person_indptr[person_id + 1]
+        films = self.person_films[start:end]
+        if category is not None:
+            films = films[self.person_categories[start:end] == self._category_code(category)]
+        return films
+
+    def person_table_rows(self, person_ids):
+        """
+        Convertit des identifiants d’intervenants en positions dans le DataFrame `intervenants`
+        (les intervenants absents de la table sont ignorés).
+        """
+        rows = self.person_rows[person_ids]
+        return rows[rows >= 0]
+
+    def film_table_rows(self, film_ids):
+        """
+        Convertit des identifiants de films en positions dans le DataFrame `films`
+        (les films absents de la table sont ignorés).
+        """
+        rows = self.film_rows[film_ids]
+        return rows[rows >= 0]
+
+    def film_tconsts(self, film_ids):
+        return self.film_keys[film_ids]
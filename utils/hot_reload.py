@@ -0,0 +1,212 @@
+import argparse
+import threading
+import time
+
+from utils.snapshot import TABLES, content_version, load_snapshot, source_stats
+
+# Intervalle (s) entre deux vérifications des fichiers CSV
+DEFAULT_INTERVAL = 5.0
+
+_MISSING = object()
+
+
+# :blue_book: Génération de données : catalogue et structures dérivées
+class DataGeneration:
+    """
+    Catalogue chargé à un instant donné et structures qui en dérivent (index graphe,
+    index de recherche, matrice des caractéristiques...). Une génération n’est jamais modifiée
+    après sa publication : une session qui la tient continue de la servir pendant un rechargement.
+    Args:
+        number (int): Numéro de la génération.
+        version (str): Version de l’instantané d’origine.
+        catalog (CompactCatalog): Les tables chargées.
+    """
+
+    def __init__(self, number, version, catalog):
+        self.number = number
+        self.version = version
+        self.catalog = catalog
+        self.timings = {}
+        self._factories = {}
+        self._resources = {}
+        self._lock = threading.RLock()
+
+    def get(self, name, factory):
+        """
+        Retourne la structure `name`, construite au premier appel par `factory(generation)` ;
+        une structure peut ainsi s’appuyer sur une autre structure de la même génération.
+        """
+        resource = self._resources.get(name, _MISSING)
+        if resource is _MISSING:
+            with self._lock:
+                resource = self._resources.get(name, _MISSING)
+                if resource is _MISSING:
+                    start = time.perf_counter()
+                    resource = factory(self)
+                    self.timings[name] = round(time.perf_counter() - start, 3)
+                    self._factories[name] = factory
+                    self._resources[name] = resource
+        return resource
+
+    def discard(self, name):
+        # Oublie une structure (ex. fichier hors ligne reconstruit) : le prochain `get` la reconstruit
+        with self._lock:
+            self._resources.pop(name, None)
+            self._factories.pop(name, None)
+
+    def loaded(self):
+        # Structures construites, avec leur fonction de construction (pour préchauffer la génération suivante)
+        return dict(self._factories)
+
+
+# :blue_book: Rechargement à chaud des données en arrière-plan
+class DataReloader:
+    """
+    Surveille les fichiers CSV et publie une nouvelle génération lorsqu’ils changent.
+    La détection compare d’abord la taille et la date de modification, puis l’empreinte
+    du contenu (un simple `touch` ne déclenche pas de reconstruction). La reconstruction
+    (instantané, structures déjà utilisées par la génération courante) a lieu sur un fil d’exécution
+    en arrière-plan ; la nouvelle génération remplace ensuite la courante en une seule affectation.
+    Les abonnés qui modifient un état partagé (ex. base vectorielle) ne sont notifiés qu’après la bascule.
+    Args:
+        tables (list): Noms de base des tables surveillées.
+        interval (float): Intervalle en secondes entre deux vérifications.
+    """
+
+    def __init__(self, tables=TABLES, interval=DEFAULT_INTERVAL):
+        self.tables = tables
+        self.interval = interval
+        self.last_reload = None
+        self.last_error = None
+        self._subscribers = {}
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = source_stats(tables)
+        version, catalog = load_snapshot(tables)
+        self._current = DataGeneration(1, version, catalog)
+
+    @property
+    def current(self):
+        return self._current
+
+    def subscribe(self, callback, name=None):
+        """
+        Enregistre `callback(generation)`, appelé en arrière-plan avec chaque nouvelle génération
+        une fois publiée (ex. mise à jour incrémentale de la base vectorielle). Les structures propres
+        à une génération ne passent pas par un abonné : elles sont construites par `DataGeneration.get`.
+        Un nouvel abonnement sous le même nom (par défaut, le même `callback`) remplace le précédent :
+        une ressource recréée (ex. après `st.cache_resource.clear()`) ne laisse pas l’ancienne abonnée.
+        """
+        self._subscribers[name or callback] = callback
+
+    def unsubscribe(self, name):
+        # `name` : nom donné à `subscribe`, ou le `callback` lui-même
+        self._subscribers.pop(name, None)
+
+    def changed(self):
+        """
+        Indique si le contenu des CSV a changé depuis la génération courante.
+        """
+        stats = source_stats(self.tables)
+        if stats == self._stats:
+            return False
+        self._stats = stats
+        return content_version(self.tables) != self._current.version
+
+    def reload(self):
+        """
+        Construit et publie une nouvelle génération.
+        Returns:
+            dict: Durées (s) de chaque étape et durée totale.
+        """
+        with self._reload_lock:
+            previous = self._current
+            start = time.perf_counter()
+            version, catalog = load_snapshot(self.tables)
+            generation = DataGeneration(previous.number + 1, version, catalog)
+            timings = {'snapshot': round(time.perf_counter() - start, 3)}
+            # Préchauffage : les structures déjà utilisées sont reconstruites avant la bascule
+            for name, factory in previous.loaded().items():
+                generation.get(name, factory)
+            timings.update(generation.timings)
+            self._current = generation  # Bascule atomique : les sessions en cours gardent `previous`
+            # Abonnés notifiés après la bascule : un échec n’empêche pas la publication, il est signalé
+            errors = []
+            for callback in list(self._subscribers.values()):
+                step = time.perf_counter()
+                try:
+                    callback(generation)
+                except Exception as e:
+                    errors.append(f'{getattr(callback, "__name__", "subscriber")}: {type(e).__name__}: {e}')
+                timings[getattr(callback, '__name__', 'subscriber')] = round(time.perf_counter() - step, 3)
+            timings['total'] = round(time.perf_counter() - start, 3)
+            self.last_reload = {'generation': generation.number, 'version': version,
+                                'finished_at': time.time(), 'timings': timings, 'errors': errors}
+            return timings
+
+    def check(self):
+        """
+        Recharge les données si les CSV ont changé.
+        Returns:
+            bool: True si une nouvelle génération a été publiée.
+        """
+        try:
+            if not self.changed():
+                return False
+            self.reload()
+            self.last_error = '; '.join(self.last_reload['errors']) or None
+            return True
+        except Exception as e:
+            # Fichier en cours d’écriture ou invalide : la génération courante reste servie
+            self.last_error = f'{type(e).__name__}: {e}'
+            self._stats = None  # Nouvelle tentative à la prochaine vérification
+            return False
+
+    def start(self):
+        """
+        Démarre la surveillance en arrière-plan (fil démon).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='data-reloader', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Génération courante, durées de construction de ses structures et du dernier rechargement.
+        """
+        generation = self._current
+        return {
+            'generation': generation.number,
+            'version': generation.version,
+            'structures': dict(generation.timings),
+            'last_reload': self.last_reload,
+            'last_error': self.last_error,
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Surveille les CSV et affiche les durées de rechargement.")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Intervalle entre deux vérifications (s)")
+    args = parser.parse_args()
+    reloader = DataReloader(interval=args.interval)
+    print(reloader.stats())
+    try:
+        while True:
+            if reloader.check():
+                print(reloader.stats())
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,100 @@
+import argparse
+import ast
+import os
+import re
+import subprocess
+import sys
+
+# Pages Streamlit mesurées
+ENTRY_POINTS = ['home_page.py', 'pages/details_page.py', 'pages/recommendations_page.py']
+
+# Budget (ms) des imports propres à l’application, au-delà de Streamlit lui-même
+DEFAULT_BUDGET_MS = 500
+
+# Dépendances lourdes qui ne doivent être importées qu’au premier usage
+DEFERRED_PACKAGES = ('sklearn', 'scipy', 'openai', 'langchain', 'chromadb')
+
+# Ligne de sortie de `-X importtime` : « import time: self | cumulative | module »
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def entry_imports(path):
+    """
+    Extrait les instructions d’import de niveau module d’une page Streamlit.
+    Returns:
+        list: Le code source de chaque instruction d’import.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    return [ast.get_source_segment(source, node) for node in ast.parse(source).body
+            if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def measure(statements, cwd=ROOT):
+    """
+    Exécute les imports dans un interpréteur neuf avec `-X importtime`.
+    Streamlit est importé en premier : les coûts rapportés sont ceux des imports de l’application.
+    Returns:
+        list: Tuples (module, cumulatif en µs, profondeur) dans l’ordre de la sortie.
+    """
+    code = '\n'.join(['import streamlit'] + statements)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(2)), len(match.group(3)) // 2))
+    return rows
+
+
+def report(path, budget_ms, top=8):
+    """
+    Mesure le coût d’import d’une page et vérifie le budget.
+    Returns:
+        dict: Total (ms), modules les plus coûteux, dépendances lourdes chargées et verdict.
+    """
+    rows = measure(entry_imports(os.path.join(ROOT, path)))
+    # Les modules de premier niveau apparaissent après leurs dépendances ; on ignore Streamlit
+    start = next(i for i, (module, _, depth) in enumerate(rows) if module == 'streamlit' and depth == 0) + 1
+    app_rows = rows[start:]
+    top_level = [(module, cumulative) for module, cumulative, depth in app_rows if depth == 0]
+    total_ms = sum(cumulative for _, cumulative in top_level) / 1000
+    deferred = sorted({module.split('.')[0] for module, _, _ in app_rows
+                       if module.split('.')[0] in DEFERRED_PACKAGES})
+    return {
+        'entry': path,
+        'total_ms': round(total_ms, 1),
+        'heaviest': sorted(top_level, key=lambda row: -row[1])[:top],
+        'deferred_loaded': deferred,
+        'ok': total_ms <= budget_ms and not deferred,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Vérifie le budget de temps d’import des pages Streamlit.')
+    parser.add_argument('entries', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS, help='Budget en millisecondes.')
+    parser.add_argument('--runs', type=int, default=3, help='Mesures par page (la meilleure est retenue).')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for entry in args.entries:
+        result = min((report(entry, args.budget) for _ in range(args.runs)), key=lambda r: r['total_ms'])
+        failed |= not result['ok']
+        print(f"{'OK ' if result['ok'] else 'KO '} {result['entry']}: {result['total_ms']} ms "
+              f"(budget {args.budget:g} ms)")
+        for module, cumulative in result['heaviest']:
+            print(f'      {cumulative / 1000:8.1f} ms  {module}')
+        if result['deferred_loaded']:
+            print(f"      importés au démarrage alors qu’ils devraient être différés : "
+                  f"{', '.join(result['deferred_loaded'])}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
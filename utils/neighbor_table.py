@@ -0,0 +1,326 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.recommendation import RecommendationIndex
+
+# Emplacement par défaut de la table des voisins précalculés
+DEFAULT_TABLE_DIR = 'cache/neighbors'
+TABLE_VERSION = 2
+
+# Dérive relative (en écarts interquartiles) tolérée sur la médiane et l’écart interquartile
+# enregistrés avant de réajuster la normalisation et de tout reconstruire
+SCALING_TOLERANCE = 0.05
+
+# Matrice partagée par les processus du pool (initialisée une fois par processus)
+_WORKER_STATE = {}
+
+
+# :blue_book: Calcul vectorisé des distances pondérées par blocs
+def block_distances(matrix, genre_mask, rows, targets=None, genre_weight=10):
+    """
+    Calcule les distances euclidiennes pondérées au carré entre un bloc de films de référence
+    et un ensemble de films cibles, en une seule série de produits matriciels.
+    Chaque film de référence applique sa propre pondération des genres (comme `get_recommendations`) :
+    d²(s, i) = Σ w_s² x_i² - 2 Σ w_s² x_s x_i + Σ w_s² x_s².
+    Args:
+        matrix (np.ndarray): Matrice float32 des caractéristiques (N × F).
+        genre_mask (np.ndarray): Masque booléen des colonnes de genres.
+        rows (np.ndarray): Positions des films de référence (B).
+        targets (np.ndarray, optionnel): Positions des films cibles ; tous les films par défaut.
+        genre_weight (int): Poids attribué aux genres du film de référence.
+    Returns:
+        np.ndarray: Matrice float64 des distances au carré (B × N ou B × T).
+    """
+    seeds = matrix[rows].astype(np.float64)
+    candidates = matrix if targets is None else matrix[targets]
+    candidates = candidates.astype(np.float64)
+    weights = np.ones_like(seeds)
+    weights[:, genre_mask] = np.where(seeds[:, genre_mask] == 1, genre_weight, 1)
+    w2 = weights ** 2
+    squared = w2 @ (candidates ** 2).T
+    squared -= 2 * (w2 * seeds) @ candidates.T
+    squared += (w2 * seeds ** 2).sum(axis=1, keepdims=True)
+    np.maximum(squared, 0, out=squared)
+    return squared
+
+
+def _top_k(squared, rows, k):
+    # Exclusion du film lui-même puis sélection partielle des k plus proches
+    squared[np.arange(len(rows)), rows] = np.inf
+    candidates = np.argpartition(squared, k - 1, axis=1)[:, :k]
+    candidate_distances = np.take_along_axis(squared, candidates, axis=1)
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    distances = np.empty((len(rows), k), dtype=np.float32)
+    for i in range(len(rows)):
+        order = np.lexsort((candidates[i], candidate_distances[i]))
+        indices[i] = candidates[i][order]
+        distances[i] = np.sqrt(candidate_distances[i][order])
+    return indices, distances
+
+
+def _init_worker(matrix, genre_mask, k, genre_weight):
+    _WORKER_STATE.update(matrix=matrix, genre_mask=genre_mask, k=k, genre_weight=genre_weight)
+
+
+def _compute_block(rows):
+    state = _WORKER_STATE
+    squared = block_distances(state['matrix'], state['genre_mask'], rows, genre_weight=state['genre_weight'])
+    return rows, _top_k(squared, rows, state['k'])
+
+
+def compute_top_k(matrix, genre_mask, rows, k, genre_weight=10, block_size=None, workers=None):
+    """
+    Calcule les k plus proches voisins de chaque film de `rows` par blocs vectorisés
+    répartis sur un pool de processus.
+    Args:
+        matrix (np.ndarray): Matrice float32 des caractéristiques (N × F).
+        genre_mask (np.ndarray): Masque booléen des colonnes de genres.
+        rows (np.ndarray): Positions des films à calculer.
+        k (int): Nombre de voisins par film (le film lui-même est exclu).
+        genre_weight (int): Poids attribué aux genres du film de référence.
+        block_size (int, optionnel): Nombre de films par bloc ; calculé pour tenir ~64 Mo par bloc.
+        workers (int, optionnel): Nombre de processus ; 1 pour un calcul sans pool.
+    Returns:
+        tuple: (indices int32, distances float32) de forme (len(rows) × k).
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    distances = np.empty((len(rows), k), dtype=np.float32)
+    if len(rows) == 0:
+        return indices, distances
+    if block_size is None:
+        block_size = max(1, (64 * 2 ** 20) // (8 * matrix.shape[0]))
+    blocks = [rows[start:start + block_size] for start in range(0, len(rows), block_size)]
+    position = {row: i for i, row in enumerate(rows.tolist())}
+
+    def store(result):
+        block, (block_indices, block_distances_) = result
+        target = [position[row] for row in block.tolist()]
+        indices[target] = block_indices
+        distances[target] = block_distances_
+
+    if workers == 1 or len(blocks) == 1:
+        _init_worker(matrix, genre_mask, k, genre_weight)
+        for block in blocks:
+            store(_compute_block(block))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(matrix, genre_mask, k, genre_weight)) as pool:
+            for result in pool.map(_compute_block, blocks):
+                store(result)
+    return indices, distances
+
+
+# :blue_book: Table des voisins précalculés
+class NeighborTable:
+    """
+    Table compacte des k plus proches voisins de chaque film, stockée sur disque
+    (indices int32 + distances float32) et chargée en mémoire mappée.
+    Les pages n’ont plus qu’à faire une simple lecture de ligne.
+    Args:
+        path (str): Répertoire contenant la table.
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_DIR):
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.path = path
+        self.k = self.manifest['k']
+        self.genre_weight = self.manifest['genre_weight']
+        self.tconst = np.load(os.path.join(path, 'tconst.npy'))
+        self.indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode='r')
+        self.distances = np.load(os.path.join(path, 'distances.npy'), mmap_mode='r')
+        self.positions = {tconst: i for i, tconst in enumerate(self.tconst.tolist())}
+
+    @staticmethod
+    def exists(path=DEFAULT_TABLE_DIR):
+        return os.path.exists(os.path.join(path, 'manifest.json'))
+
+    def matches(self, source_version, genre_weight=10):
+        """
+        Vérifie que la table a été calculée sur la version courante de l’instantané (mêmes films
+        et mêmes caractéristiques) avec la même pondération des genres.
+        """
+        return (self.genre_weight == genre_weight and source_version is not None
+                and self.manifest.get('source_version') == source_version)
+
+    def lookup(self, tconst, n_recommendations=5):
+        """
+        Retourne les positions des films les plus proches d’un film donné.
+        Args:
+            tconst (str): Identifiant du film de référence.
+            n_recommendations (int): Nombre de voisins souhaités (au plus `k`).
+        Returns:
+            np.ndarray ou None: Positions des voisins, ou None si le film est absent de la table.
+        """
+        position = self.positions.get(tconst)
+        if position is None or n_recommendations > self.k:
+            return None
+        return np.asarray(self.indices[position, :n_recommendations])
+
+
+def _save_table(path, tconst, features, columns, indices, distances, k, genre_weight, scaling, source_version):
+    os.makedirs(path, exist_ok=True)
+    arrays = {'tconst': tconst, 'features': features, 'indices': indices, 'distances': distances}
+    for name, array in arrays.items():
+        # Écriture dans un fichier temporaire puis remplacement atomique
+        tmp = os.path.join(path, f'{name}.tmp.npy')
+        np.save(tmp, array)
+        os.replace(tmp, os.path.join(path, f'{name}.npy'))
+    manifest = {
+        'version': TABLE_VERSION,
+        'k': k,
+        'genre_weight': genre_weight,
+        'columns': columns,
+        'scaling': scaling,
+        'source_version': source_version,
+        'n_films': len(tconst),
+        'built_at': time.time(),
+    }
+    tmp = os.path.join(path, 'manifest.tmp.json')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(path, 'manifest.json'))
+
+
+def _load_previous(path, k, genre_weight):
+    if not NeighborTable.exists(path):
+        return None
+    table = NeighborTable(path)
+    manifest = table.manifest
+    if (manifest.get('version') != TABLE_VERSION or manifest['k'] != k
+            or manifest['genre_weight'] != genre_weight):
+        return None
+    features = np.load(os.path.join(path, 'features.npy'))
+    return table, features
+
+
+def scaling_current(stored, fresh, tolerance=SCALING_TOLERANCE):
+    """
+    Vérifie que la normalisation enregistrée reste valable pour le catalogue :
+    mêmes colonnes numériques, aucun genre nouveau, médiane et écart interquartile
+    ajustés sur le catalogue à moins de `tolerance` écart interquartile des valeurs enregistrées.
+    """
+    if stored is None or stored['numeric'] != fresh['numeric'] or not set(fresh['genres']) <= set(stored['genres']):
+        return False
+    scale = np.asarray(stored['scale'])
+    return bool((np.abs(np.asarray(fresh['center']) - stored['center']) <= tolerance * scale).all()
+                and (np.abs(np.asarray(fresh['scale']) - scale) <= tolerance * scale).all())
+
+
+def _rows_to_refresh(index, tconst, previous, k, genre_weight):
+    """
+    Détermine les films dont la liste de voisins doit être recalculée après une mise à jour du catalogue,
+    et reprend les listes toujours valides de l’ancienne table.
+    """
+    table, old_features = previous
+    n = len(tconst)
+    old_position = np.array([table.positions.get(t, -1) for t in tconst.tolist()], dtype=np.int64)
+    unchanged = old_position >= 0
+    unchanged[unchanged] = (old_features[old_position[unchanged]] == index.matrix[unchanged]).all(axis=1)
+
+    indices = np.zeros((n, k), dtype=np.int32)
+    distances = np.zeros((n, k), dtype=np.float32)
+    # Correspondance ancienne position -> nouvelle position pour les films inchangés
+    remap = np.full(len(table.tconst), -1, dtype=np.int64)
+    remap[old_position[unchanged]] = np.flatnonzero(unchanged)
+    kept = np.flatnonzero(unchanged)
+    indices[kept] = remap[np.asarray(table.indices)[old_position[kept]]]
+    distances[kept] = np.asarray(table.distances)[old_position[kept]]
+
+    # Une liste est invalide si elle contient un film supprimé ou modifié
+    dirty = ~unchanged
+    dirty[kept[(indices[kept] < 0).any(axis=1)]] = True
+
+    # Un film nouveau ou modifié peut entrer dans la liste d’un film inchangé
+    changed = np.flatnonzero(~unchanged)
+    still_valid = np.flatnonzero(~dirty)
+    if len(changed) and len(still_valid):
+        block_size = max(1, (64 * 2 ** 20) // (8 * len(changed)))
+        for start in range(0, len(still_valid), block_size):
+            rows = still_valid[start:start + block_size]
+            squared = block_distances(index.matrix, index.genre_mask, rows, changed, genre_weight)
+            kth = distances[rows, -1].astype(np.float64) ** 2
+            dirty[rows[(squared <= kth[:, None]).any(axis=1)]] = True
+    return np.flatnonzero(dirty), indices, distances
+
+
+# :blue_book: Construction (complète ou incrémentale) de la table des voisins
+def build_neighbor_table(films_path='csv/films_def.csv', path=DEFAULT_TABLE_DIR, k=20, genre_weight=10,
+                         full=False, block_size=None, workers=None):
+    """
+    Calcule hors ligne les k films les plus proches de chaque `tconst` et écrit la table sur disque.
+    Si une table compatible existe déjà, seuls les films ajoutés ou modifiés, et les listes
+    de voisins qu’ils invalident, sont recalculés. La normalisation (médiane, écart interquartile)
+    et les colonnes de genres enregistrées avec la table sont réutilisées tant qu’elles restent
+    valables (voir `scaling_current`) : ajouter des films ne modifie pas les lignes existantes.
+    La version de l’instantané est enregistrée dans le manifeste : les pages n’utilisent la table
+    que pour la génération de données calculée sur les mêmes CSV.
+    Args:
+        films_path (str): Chemin du fichier CSV des films.
+        path (str): Répertoire de sortie de la table.
+        k (int): Nombre de voisins par film.
+        genre_weight (int): Poids attribué aux genres du film de référence.
+        full (bool): Force une reconstruction complète.
+        block_size (int, optionnel): Nombre de films par bloc de calcul.
+        workers (int, optionnel): Nombre de processus du pool.
+    Returns:
+        dict: Statistiques de la construction (nombre de films, lignes recalculées, durée).
+    """
+    from utils.snapshot import films_source_version
+    from utils.utils import fit_feature_scaling, prepare_features
+
+    start = time.perf_counter()
+    source_version = films_source_version(films_path)
+    films = pd.read_csv(films_path)
+    tconst = films['tconst'].to_numpy(dtype=str)
+    k = min(k, len(films) - 1)
+
+    previous = None if full else _load_previous(path, k, genre_weight)
+    scaling = fit_feature_scaling(films)
+    if previous is not None and scaling_current(previous[0].manifest.get('scaling'), scaling):
+        scaling = previous[0].manifest['scaling']
+    else:
+        # Normalisation périmée : les caractéristiques de tous les films changent
+        previous = None
+    index = RecommendationIndex(prepare_features(films, scaling))
+
+    if previous is None:
+        rows = np.arange(len(films))
+        indices = np.zeros((len(films), k), dtype=np.int32)
+        distances = np.zeros((len(films), k), dtype=np.float32)
+    else:
+        rows, indices, distances = _rows_to_refresh(index, tconst, previous, k, genre_weight)
+
+    new_indices, new_distances = compute_top_k(index.matrix, index.genre_mask, rows, k, genre_weight,
+                                               block_size=block_size, workers=workers)
+    indices[rows] = new_indices
+    distances[rows] = new_distances
+    _save_table(path, tconst, index.matrix, index.columns, indices, distances, k, genre_weight, scaling,
+                source_version)
+    return {
+        'n_films': len(films),
+        'recomputed': len(rows),
+        'incremental': previous is not None,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Précalcul des films similaires pour chaque tconst.")
+    parser.add_argument('--films', default='csv/films_def.csv', help="Fichier CSV des films")
+    parser.add_argument('--out', default=DEFAULT_TABLE_DIR, help="Répertoire de sortie")
+    parser.add_argument('-k', type=int, default=20, help="Nombre de voisins par film")
+    parser.add_argument('--genre-weight', type=int, default=10, help="Poids des genres du film de référence")
+    parser.add_argument('--workers', type=int, default=None, help="Nombre de processus")
+    parser.add_argument('--block-size', type=int, default=None, help="Nombre de films par bloc")
+    parser.add_argument('--full', action='store_true', help="Reconstruction complète")
+    args = parser.parse_args()
+    print(build_neighbor_table(args.films, args.out, args.k, args.genre_weight, args.full,
+                               args.block_size, args.workers))
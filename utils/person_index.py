@@ -0,0 +1,143 @@
+import bisect
+import os
+
+import numpy as np
+
+from utils.compact import StringBlock
+from utils.text_index import WORD, fold_query, fold_text
+
+# Tableaux enregistrés par `PersonSearchIndex.save`
+ARRAYS = ('key_docs', 'popularity', 'indptr', 'person_films', 'film_tconst', 'film_popularity')
+# Plus grand point de code en UTF-8 : borne supérieure des clés commençant par un préfixe
+MAX_CODE_POINT = '\U0010ffff'.encode('utf-8')
+
+
+# :blue_book: Index de recherche des intervenants par nom
+class PersonSearchIndex:
+    """
+    Recherche des intervenants par nom, sans parcours de table :
+    - index de préfixes sur tableau trié : chaque début de mot du nom normalisé
+      (accents et casse ignorés) est une clé ; chaque mot de la requête doit être le début
+      d’un mot du nom (« tom han » trouve « Tom Hanks », « hanks » aussi) ;
+    - résultats classés par `popularity` décroissante ;
+    - adjacence intervenant → films précalculée (positions dans `films`, triées par popularité
+      du film), dérivée de l’index graphe.
+    Les clés (bloc UTF-8 trié par octets, même ordre que les points de code) et l’adjacence sont
+    des tableaux : enregistrés par `save`, ils sont mappés en lecture seule par `load`
+    et partagés entre processus (voir `utils/shared_features.py`).
+    Args:
+        intervenants (pd.DataFrame): Le DataFrame des intervenants.
+        films (pd.DataFrame): Le DataFrame des films.
+        graph (FilmPersonGraph): L’index graphe construit sur les mêmes tables.
+    """
+
+    def __init__(self, intervenants, films, graph):
+        self.popularity = intervenants['popularity'].fillna(0).to_numpy(dtype=np.float64)
+        keys, docs = [], []
+        for doc, name in enumerate(fold_text(intervenants['primaryName']).tolist()):
+            for match in WORD.finditer(name):
+                keys.append(name[match.start():])
+                docs.append(doc)
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self.keys = StringBlock.from_strings(keys[i] for i in order)
+        self.key_docs = np.array([docs[i] for i in order], dtype=np.int32)
+
+        # Adjacence intervenant (ligne de `intervenants`) → films (lignes de `films`), par popularité décroissante
+        person_of_link = np.repeat(np.arange(len(graph.person_keys), dtype=np.int32), np.diff(graph.person_indptr))
+        people = graph.person_rows[person_of_link]
+        film_rows = graph.film_rows[graph.person_films]
+        keep = (people >= 0) & (film_rows >= 0)
+        people, film_rows = people[keep], film_rows[keep]
+        self.film_tconst = films['tconst'].to_numpy(dtype=str)
+        self.film_popularity = films['popularity'].fillna(0).to_numpy(dtype=np.float64)
+        order = np.lexsort((film_rows, -self.film_popularity[film_rows], people))
+        people, film_rows = people[order], film_rows[order]
+        # Un film crédité plusieurs fois (ex. acteur et réalisateur) n’apparaît qu’une fois
+        first = np.ones(len(people), dtype=bool)
+        first[1:] = (people[1:] != people[:-1]) | (film_rows[1:] != film_rows[:-1])
+        people, self.person_films = people[first], film_rows[first]
+        self.indptr = np.zeros(len(intervenants) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(people, minlength=len(intervenants)), out=self.indptr[1:])
+
+    def _prefix(self, token):
+        token = token.encode('utf-8')
+        start = bisect.bisect_left(self.keys, token)
+        end = bisect.bisect_left(self.keys, token + MAX_CODE_POINT, start)
+        return np.unique(self.key_docs[start:end])
+
+    def search(self, query, limit=10):
+        """
+        Recherche les intervenants dont le nom contient chaque mot de la requête en début de mot.
+        Args:
+            query (str): Nom ou début de nom recherché.
+            limit (int): Nombre maximal d’intervenants retournés.
+        Returns:
+            np.ndarray: Positions des intervenants dans `intervenants`, par popularité décroissante.
+        """
+        tokens = WORD.findall(fold_query(query))
+        if not tokens:
+            return np.empty(0, dtype=np.int32)
+        # Mots les plus longs d’abord : plages plus courtes, intersection plus rapide
+        docs = None
+        for token in sorted(set(tokens), key=len, reverse=True):
+            matches = self._prefix(token)
+            docs = matches if docs is None else np.intersect1d(docs, matches, assume_unique=True)
+            if len(docs) == 0:
+                return docs
+        if len(docs) > limit:
+            docs = docs[np.argpartition(-self.popularity[docs], limit - 1)[:limit]]
+        return docs[np.lexsort((docs, -self.popularity[docs]))]
+
+    def films(self, person, limit=None):
+        """
+        Films d’un intervenant, par popularité décroissante.
+        Args:
+            person (int): Position de l’intervenant dans `intervenants`.
+            limit (int, optionnel): Nombre maximal de films.
+        Returns:
+            np.ndarray: Positions des films dans `films`.
+        """
+        start, end = self.indptr[person], self.indptr[person + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.person_films[start:end]
+
+    def search_films(self, query, limit=5, people_limit=5):
+        """
+        Recherche les intervenants correspondant à la requête et leurs films.
+        Les films des intervenants trouvés sont fusionnés et classés par popularité décroissante.
+        Args:
+            query (str): Nom ou début de nom recherché.
+            limit (int): Nombre maximal de films.
+            people_limit (int): Nombre maximal d’intervenants pris en compte.
+        Returns:
+            tuple: (positions des intervenants, positions des films) ; `film_tconst` donne les identifiants.
+        """
+        people = self.search(query, people_limit)
+        if len(people) == 0:
+            return people, np.empty(0, dtype=np.int32)
+        if len(people) == 1:
+            return people, self.films(people[0], limit)
+        films = np.unique(np.concatenate([self.films(person, limit) for person in people]))
+        order = np.lexsort((films, -self.film_popularity[films]))
+        return people, films[order][:limit]
+
+    def save(self, path):
+        """
+        Enregistre l’index dans `path` (bloc des clés et tableaux `.npy`).
+        """
+        os.makedirs(path, exist_ok=True)
+        self.keys.save(os.path.join(path, 'keys'))
+        for name in ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Mappe en lecture seule un index enregistré par `save`.
+        """
+        index = cls.__new__(cls)
+        index.keys = StringBlock.load(os.path.join(path, 'keys'))
+        for name in ARRAYS:
+            setattr(index, name, np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r'))
+        return index
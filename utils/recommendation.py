@@ -0,0 +1,127 @@
+import numpy as np
+
+# Colonnes numériques produites par `prepare_features` ; toutes les autres sont des genres
+NUMERIC_FEATURES = ['averageRating', 'popularity', 'year']
+
+
+# :blue_book: Index de recommandation construit une seule fois
+class RecommendationIndex:
+    """
+    Index persistant pour la recherche des plus proches voisins entre films.
+    Les caractéristiques issues de `prepare_features` sont stockées une seule fois
+    sous forme de matrice dense float32. La pondération des genres du film de
+    référence est appliquée au moment de la requête, sans copie du DataFrame
+    ni réentraînement d’un modèle `NearestNeighbors`.
+    Args:
+        features_df (pd.DataFrame): Le DataFrame des caractéristiques retourné par `prepare_features`.
+    """
+
+    def __init__(self, features_df):
+        self.columns = list(features_df.columns)
+        self.matrix = np.ascontiguousarray(features_df.to_numpy(dtype=np.float32))
+        self.genre_mask = np.array([col not in NUMERIC_FEATURES for col in self.columns])
+
+    @classmethod
+    def from_arrays(cls, matrix, columns, genre_mask):
+        """
+        Construit l’index à partir de tableaux déjà calculés (ex. matrice publiée en mémoire mappée
+        par `utils/shared_features.py`), sans copie.
+        """
+        index = cls.__new__(cls)
+        index.columns = list(columns)
+        index.matrix = matrix
+        index.genre_mask = np.asarray(genre_mask, dtype=bool)
+        return index
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def feature_weights(self, movie_index, genre_weight=10):
+        """
+        Calcule le vecteur de poids par colonne pour un film de référence.
+        Les genres présents dans le film de référence reçoivent le poids `genre_weight`,
+        toutes les autres colonnes gardent un poids de 1.
+        Args:
+            movie_index (int): Position du film de référence dans la matrice.
+            genre_weight (int): Poids attribué aux genres du film de référence.
+        Returns:
+            np.ndarray: Vecteur de poids float32 de taille F.
+        """
+        weights = np.ones(self.matrix.shape[1], dtype=np.float32)
+        weights[self.genre_mask & (self.matrix[movie_index] == 1)] = genre_weight
+        return weights
+
+    def kneighbors(self, movie_index, n_neighbors, genre_weight=10):
+        """
+        Recherche exacte (distance euclidienne) des plus proches voisins d’un film.
+        Le résultat est identique à celui d’un `NearestNeighbors` entraîné sur les
+        caractéristiques pondérées : le film de référence lui-même fait partie des voisins.
+        Args:
+            movie_index (int): Position du film de référence dans la matrice.
+            n_neighbors (int): Nombre de voisins à retourner.
+            genre_weight (int): Poids attribué aux genres du film de référence.
+        Returns:
+            tuple: (distances, indices) triés par distance croissante.
+        """
+        n_neighbors = min(n_neighbors, len(self))
+        weights = self.feature_weights(movie_index, genre_weight)
+        diff = self.matrix - self.matrix[movie_index]
+        diff *= weights
+        squared = np.einsum('ij,ij->i', diff, diff)
+        # Sélection partielle des k meilleurs puis tri de ces seuls candidats
+        if n_neighbors < len(self):
+            candidates = np.argpartition(squared, n_neighbors - 1)[:n_neighbors]
+        else:
+            candidates = np.arange(len(self))
+        order = np.lexsort((candidates, squared[candidates]))
+        indices = candidates[order]
+        return np.sqrt(squared[indices]), indices
+
+    def profiles(self, weights):
+        """
+        Construit les profils de goût : moyenne pondérée des caractéristiques des films appréciés.
+        Args:
+            weights (np.ndarray): Poids des films (P x N, ou vecteur de taille N pour un seul profil) ;
+                un poids nul signifie que le film ne fait pas partie du profil.
+        Returns:
+            np.ndarray: Matrice des profils float32 (P x F).
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float32))
+        totals = weights.sum(axis=1, keepdims=True)
+        return (weights @ self.matrix) / np.where(totals > 0, totals, 1)
+
+    def kneighbors_profiles(self, weights, n_neighbors, genre_weight=10):
+        """
+        Recherche en une seule passe les films les plus proches de plusieurs profils de goût,
+        en excluant les films qui composent chaque profil.
+        Les genres reçoivent un poids entre 1 et `genre_weight` selon leur part dans le profil :
+        avec un seul film, le résultat est celui de `kneighbors` sans le film lui-même.
+        Args:
+            weights (np.ndarray): Poids des films appréciés (P x N, ou vecteur de taille N).
+            n_neighbors (int): Nombre de films à retourner par profil.
+            genre_weight (int): Poids attribué aux genres entièrement présents dans le profil.
+        Returns:
+            tuple: (distances, indices), matrices P x k triées par distance croissante ;
+                les positions sans candidat (catalogue épuisé) ont une distance infinie.
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float32))
+        profiles = self.profiles(weights)
+        feature_weights = np.ones_like(profiles)
+        feature_weights[:, self.genre_mask] += (genre_weight - 1) * profiles[:, self.genre_mask]
+        squared_weights = feature_weights ** 2
+        # ||(x - p) * w||² développé en trois produits matriciels (N x P), sans tableau N x P x F
+        squared = (self.matrix ** 2) @ squared_weights.T
+        squared -= 2 * (self.matrix @ (squared_weights * profiles).T)
+        squared += (squared_weights * profiles ** 2).sum(axis=1)
+        squared = np.maximum(squared.T, 0)
+        squared[weights > 0] = np.inf  # Les films du profil ne sont pas recommandés
+        n_neighbors = min(n_neighbors, len(self))
+        if n_neighbors < len(self):
+            candidates = np.argpartition(squared, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        else:
+            candidates = np.broadcast_to(np.arange(len(self)), squared.shape)
+        # Tri par distance croissante, à égalité par position
+        candidates = np.sort(candidates, axis=1)
+        order = np.argsort(np.take_along_axis(squared, candidates, axis=1), axis=1, kind='stable')
+        indices = np.take_along_axis(candidates, order, axis=1)
+        return np.sqrt(np.take_along_axis(squared, indices, axis=1)), indices
@@ -0,0 +1,233 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from utils.graph_index import FilmPersonGraph
+from utils.person_index import PersonSearchIndex
+from utils.recommendation import RecommendationIndex
+from utils.text_index import TextSearchIndex
+
+try:
+    import fcntl  # Verrou inter-processus (POSIX)
+except ImportError:  # pragma: no cover - Windows : pas de verrou, publication concurrente tolérée
+    fcntl = None
+
+# Emplacement des générations publiées de la matrice des caractéristiques
+FEATURES_DIR = 'cache/features'
+FEATURES_FORMAT = 2
+KEEP_GENERATIONS = 2
+
+
+def _generation_path(root, generation):
+    return os.path.join(root, f'gen-{generation:06d}')
+
+
+def current_generation(root=FEATURES_DIR):
+    """
+    Numéro de la génération publiée (lecture d’un petit fichier), ou None si rien n’est publié.
+    """
+    try:
+        with open(os.path.join(root, 'CURRENT'), 'r', encoding='utf-8') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_manifest(root=FEATURES_DIR, generation=None):
+    generation = current_generation(root) if generation is None else generation
+    if generation is None:
+        return None
+    try:
+        with open(os.path.join(_generation_path(root, generation), 'manifest.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _PublishLock:
+    # Un seul processus construit une génération ; les autres attendent puis réutilisent son résultat
+
+    def __init__(self, root):
+        os.makedirs(root, exist_ok=True)
+        self.path = os.path.join(root, 'publish.lock')
+
+    def __enter__(self):
+        self.file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+# :blue_book: Publication de la matrice des caractéristiques en mémoire mappée partagée
+def publish_features(films, source_version, root=FEATURES_DIR, force=False, intervenants=None, lien=None):
+    """
+    Calcule la matrice des caractéristiques une seule fois par hôte et la publie sous forme
+    de fichiers `.npy` que chaque processus Streamlit mappe en lecture seule (pages partagées
+    par le cache du système, sans copie par processus).
+    Les index de recherche plein texte (`text_index/`) et, si les intervenants et les liens sont
+    fournis, des intervenants (`person_index/`) sont publiés dans la même génération.
+    Chaque publication crée une nouvelle génération ; le pointeur `CURRENT` est remplacé de façon
+    atomique, et les processus qui utilisent encore l’ancienne génération la gardent mappée.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        source_version (str): Version des données sources (ex. version de l’instantané).
+        root (str): Répertoire des générations.
+        force (bool): Republie même si la génération courante correspond déjà à `source_version`.
+        intervenants (pd.DataFrame, optionnel): Le DataFrame des intervenants.
+        lien (pd.DataFrame, optionnel): Le DataFrame des liens films–intervenants.
+    Returns:
+        int: Numéro de la génération courante.
+    """
+    from utils.utils import prepare_features
+
+    with _PublishLock(root):
+        generation = current_generation(root)
+        manifest = read_manifest(root, generation)
+        if not force and manifest is not None and manifest.get('source_version') == source_version \
+                and manifest.get('format') == FEATURES_FORMAT:
+            return generation
+
+        start = time.perf_counter()
+        index = RecommendationIndex(prepare_features(films))
+        generation = (generation or 0) + 1
+        path = _generation_path(root, generation)
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, 'matrix.npy'), index.matrix)
+        np.save(os.path.join(tmp_path, 'genre_mask.npy'), index.genre_mask)
+        np.save(os.path.join(tmp_path, 'tconst.npy'), films['tconst'].to_numpy(dtype=str))
+        TextSearchIndex(films).save(os.path.join(tmp_path, 'text_index'))
+        if intervenants is not None and lien is not None:
+            graph = FilmPersonGraph(films, intervenants, lien)
+            PersonSearchIndex(intervenants, films, graph).save(os.path.join(tmp_path, 'person_index'))
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'format': FEATURES_FORMAT, 'generation': generation, 'source_version': source_version,
+                       'columns': index.columns, 'seconds': round(time.perf_counter() - start, 3)}, f)
+        os.rename(tmp_path, path)
+        tmp = os.path.join(root, f'CURRENT.tmp-{os.getpid()}')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(generation))
+        os.replace(tmp, os.path.join(root, 'CURRENT'))
+
+        # Nettoyage des anciennes générations (les mappages existants restent valides sous POSIX)
+        for name in sorted(os.listdir(root)):
+            if name.startswith('gen-') and '.' not in name and int(name[4:]) <= generation - KEEP_GENERATIONS:
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        return generation
+
+
+def attach_features(root=FEATURES_DIR, generation=None):
+    """
+    Mappe une génération publiée en lecture seule et retourne l’index de recommandation correspondant.
+    Returns:
+        RecommendationIndex: Index dont la matrice est un mappage mémoire
+            (attributs `generation`, `source_version`, `tconst`).
+    """
+    generation = current_generation(root) if generation is None else generation
+    manifest = read_manifest(root, generation)
+    if manifest is None:
+        raise FileNotFoundError(f"Aucune génération publiée dans '{root}'.")
+    path = _generation_path(root, generation)
+    index = RecommendationIndex.from_arrays(
+        np.load(os.path.join(path, 'matrix.npy'), mmap_mode='r'),
+        manifest['columns'],
+        np.load(os.path.join(path, 'genre_mask.npy')),
+    )
+    index.generation = generation
+    index.source_version = manifest['source_version']
+    index.tconst = np.load(os.path.join(path, 'tconst.npy'), mmap_mode='r')
+    return index
+
+
+class SharedFeatures:
+    """
+    Poignée par processus vers la matrice publiée : `index()` vérifie le numéro de génération
+    (lecture d’un petit fichier) et bascule sur la nouvelle génération dès qu’elle est publiée.
+    Les sessions qui tiennent encore l’index précédent continuent de l’utiliser jusqu’à la fin de leur requête.
+    `text_index()` et `person_index()` mappent de la même façon les index de recherche publiés.
+    Args:
+        root (str): Répertoire des générations.
+    """
+
+    def __init__(self, root=FEATURES_DIR):
+        self.root = root
+        self._index = None
+        self._search = {}
+        self._lock = threading.Lock()
+
+    def index(self, source_version=None):
+        """
+        Retourne l’index de la génération courante, ou None si rien n’est publié ou si la génération
+        a été calculée sur une autre version des données que `source_version`
+        (comparaison du manifeste, sans parcourir les identifiants).
+        """
+        generation = current_generation(self.root)
+        if generation is None:
+            return None
+        index = self._index
+        if index is None or index.generation != generation:
+            with self._lock:
+                index = self._index
+                if index is None or index.generation != generation:
+                    try:
+                        index = attach_features(self.root, generation)
+                    except (OSError, ValueError):
+                        return None  # Génération supprimée entre-temps : la suivante sera prise au prochain appel
+                    self._index = index
+        if source_version is not None and index.source_version != source_version:
+            return None
+        return index
+
+    def _search_index(self, name, loader, source_version):
+        index = self.index(source_version)
+        if index is None:
+            return None
+        cached = self._search.get(name)
+        if cached is None or cached[0] != index.generation:
+            with self._lock:
+                cached = self._search.get(name)
+                if cached is None or cached[0] != index.generation:
+                    try:
+                        cached = (index.generation, loader(os.path.join(
+                            _generation_path(self.root, index.generation), name)))
+                    except (OSError, ValueError):
+                        return None  # Index absent de la génération (ex. publiée sans les intervenants)
+                    self._search[name] = cached
+        return cached[1]
+
+    def text_index(self, source_version=None):
+        """
+        Retourne l’index de recherche plein texte publié (voir `TextSearchIndex`), ou None
+        s’il n’est pas publié pour `source_version`.
+        """
+        return self._search_index('text_index', TextSearchIndex.load, source_version)
+
+    def person_index(self, source_version=None):
+        """
+        Retourne l’index de recherche des intervenants publié (voir `PersonSearchIndex`), ou None
+        s’il n’est pas publié pour `source_version`.
+        """
+        return self._search_index('person_index', PersonSearchIndex.load, source_version)
+
+
+if __name__ == '__main__':
+    from utils.snapshot import load_snapshot
+
+    parser = argparse.ArgumentParser(description="Publication de la matrice des caractéristiques partagée.")
+    parser.add_argument('--out', default=FEATURES_DIR, help="Répertoire des générations")
+    parser.add_argument('--force', action='store_true', help="Republie même si les données n’ont pas changé")
+    args = parser.parse_args()
+    version, catalog = load_snapshot()
+    print({'generation': publish_features(catalog['films'], version, args.out, args.force,
+                                          catalog['intervenants'], catalog['lien'])})
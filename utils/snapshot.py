@@ -0,0 +1,306 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from utils.compact import CompactCatalog, MultiValue, code_dtype
+
+# Emplacement des instantanés colonnaires compilés à partir des CSV
+SNAPSHOT_DIR = 'cache/snapshot'
+CSV_DIR = 'csv'
+SNAPSHOT_FORMAT = 3
+TABLES = ['films', 'intervenants', 'lien']
+
+# Types explicites par colonne ; les colonnes absentes du schéma sont inférées ('int32', 'float32', 'bool' ou 'str').
+# 'id:<espace>' : codes entiers sur une table d’identifiants commune à toutes les tables ;
+# None : colonne conservée uniquement sous forme de champ multivalué (voir MULTI_VALUED)
+SCHEMAS = {
+    'films': {
+        'tconst': 'id:tconst',
+        'title': 'str',
+        'release_date': 'str',
+        'averageRating': 'float32',
+        'popularity': 'float32',
+        'genres': 'category',
+        'overview': 'str',
+        'keywords': 'str',
+        'tagline': 'str',
+        'origin_country': 'category',
+        'poster_path': 'str',
+        'trailer_link': 'str',
+        'langue_trailer': 'category',
+    },
+    'intervenants': {
+        'nconst': 'id:nconst',
+        'primaryName': 'str',
+        'primaryProfession': 'category',
+        'knownForTitles': None,
+        'popularity': 'float32',
+        'known_for_department': 'category',
+        'profile_path': 'str',
+    },
+    'lien': {
+        'tconst': 'id:tconst',
+        'nconst': 'id:nconst',
+        'category': 'category',
+    },
+}
+
+# Champs multivalués stockés en tableaux d’offsets : {table: {colonne: espace d’identifiants ou None}}
+MULTI_VALUED = {
+    'films': {'genres': None},
+    'intervenants': {'knownForTitles': 'tconst'},
+}
+
+
+def csv_path(table):
+    return os.path.join(CSV_DIR, f'{table}_def.csv')
+
+
+def source_stats(tables):
+    stats = {}
+    for table in tables:
+        stat = os.stat(csv_path(table))
+        stats[table] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return stats
+
+
+def content_version(tables):
+    # La version d’un instantané est l’empreinte du contenu des CSV et du format
+    digest = hashlib.sha1(f'format={SNAPSHOT_FORMAT}'.encode())
+    for table in tables:
+        with open(csv_path(table), 'rb') as f:
+            for chunk in iter(lambda: f.read(2 ** 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def films_source_version(films_path):
+    """
+    Version de l’instantané pour une structure calculée hors ligne à partir de `films_path`,
+    ou None si ce fichier n’est pas le CSV des films de l’instantané (la structure ne correspond alors
+    à aucune génération de données).
+    """
+    if not os.path.exists(films_path) or os.path.abspath(films_path) != os.path.abspath(csv_path('films')):
+        return None
+    return content_version(TABLES)
+
+
+def _id_namespaces(frames):
+    # Table d’identifiants triée par espace, union de toutes les colonnes et champs qui y font référence
+    values = {}
+    for table, df in frames.items():
+        for column in df.columns:
+            dtype = SCHEMAS.get(table, {}).get(column)
+            if dtype is not None and dtype.startswith('id:'):
+                values.setdefault(dtype[3:], []).append(df[column].dropna().astype(str).unique())
+        for column, namespace in MULTI_VALUED.get(table, {}).items():
+            if namespace and column in df:
+                items = df[column].dropna().astype(str).str.split(',').explode().str.strip()
+                values.setdefault(namespace, []).append(items[items != ''].unique())
+    return {namespace: pd.Index(np.unique(np.concatenate(arrays)).astype(object))
+            for namespace, arrays in values.items()}
+
+
+def _column_dtype(table, column, series):
+    schema = SCHEMAS.get(table, {})
+    if column in schema:
+        return schema[column]
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(series):
+        fits = series.empty or np.iinfo(np.int32).min <= series.min() and series.max() <= np.iinfo(np.int32).max
+        return 'int32' if fits else 'int64'
+    return 'float32' if pd.api.types.is_numeric_dtype(series) else 'str'
+
+
+def _write_column(directory, column, series, dtype, ids=None):
+    base = os.path.join(directory, column)
+    if dtype.startswith('id:'):
+        # Identifiants : codes entiers (au plus int32) dans la table commune de l’espace (une seule copie
+        # des chaînes), à la largeur que retient pandas pour que les codes restent mappés au chargement
+        index = ids[dtype[3:]]
+        np.save(f'{base}.codes.npy', index.get_indexer(series).astype(code_dtype(len(index))))
+        return {'dtype': dtype}
+    if dtype == 'str':
+        # Chaînes stockées façon Arrow : un bloc UTF-8 contigu (séparateur NUL), des offsets et un masque des valeurs manquantes
+        mask = series.isna().to_numpy()
+        encoded = [b'' if missing else str(value).encode('utf-8') for value, missing in zip(series.tolist(), mask)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) + 1 for value in encoded], out=offsets[1:])
+        np.save(f'{base}.data.npy', np.frombuffer(b''.join(value + b'\x00' for value in encoded), dtype=np.uint8))
+        np.save(f'{base}.offsets.npy', offsets)
+        np.save(f'{base}.mask.npy', mask)
+        return {'dtype': 'str'}
+    if dtype == 'category':
+        categorical = series.astype('category')
+        codes_dtype = code_dtype(len(categorical.cat.categories))
+        np.save(f'{base}.codes.npy', categorical.cat.codes.to_numpy(dtype=codes_dtype))
+        return {'dtype': 'category', 'categories': [str(c) for c in categorical.cat.categories]}
+    np.save(f'{base}.npy', series.to_numpy(dtype=dtype))
+    return {'dtype': dtype}
+
+
+def _write_multi_value(directory, column, series, namespace, ids):
+    base = os.path.join(directory, column)
+    field = MultiValue.from_strings(series, ids[namespace] if namespace else None)
+    np.save(f'{base}.values.npy', field.values)
+    np.save(f'{base}.offsets.npy', field.offsets)
+    if namespace:
+        return {'namespace': namespace}
+    _write_column(directory, f'{column}.vocabulary', pd.Series(field.vocabulary), 'str')
+    return {'namespace': None}
+
+
+def _read_column(directory, column, spec, ids=None):
+    base = os.path.join(directory, column)
+    if spec['dtype'].startswith('id:'):
+        codes = np.load(f'{base}.codes.npy', mmap_mode='r')
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=ids[spec['dtype'][3:]]))
+    if spec['dtype'] == 'str':
+        data = np.load(f'{base}.data.npy', mmap_mode='r')
+        mask = np.load(f'{base}.mask.npy')
+        # Les chaînes sont décodées en objets Python dans chaque processus (pandas n’a pas de colonne
+        # de chaînes adossée à un tampon mappé sans pyarrow) : seul le fichier est partagé, pas la colonne.
+        # Un seul décodage du bloc puis découpage en C sur le séparateur
+        values = np.array(data.tobytes().decode('utf-8').split('\x00')[:-1], dtype=object)
+        values[mask] = np.nan
+        return pd.Series(values, dtype=object)
+    if spec['dtype'] == 'category':
+        codes = np.load(f'{base}.codes.npy', mmap_mode='r')
+        return pd.Series(pd.Categorical.from_codes(codes, categories=spec['categories']))
+    # Colonnes numériques : lecture en mémoire mappée, partagée entre processus via le cache disque
+    return pd.Series(np.load(f'{base}.npy', mmap_mode='r'), copy=False)
+
+
+# :blue_book: Compilation des CSV en instantané colonnaire versionné
+def build_snapshot(tables=TABLES, root=SNAPSHOT_DIR):
+    """
+    Compile les fichiers CSV en un instantané colonnaire (une colonne NumPy `.npy` par fichier)
+    avec des types explicites. L’instantané est versionné par l’empreinte du contenu des CSV
+    et le pointeur `CURRENT` est remplacé de façon atomique.
+    Args:
+        tables (list): Noms de base des tables à compiler.
+        root (str): Répertoire racine des instantanés.
+    Returns:
+        str: La version de l’instantané courant.
+    """
+    version = content_version(tables)
+    directory = os.path.join(root, version)
+    manifest = {'format': SNAPSHOT_FORMAT, 'version': version, 'sources': source_stats(tables), 'tables': {}}
+    if not os.path.exists(os.path.join(directory, 'manifest.json')):
+        tmp_directory = f'{directory}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        frames = {table: pd.read_csv(csv_path(table)) for table in tables}
+        ids = _id_namespaces(frames)
+        os.makedirs(os.path.join(tmp_directory, 'ids'))
+        for namespace, index in ids.items():
+            _write_column(os.path.join(tmp_directory, 'ids'), namespace, pd.Series(index), 'str')
+        manifest['ids'] = sorted(ids)
+        for table, df in frames.items():
+            table_directory = os.path.join(tmp_directory, table)
+            os.makedirs(table_directory)
+            columns, fields = {}, {}
+            for column in df.columns:
+                dtype = _column_dtype(table, column, df[column])
+                if dtype is not None:
+                    columns[column] = _write_column(table_directory, column, df[column], dtype, ids)
+            for column, namespace in MULTI_VALUED.get(table, {}).items():
+                if column in df:
+                    fields[column] = _write_multi_value(table_directory, column, df[column], namespace, ids)
+            manifest['tables'][table] = {'rows': len(df), 'columns': columns, 'fields': fields}
+        with open(os.path.join(tmp_directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Un autre processus a publié la même version entre-temps
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+    else:
+        # Même contenu : seule la date des sources est mise à jour
+        with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['sources'] = source_stats(tables)
+        tmp = os.path.join(directory, f'manifest.tmp-{os.getpid()}.json')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(directory, 'manifest.json'))
+    tmp = os.path.join(root, f'CURRENT.tmp-{os.getpid()}')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(root, 'CURRENT'))
+    return version
+
+
+def current_version(tables=TABLES, root=SNAPSHOT_DIR):
+    """
+    Retourne la version de l’instantané courant s’il est à jour par rapport aux CSV, sinon None.
+    """
+    try:
+        with open(os.path.join(root, 'CURRENT'), 'r', encoding='utf-8') as f:
+            version = f.read().strip()
+        with open(os.path.join(root, version, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT or any(table not in manifest['tables'] for table in tables):
+        return None
+    sources = manifest['sources']
+    if any(sources.get(table) != stat for table, stat in source_stats(tables).items()):
+        return None
+    return version
+
+
+# :blue_book: Chargement d’un instantané en mémoire mappée
+def load_snapshot(tables=TABLES, root=SNAPSHOT_DIR):
+    """
+    Charge les tables depuis l’instantané courant, en le (re)compilant s’il est absent ou périmé.
+    Les colonnes numériques, les codes des catégories et les champs multivalués restent en mémoire
+    mappée (partagée entre processus) ; les colonnes de chaînes sont décodées dans chaque processus
+    (voir `CompactCatalog.memory_split`).
+    Args:
+        tables (list): Noms de base des tables à charger.
+        root (str): Répertoire racine des instantanés.
+    Returns:
+        tuple: (version, CompactCatalog) ; le catalogue s’indexe comme un dict {nom de table: pd.DataFrame}.
+    Raises:
+        FileNotFoundError: Si un fichier CSV source est introuvable.
+    """
+    version = current_version(tables, root) or build_snapshot(tables, root)
+    directory = os.path.join(root, version)
+    with open(os.path.join(directory, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    # Un seul type catégoriel par espace d’identifiants, partagé par toutes les colonnes qui y font référence
+    ids = {namespace: pd.Index(_read_column(os.path.join(directory, 'ids'), namespace, {'dtype': 'str'}))
+           for namespace in manifest['ids']}
+    id_dtypes = {namespace: pd.CategoricalDtype(index) for namespace, index in ids.items()}
+    ids = {namespace: dtype.categories for namespace, dtype in id_dtypes.items()}
+    dataframes, fields = {}, {}
+    for table in tables:
+        spec = manifest['tables'][table]
+        table_directory = os.path.join(directory, table)
+        # copy=False : pas de consolidation des colonnes en blocs, les tableaux mappés ne sont pas copiés
+        dataframes[table] = pd.DataFrame({
+            column: _read_column(table_directory, column, column_spec, id_dtypes)
+            for column, column_spec in spec['columns'].items()
+        }, copy=False)
+        for column, field_spec in spec['fields'].items():
+            base = os.path.join(table_directory, column)
+            namespace = field_spec['namespace']
+            vocabulary = ids[namespace] if namespace else pd.Index(
+                _read_column(table_directory, f'{column}.vocabulary', {'dtype': 'str'}))
+            fields[(table, column)] = MultiValue(np.load(f'{base}.values.npy', mmap_mode='r'),
+                                                 np.load(f'{base}.offsets.npy', mmap_mode='r'), vocabulary)
+    return version, CompactCatalog(dataframes, fields, ids, version)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compilation des CSV en instantané colonnaire.")
+    parser.add_argument('tables', nargs='*', default=TABLES, help="Tables à compiler")
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help="Répertoire des instantanés")
+    args = parser.parse_args()
+    print(build_snapshot(args.tables, args.out))
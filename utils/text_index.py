@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from utils.compact import StringBlock
+
+# Champs indexés et poids utilisés pour le classement des résultats
+FIELD_WEIGHTS = {
+    'title': 5.0,
+    'keywords': 3.0,
+    'genres': 3.0,
+    'tagline': 2.0,
+    'overview': 1.0,
+    'origin_country': 1.0,
+}
+NGRAM = 3
+POSTING_PARTS = ('keys', 'indptr', 'indices')
+COMBINING_MARKS = re.compile('[\u0300-\u036f]')
+WHITESPACE = re.compile(r'\s\s+')
+WORD = re.compile(r'\w+')
+
+
+def fold_text(series):
+    """
+    Normalise une colonne de texte pour la recherche : suppression des accents et de la casse,
+    espaces consécutifs réduits à un seul.
+    Args:
+        series (pd.Series): Colonne de texte (les valeurs manquantes deviennent des chaînes vides).
+    Returns:
+        pd.Series: Colonne normalisée.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Colonne catégorielle : seules les catégories distinctes sont normalisées
+        folded = fold_text(pd.Series(series.cat.categories, dtype=object)).to_numpy()
+        codes = series.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, folded[codes], ''), index=series.index, dtype=object)
+    return (series.fillna('').astype(str)
+            .str.normalize('NFKD')
+            .str.replace(COMBINING_MARKS, '', regex=True)
+            .str.replace(WHITESPACE, ' ', regex=True)
+            .str.casefold())
+
+
+def fold_query(query):
+    # Même normalisation que `fold_text`, sans passer par pandas pour une seule chaîne
+    folded = COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', query))
+    return WHITESPACE.sub(' ', folded).casefold().strip()
+
+
+# :blue_book: Index inversé de recherche plein texte sur les films
+class TextSearchIndex:
+    """
+    Index inversé par champ pour la recherche directe de `search_movies`.
+    Chaque champ est normalisé (accents et casse) puis découpé en trigrammes de caractères ;
+    les listes de documents (postings) par trigramme permettent de retrouver les sous-chaînes
+    sans parcourir tout le catalogue. Les candidats sont ensuite vérifiés et classés
+    par champ (titre > mots-clés/genres > tagline > synopsis/pays), puis par popularité.
+    Textes normalisés (blocs UTF-8) et postings (trigrammes triés, offsets, documents) sont des
+    tableaux sans objets Python : enregistrés par `save`, ils sont mappés en lecture seule par `load`
+    et partagés entre processus (voir `utils/shared_features.py`).
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+        fields (dict, optionnel): Champs indexés et leurs poids.
+    """
+
+    def __init__(self, films, fields=None):
+        self.fields = dict(FIELD_WEIGHTS if fields is None else fields)
+        self.tconst = films['tconst'].to_numpy(dtype=str)
+        self.popularity = films['popularity'].to_numpy(dtype=np.float64)
+        self.texts = {}
+        self.postings = {}
+        self.prefixes = {}
+        for field in self.fields:
+            folded = fold_text(films[field]) if field in films else pd.Series([''] * len(films))
+            self.texts[field] = StringBlock.from_strings(folded)
+            self.postings[field] = self._build_postings(folded)
+            self.prefixes[field] = self._build_postings(folded, prefixes=True)
+
+    @staticmethod
+    def _build_postings(folded, prefixes=False):
+        from sklearn.feature_extraction.text import CountVectorizer  # Import différé : seulement à la construction
+
+        if prefixes:
+            # Postings de préfixes : les trois premiers caractères de chaque mot
+            vectorizer = CountVectorizer(analyzer=lambda text: [word[:NGRAM] for word in WORD.findall(text)],
+                                         binary=True)
+        else:
+            vectorizer = CountVectorizer(analyzer='char', ngram_range=(NGRAM, NGRAM), lowercase=False, binary=True)
+        try:
+            matrix = vectorizer.fit_transform(folded).tocsc()
+        except ValueError:
+            # Champ vide sur tout le catalogue
+            return np.empty(0, dtype=f'U{NGRAM}'), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32)
+        matrix.sort_indices()
+        # Clés triées (ordre des colonnes du vectoriseur) : recherche par dichotomie, sans dict
+        return (vectorizer.get_feature_names_out().astype(f'U{NGRAM}'), matrix.indptr.astype(np.int64),
+                matrix.indices.astype(np.int32))
+
+    @staticmethod
+    def _postings(postings, key):
+        keys, indptr, indices = postings
+        column = int(np.searchsorted(keys, key))
+        if column == len(keys) or keys[column] != key:
+            return indices[:0]
+        return indices[indptr[column]:indptr[column + 1]]
+
+    def _candidates(self, field, query):
+        texts = self.texts[field]
+        needle = query.encode('utf-8')
+        if len(query) < NGRAM:
+            # Requête trop courte pour les trigrammes : parcours direct du bloc de textes
+            return texts.find(needle)
+        lists = [self._postings(self.postings[field], query[i:i + NGRAM])
+                 for i in range(len(query) - NGRAM + 1)]
+        lists.sort(key=len)
+        candidates = lists[0]
+        for postings in lists[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = np.intersect1d(candidates, postings, assume_unique=True)
+        if len(query) == NGRAM or len(candidates) == 0:
+            return candidates
+        # Les trigrammes ne garantissent pas la contiguïté : vérification de la sous-chaîne
+        return candidates[texts.contains(candidates, needle)]
+
+    def search(self, query, limit=5):
+        """
+        Recherche les films dont un des champs indexés contient la requête.
+        Args:
+            query (str): Texte recherché (accents et casse ignorés).
+            limit (int, optionnel): Nombre maximal de résultats ; None pour tous.
+        Returns:
+            np.ndarray: Les `tconst` des films trouvés, du plus pertinent au moins pertinent.
+        """
+        query = fold_query(query)
+        if not query:
+            return self.tconst[:0]
+        scores = np.zeros(len(self.tconst), dtype=np.float64)
+        for field, weight in self.fields.items():
+            candidates = self._candidates(field, query)
+            scores[candidates] += weight
+            if len(query) >= NGRAM and len(candidates):
+                # Bonus lorsqu’un mot du champ commence comme la requête
+                starts = self._postings(self.prefixes[field], query[:NGRAM])
+                scores[np.intersect1d(candidates, starts, assume_unique=True)] += weight
+        docs = np.flatnonzero(scores)
+        order = np.lexsort((-self.popularity[docs], -scores[docs]))
+        if limit is not None:
+            order = order[:limit]
+        return self.tconst[docs[order]]
+
+    def save(self, path):
+        """
+        Enregistre l’index dans `path` (blocs de textes, tableaux `.npy` et manifeste JSON).
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'tconst.npy'), self.tconst)
+        np.save(os.path.join(path, 'popularity.npy'), self.popularity)
+        for number, field in enumerate(self.fields):
+            self.texts[field].save(os.path.join(path, f'{number}.text'))
+            for kind in ('postings', 'prefixes'):
+                for part, array in zip(POSTING_PARTS, getattr(self, kind)[field]):
+                    np.save(os.path.join(path, f'{number}.{kind}.{part}.npy'), array)
+        with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'fields': self.fields}, f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Mappe en lecture seule un index enregistré par `save`.
+        """
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        index = cls.__new__(cls)
+        index.fields = manifest['fields']
+        index.tconst = np.load(os.path.join(path, 'tconst.npy'), mmap_mode='r')
+        index.popularity = np.load(os.path.join(path, 'popularity.npy'), mmap_mode='r')
+        index.texts, index.postings, index.prefixes = {}, {}, {}
+        for number, field in enumerate(index.fields):
+            index.texts[field] = StringBlock.load(os.path.join(path, f'{number}.text'))
+            for kind in ('postings', 'prefixes'):
+                getattr(index, kind)[field] = tuple(
+                    np.load(os.path.join(path, f'{number}.{kind}.{part}.npy'), mmap_mode='r')
+                    for part in POSTING_PARTS)
+        return index
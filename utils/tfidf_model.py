@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Emplacement par défaut du modèle TF-IDF persisté
+DEFAULT_MODEL_DIR = 'cache/tfidf'
+MODEL_FORMAT = 1
+VECTORIZER_PARAMS = {
+    'stop_words': 'english',
+    'max_features': 5000,
+    'ngram_range': (1, 2),
+}
+
+
+def build_search_text(films):
+    """
+    Construit le texte de recherche de chaque film (le synopsis compte trois fois),
+    sans modifier le DataFrame fourni.
+    Args:
+        films (pd.DataFrame): Le DataFrame des films.
+    Returns:
+        pd.Series: Texte de recherche par film.
+    """
+    # Les colonnes catégorielles sont converties en chaînes avant la concaténation
+    text = {column: films[column].astype(object).fillna('')
+            for column in ['title', 'overview', 'keywords', 'genres', 'tagline', 'origin_country']}
+    return (
+        text['title'] + ' ' +
+        text['overview'] * 3 + ' ' +
+        text['keywords'] + ' ' +
+        text['genres'] + ' ' +
+        text['tagline'] + ' ' +
+        text['origin_country']
+    )
+
+
+def corpus_fingerprint(tconst, search_text):
+    # Empreinte du corpus et des paramètres : un changement invalide le modèle persisté
+    digest = hashlib.sha1(json.dumps([MODEL_FORMAT, VECTORIZER_PARAMS], default=list).encode())
+    for value in (tconst, search_text):
+        digest.update('\x00'.join(value).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+# :blue_book: Modèle TF-IDF de recherche entraîné une seule fois
+class TfidfSearchModel:
+    """
+    Modèle TF-IDF de secours pour `search_movies`, entraîné une seule fois puis persisté sur disque.
+    Le vocabulaire, les poids IDF et la matrice creuse des documents (normalisée L2) sont
+    stockés en `.npy` et chargés en mémoire mappée ; une requête se résume à un produit
+    matrice creuse–vecteur suivi d’une sélection partielle des meilleurs scores.
+    Args:
+        tconst (np.ndarray): Identifiants des films, dans l’ordre des lignes de la matrice.
+        vocabulary (dict): Vocabulaire terme -> colonne.
+        idf (np.ndarray): Poids IDF par colonne.
+        matrix (scipy.sparse.csr_matrix): Matrice TF-IDF des documents (N × V).
+    """
+
+    def __init__(self, tconst, vocabulary, idf, matrix):
+        self.tconst = tconst
+        self.matrix = matrix
+        self.vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        self.vectorizer.vocabulary_ = vocabulary
+        self.vectorizer.fixed_vocabulary_ = True
+        self.vectorizer.idf_ = idf
+
+    @classmethod
+    def fit(cls, films, search_text=None):
+        """
+        Entraîne le modèle sur le catalogue de films.
+        Args:
+            films (pd.DataFrame): Le DataFrame des films.
+            search_text (pd.Series, optionnel): Texte de recherche déjà construit.
+        Returns:
+            TfidfSearchModel: Le modèle entraîné.
+        """
+        if search_text is None:
+            search_text = build_search_text(films)
+        vectorizer = TfidfVectorizer(**VECTORIZER_PARAMS)
+        matrix = vectorizer.fit_transform(search_text).tocsr().astype(np.float32)
+        return cls(films['tconst'].to_numpy(dtype=str), vectorizer.vocabulary_, vectorizer.idf_, matrix)
+
+    def save(self, path):
+        """
+        Enregistre le modèle dans `path` (matrice CSR en trois fichiers `.npy`, vocabulaire en JSON).
+        """
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, 'data.npy'), self.matrix.data)
+        np.save(os.path.join(tmp_path, 'indices.npy'), self.matrix.indices)
+        np.save(os.path.join(tmp_path, 'indptr.npy'), self.matrix.indptr)
+        np.save(os.path.join(tmp_path, 'idf.npy'), self.vectorizer.idf_)
+        np.save(os.path.join(tmp_path, 'tconst.npy'), self.tconst)
+        with open(os.path.join(tmp_path, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({term: int(column) for term, column in self.vectorizer.vocabulary_.items()}, f)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({'format': MODEL_FORMAT, 'shape': list(self.matrix.shape)}, f)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # Un autre processus a publié le même modèle entre-temps
+            for name in os.listdir(tmp_path):
+                os.remove(os.path.join(tmp_path, name))
+            os.rmdir(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Charge un modèle persisté ; la matrice des documents est lue en mémoire mappée.
+        """
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        with open(os.path.join(path, 'vocabulary.json'), 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        matrix = sp.csr_matrix((
+            np.load(os.path.join(path, 'data.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'indices.npy'), mmap_mode='r'),
+            np.load(os.path.join(path, 'indptr.npy'), mmap_mode='r'),
+        ), shape=tuple(manifest['shape']), copy=False)
+        return cls(np.load(os.path.join(path, 'tconst.npy')), vocabulary,
+                   np.load(os.path.join(path, 'idf.npy')), matrix)
+
+    @classmethod
+    def load_or_fit(cls, films, root=DEFAULT_MODEL_DIR):
+        """
+        Charge le modèle correspondant au catalogue, ou l’entraîne et le persiste s’il n’existe pas encore.
+        Args:
+            films (pd.DataFrame): Le DataFrame des films.
+            root (str): Répertoire racine des modèles persistés.
+        Returns:
+            TfidfSearchModel: Le modèle prêt à être interrogé.
+        """
+        search_text = build_search_text(films)
+        path = os.path.join(root, corpus_fingerprint(films['tconst'].astype(str), search_text))
+        if os.path.exists(os.path.join(path, 'manifest.json')):
+            return cls.load(path)
+        model = cls.fit(films, search_text)
+        os.makedirs(root, exist_ok=True)
+        model.save(path)
+        return model
+
+    def search(self, query, limit=5):
+        """
+        Retourne les films les plus proches de la requête (similarité cosinus).
+        Args:
+            query (str): Texte recherché.
+            limit (int): Nombre de résultats.
+        Returns:
+            np.ndarray: Les `tconst` des films, du plus similaire au moins similaire.
+        """
+        query_vec = self.vectorizer.transform([query]).astype(np.float32)
+        # Les deux côtés sont normalisés L2 : le produit scalaire est la similarité cosinus
+        similarity = (self.matrix @ query_vec.T).toarray().ravel()
+        limit = min(limit, len(similarity))
+        if limit <= 0:
+            return self.tconst[:0]
+        top = np.argpartition(-similarity, limit - 1)[:limit]
+        top = top[np.lexsort((top, -similarity[top]))]
+        return self.tconst[top]
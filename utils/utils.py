@@ -1,11 +1,16 @@
 import pandas as pd
-from sklearn.preprocessing import RobustScaler
-from sklearn.neighbors import NearestNeighbors
 import os
 import streamlit as st
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from utils.recommendation import NUMERIC_FEATURES, RecommendationIndex
+from utils.shared_features import SharedFeatures, publish_features
+from utils.neighbor_table import DEFAULT_TABLE_DIR, NeighborTable
+from utils.ann_index import DEFAULT_ANN_DIR, IVFIndex
+from utils.collaborators import DEFAULT_COLLABORATORS_DIR, CollaboratorTable
+from utils.hot_reload import DataReloader
+from utils.graph_index import FilmPersonGraph
+from utils.facets import FacetIndex
+from utils.compact import exact_float64
 
 # :blue_book: Chargement du fichier CSS
 def load_css(css_file):
@@ -20,11 +25,156 @@ def load_css(css_file):
     else:
         st.error(f"Fichier CSS non trouvé: {css_file}")
 
+# :blue_book: Générations de données rechargées à chaud (voir `utils/hot_reload.py`)
+@st.cache_resource(show_spinner=False)
+def get_data_reloader():
+    """
+    Charge la première génération de données et démarre la surveillance des CSV en arrière-plan
+    (une seule fois par processus). Les structures dérivées sont reconstruites et publiées
+    par le fil de surveillance lorsque les CSV changent.
+    Returns:
+        DataReloader: Le gestionnaire des générations.
+    """
+    return DataReloader().start()
+
+def current_data(pin=False):
+    """
+    Retourne la génération de données servie à la session courante.
+    La génération est épinglée dans `st.session_state` au début de chaque exécution de page
+    (`pin=True`, voir `load_files`) : un rechargement terminé en cours d’exécution ne mélange
+    pas deux générations, la nouvelle est servie à l’exécution suivante.
+    Returns:
+        DataGeneration: La génération épinglée.
+    """
+    generation = get_data_reloader().current
+    try:
+        if pin or '_data_generation' not in st.session_state:
+            st.session_state['_data_generation'] = generation
+        return st.session_state['_data_generation']
+    except Exception:
+        return generation  # Hors d’une session Streamlit (fil d’arrière-plan, script)
+
+# :blue_book: Chargement de l’instantané colonnaire des données
+def load_snapshot_tables():
+    """
+    Retourne l’instantané colonnaire des trois tables (voir `utils/snapshot.py`) dans leur
+    représentation compacte (identifiants codés, catégories, float32, champs multivalués en offsets).
+    L’instantané est compilé à partir des CSV s’il est absent ou périmé, puis lu en mémoire mappée
+    une seule fois par génération et partagé entre toutes les sessions.
+    Returns:
+        CompactCatalog: S’indexe comme un dict {nom de base du fichier: pd.DataFrame}.
+    """
+    return current_data().catalog
+
+def _build_graph_index(data):
+    return FilmPersonGraph(data.catalog['films'], data.catalog['intervenants'], data.catalog['lien'])
+
+def _build_text_index(data):
+    # Index publié (partagé entre processus) s’il correspond à la génération, sinon construction locale
+    index = data.get('shared_features', _publish_shared_features).text_index(data.version)
+    if index is not None:
+        return index
+    from utils.text_index import TextSearchIndex  # Import différé : scikit-learn n’est chargé qu’à la première recherche
+    return TextSearchIndex(data.catalog['films'])
+
+def _build_tfidf_model(data):
+    from utils.tfidf_model import TfidfSearchModel  # Import différé
+    return TfidfSearchModel.load_or_fit(data.catalog['films'])
+
+def _build_title_autocomplete(data):
+    from utils.autocomplete import TitleAutocomplete  # Import différé
+    return TitleAutocomplete(data.catalog['films'])
+
+def _build_facet_index(data):
+    films = data.catalog['films'].sort_values(by='popularity', ascending=False)
+    # Genres en tableaux d’offsets, réordonnés comme les films
+    genres = data.catalog.field('films', 'genres').take(data.catalog['films'].index.get_indexer(films.index))
+    return FacetIndex(films, genres)
+
+def _build_person_index(data):
+    index = data.get('shared_features', _publish_shared_features).person_index(data.version)
+    if index is not None:
+        return index
+    from utils.person_index import PersonSearchIndex  # Import différé
+    return PersonSearchIndex(data.catalog['intervenants'], data.catalog['films'], data.get('graph', _build_graph_index))
+
+def _publish_shared_features(data):
+    try:
+        publish_features(data.catalog['films'], data.catalog.version,
+                         intervenants=data.catalog['intervenants'], lien=data.catalog['lien'])
+    except OSError:
+        pass  # Répertoire de cache non accessible en écriture : calcul local dans chaque processus
+    return SharedFeatures()
+
+# :blue_book: Index graphe films–intervenants (construit une seule fois par génération)
+def get_graph_index(data=None):
+    """
+    Construit l’index graphe films–intervenants à partir de l’instantané partagé.
+    Les positions retournées par l’index correspondent aux lignes des DataFrames
+    renvoyés par `load_files`.
+    Args:
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        FilmPersonGraph: L’index prêt à être interrogé.
+    """
+    return (data or current_data()).get('graph', _build_graph_index)
+
+# :blue_book: Index de recherche des intervenants par nom (construit une seule fois par génération)
+def get_person_index(data=None):
+    """
+    Construit l’index des noms d’intervenants et l’adjacence intervenant → films triée par popularité.
+    Args:
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        PersonSearchIndex: L’index prêt à être interrogé.
+    """
+    return (data or current_data()).get('person_index', _build_person_index)
+
+# :blue_book: Index inversé de recherche plein texte (construit une seule fois par génération)
+def get_text_index():
+    """
+    Construit l’index inversé de recherche sur les champs texte des films à partir de l’instantané partagé.
+    Returns:
+        TextSearchIndex: L’index prêt à être interrogé.
+    """
+    return current_data().get('text_index', _build_text_index)
+
+# :blue_book: Modèle TF-IDF de recherche (entraîné une seule fois, persisté sur disque)
+def get_tfidf_model():
+    """
+    Charge le modèle TF-IDF de secours de `search_movies` depuis le disque,
+    ou l’entraîne et le persiste lors du premier démarrage.
+    Returns:
+        TfidfSearchModel: Le modèle prêt à être interrogé.
+    """
+    return current_data().get('tfidf_model', _build_tfidf_model)
+
+# :blue_book: Moteur d’autocomplétion des titres (construit une seule fois par génération)
+def get_title_autocomplete():
+    """
+    Construit le moteur de suggestions de titres à partir de l’instantané partagé.
+    Returns:
+        TitleAutocomplete: Le moteur prêt à être interrogé.
+    """
+    return current_data().get('title_autocomplete', _build_title_autocomplete)
+
+# :blue_book: Index de facettes de la page d’accueil (construit une seule fois par génération)
+def get_facet_index():
+    """
+    Construit l’index de facettes sur les films triés par popularité décroissante,
+    l’ordre d’affichage de la page d’accueil. Les labels retournés par l’index
+    correspondent à l’index des DataFrames renvoyés par `load_files`.
+    Returns:
+        FacetIndex: L’index prêt à être interrogé.
+    """
+    return current_data().get('facets', _build_facet_index)
+
 # :blue_book: Fonction de chargement des données
 def load_files(files='films'):
     """
-    Charge les fichiers de données depuis des fichiers CSV.
+    Charge les fichiers de données depuis l’instantané colonnaire compilé à partir des fichiers CSV.
     Cette fonction permet de charger un ou plusieurs fichiers CSV contenant des données nécessaires à l’application.
+    Les CSV ne sont analysés qu’une seule fois ; les appels suivants réutilisent l’instantané partagé.
     Elle gère les erreurs si le fichier est introuvable ou si le chemin est incorrect.
     Args:
         files (str ou list):
@@ -38,34 +188,61 @@ def load_files(files='films'):
         FileNotFoundError: Si un ou plusieurs fichiers sont introuvables.
         ValueError: Si l’argument `files` n’est ni une chaîne ni une liste.
     """
-    # Si `files` est une chaîne, tenter de charger un fichier unique
     if isinstance(files, str):
-        try:
-            path = f'csv/{files}_def.csv'
-            return pd.read_csv(path)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Le fichier '{path}' est introuvable. Vérifiez le chemin.")
-        except Exception as e:
-            raise RuntimeError(f"Une erreur inattendue est survenue lors du chargement du fichier '{path}': {e}")
-    # Si `files` est une liste, tenter de charger plusieurs fichiers
+        names = [files]
     elif isinstance(files, list):
-        dataframes = []
-        for file in files:
-            try:
-                path = f'csv/{file}_def.csv'
-                df = pd.read_csv(path)
-                dataframes.append(df)
-            except FileNotFoundError:
-                raise FileNotFoundError(f"Le fichier '{path}' est introuvable. Vérifiez le chemin.")
-            except Exception as e:
-                raise RuntimeError(f"Une erreur inattendue est survenue lors du chargement du fichier '{path}': {e}")
-        return dataframes
+        names = files
     # Si `files` n’est ni une chaîne ni une liste, lever une erreur explicite
     else:
         raise ValueError("L’argument 'files' doit être une chaîne (str) ou une liste de chaînes (list).")
+    try:
+        # Début d’exécution d’une page : épinglage de la génération courante pour toute l’exécution
+        tables = current_data(pin=True).catalog
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Le fichier '{e.filename}' est introuvable. Vérifiez le chemin.")
+    except Exception as e:
+        raise RuntimeError(f"Une erreur inattendue est survenue lors du chargement des données: {e}")
+    dataframes = []
+    for name in names:
+        if name not in tables:
+            raise FileNotFoundError(f"Le fichier 'csv/{name}_def.csv' est introuvable. Vérifiez le chemin.")
+        # Copie superficielle : les colonnes ajoutées par une page ne modifient pas l’instantané partagé
+        dataframes.append(tables[name].copy(deep=False))
+    return dataframes[0] if isinstance(files, str) else dataframes
 
 # :blue_book: Préparation des caractéristiques pour le système de recommandation
-def prepare_features(df):
+def _feature_frame(df):
+    # Colonnes numériques brutes et genres éclatés, communs à l’ajustement et à la transformation
+    X = df.copy()
+    X['year'] = pd.to_datetime(X['release_date']).dt.year  # Extraction de l’année à partir de la date de sortie
+    # Colonnes float32 du catalogue compact ramenées aux valeurs décimales d’origine
+    X['averageRating'] = exact_float64(X['averageRating'])
+    X['popularity'] = exact_float64(X['popularity'])
+    genres_split = X['genres'].str.split(',').apply(lambda x: [genre.strip() for genre in x])
+    return X, genres_split
+
+
+def fit_feature_scaling(df):
+    """
+    Ajuste les paramètres de `prepare_features` sur un catalogue : médiane et écart interquartile
+    des colonnes numériques (RobustScaler) et liste des colonnes de genres.
+    Args:
+        df (pd.DataFrame): Le DataFrame des films.
+    Returns:
+        dict: {"numeric": colonnes, "center": médianes, "scale": écarts interquartiles, "genres": genres}.
+    """
+    X, genres_split = _feature_frame(df)
+    from sklearn.preprocessing import RobustScaler  # Import différé : uniquement au calcul des caractéristiques
+    scaler = RobustScaler().fit(X[NUMERIC_FEATURES])
+    return {
+        'numeric': list(NUMERIC_FEATURES),
+        'center': scaler.center_.tolist(),
+        'scale': scaler.scale_.tolist(),
+        'genres': sorted(genres_split.explode().dropna().unique().tolist()),
+    }
+
+
+def prepare_features(df, scaling=None):
     """
     Prépare les caractéristiques nécessaires au système de recommandation de films.
     Étapes du traitement :
@@ -73,27 +250,130 @@ def prepare_features(df):
     - Encodage des genres de films sous forme de colonnes binaires.
     Args:
         df (pd.DataFrame): Le DataFrame des films d’origine.
+        scaling (dict, optionnel): Paramètres déjà ajustés (voir `fit_feature_scaling`) ; par défaut,
+            ils sont ajustés sur `df`. Réutiliser les mêmes paramètres garde inchangées les lignes
+            des films existants quand le catalogue gagne des films.
     Returns:
         pd.DataFrame: DataFrame contenant les caractéristiques finales prêtes pour l’algorithme de recommandation.
     """
-    X = df.copy()
-    X['year'] = pd.to_datetime(X['release_date']).dt.year  # Extraction de l’année à partir de la date de sortie
-    numeric_features = ['averageRating', 'popularity', 'year']
+    if scaling is None:
+        scaling = fit_feature_scaling(df)
+    X, genres_split = _feature_frame(df)
     # Normalisation des caractéristiques numériques
-    scaler = RobustScaler()
-    X[numeric_features] = scaler.fit_transform(X[numeric_features])
+    X[NUMERIC_FEATURES] = (X[NUMERIC_FEATURES] - np.array(scaling['center'])) / np.array(scaling['scale'])
     # Encodage des genres en colonnes binaires
-    genres_split = X['genres'].str.split(',').apply(lambda x: [genre.strip() for genre in x])
     genres_dummies = pd.get_dummies(genres_split.explode()).groupby(level=0).sum()
+    genres_dummies = genres_dummies.reindex(columns=scaling['genres'], fill_value=0)
     # Concaténation des colonnes numériques et des genres encodés
     final_features = pd.concat([
-        X[numeric_features],
+        X[NUMERIC_FEATURES],
         genres_dummies
     ], axis=1)
     return final_features
 
+# :blue_book: Matrice des caractéristiques partagée entre processus (voir `utils/shared_features.py`)
+def get_shared_features():
+    """
+    Publie la matrice des caractéristiques de la génération courante (une seule fois par hôte,
+    les autres processus réutilisent la génération déjà publiée) et retourne la poignée du processus.
+    Returns:
+        SharedFeatures: Poignée vers la matrice publiée.
+    """
+    return current_data().get('shared_features', _publish_shared_features)
+
+def _build_recommendation_index(data):
+    # Matrice publiée (partagée entre processus) si elle correspond à la génération, sinon calcul local
+    index = data.get('shared_features', _publish_shared_features).index(data.version)
+    return index if index is not None else RecommendationIndex(prepare_features(data.catalog['films']))
+
+# :blue_book: Construction de l’index de recommandation (une seule fois par génération de données)
+def get_recommendation_index(data=None):
+    """
+    Retourne l’index de recommandation des films de la génération.
+    Si la matrice publiée correspond à la génération, elle est mappée en lecture seule depuis
+    le disque et partagée par tous les processus ; sinon l’index est construit localement.
+    L’index est mis en cache par génération : aucune empreinte du DataFrame n’est calculée
+    à chaque exécution de page.
+    Args:
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        RecommendationIndex: L’index prêt à être interrogé.
+    """
+    return (data or current_data()).get('recommendation_index', _build_recommendation_index)
+
+def _manifest_stamp(path):
+    try:
+        return os.stat(os.path.join(path, 'manifest.json')).st_mtime_ns
+    except OSError:
+        return None
+
+def _offline_structure(data, name, path, loader):
+    """
+    Structure calculée hors ligne (table, index) : chargée une fois par génération et par version
+    de son manifeste. Absente, elle n’est pas mise en cache : une structure construite plus tard
+    est prise en compte à l’exécution suivante ; reconstruite, elle est rechargée.
+    """
+    stamp = _manifest_stamp(path)
+    if stamp is None:
+        return None
+    def factory(generation):
+        return _manifest_stamp(path), loader(generation)
+    loaded_stamp, structure = data.get(name, factory)
+    if loaded_stamp != stamp:
+        data.discard(name)
+        loaded_stamp, structure = data.get(name, factory)
+    return structure
+
+# :blue_book: Chargement de la table des voisins précalculés (voir `utils/neighbor_table.py`)
+def load_neighbor_table(genre_weight=10, data=None):
+    """
+    Charge la table des voisins précalculés si elle existe et a été calculée sur la version courante de l’instantané.
+    Args:
+        genre_weight (int): Poids des genres avec lequel la table doit avoir été calculée.
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        NeighborTable ou None: La table, ou None si elle est absente ou périmée.
+    """
+    def loader(generation):
+        table = NeighborTable()
+        return table if table.matches(generation.version, genre_weight) else None
+    return _offline_structure(data or current_data(), f'neighbor_table:{genre_weight}', DEFAULT_TABLE_DIR, loader)
+
+# :blue_book: Chargement de l’index approché des grands catalogues (voir `utils/ann_index.py`)
+def _load_ann_index(data):
+    index = IVFIndex.load()
+    return index if index.matches(data.version) else None
+
+def load_ann_index(data=None):
+    """
+    Charge l’index approché (IVF) s’il a été construit hors ligne sur la version courante de l’instantané.
+    Args:
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        IVFIndex ou None: L’index, ou None s’il est absent ou périmé (recherche exacte).
+    """
+    return _offline_structure(data or current_data(), 'ann_index', DEFAULT_ANN_DIR, _load_ann_index)
+
+# :blue_book: Chargement des collaborateurs fréquents précalculés (voir `utils/collaborators.py`)
+def _load_collaborator_table(data):
+    table = CollaboratorTable.load()
+    return table if table.matches(data.version) else None
+
+def load_collaborator_table(data=None):
+    """
+    Charge les tables de co-occurrence films–intervenants si elles ont été calculées hors ligne
+    pour l’instantané courant.
+    Args:
+        data (DataGeneration, optionnel): Génération de données ; celle de la session par défaut.
+    Returns:
+        CollaboratorTable ou None: Les tables, ou None si elles sont absentes ou périmées.
+    """
+    return _offline_structure(data or current_data(), 'collaborators', DEFAULT_COLLABORATORS_DIR,
+                              _load_collaborator_table)
+
 # :blue_book: Fonction de génération des recommandations de films
-def get_recommendations(title, df, features_df, n_recommendations=5, genre_weight=10):
+def get_recommendations(title, df, features_df, n_recommendations=5, genre_weight=10, neighbor_table=None,
+                        ann_index=None):
     """
     Génère une liste de films recommandés en fonction d’un titre de film donné.
     La recommandation est basée sur la proximité des caractéristiques des films
@@ -101,31 +381,96 @@ def get_recommendations(title, df, features_df, n_recommendations=5, genre_weigh
     Args:
         title (str): Le titre du film de référence.
         df (pd.DataFrame): Le DataFrame contenant les informations des films.
-        features_df (pd.DataFrame): Le DataFrame des caractéristiques du système de recommandation.
+        features_df (pd.DataFrame ou RecommendationIndex): Le DataFrame des caractéristiques du système
+            de recommandation, ou l’index déjà construit par `get_recommendation_index`.
         n_recommendations (int): Nombre de recommandations à générer.
         genre_weight (int): Poids attribué aux genres similaires.
+        neighbor_table (NeighborTable, optionnel): Table des voisins précalculés ; si le film y figure,
+            les recommandations sont une simple lecture de la table.
+        ann_index (IVFIndex, optionnel): Index approché ; utilisé à la place de la recherche exacte
+            pour les grands catalogues.
     Returns:
         pd.DataFrame: DataFrame contenant les informations des films recommandés.
     """
     movie_index = df[df['title'] == title].index[0]
-    genre_columns = [col for col in features_df.columns if col not in ['averageRating', 'popularity', 'year']]
-    # Ajustement du poids des genres similaires
-    weighted_features = features_df.copy()
-    for genre in genre_columns:
-        if features_df.iloc[movie_index][genre] == 1:
-            weighted_features[genre] = weighted_features[genre] * genre_weight
-    # Application du modèle KNN pour identifier les films les plus proches
-    model = NearestNeighbors(n_neighbors=n_recommendations + 1, metric='euclidean')
-    model.fit(weighted_features)
-    distances, indices = model.kneighbors(weighted_features.iloc[movie_index:movie_index+1])
-    return df.iloc[indices[0][1:]]
+    if neighbor_table is not None:
+        positions = neighbor_table.lookup(df.iloc[movie_index]['tconst'], n_recommendations)
+        if positions is not None:
+            return df.iloc[positions]
+    if ann_index is not None:
+        index = ann_index
+    elif isinstance(features_df, RecommendationIndex):
+        index = features_df
+    else:
+        index = RecommendationIndex(features_df)
+    # Recherche des plus proches voisins avec pondération des genres du film de référence ;
+    # le film lui-même est retiré par valeur (l’index approché ne le retourne pas toujours en premier)
+    distances, indices = index.kneighbors(movie_index, n_recommendations + 1, genre_weight)
+    return df.iloc[indices[indices != movie_index][:n_recommendations]]
+
+# :blue_book: Recommandations à partir d’un profil de goût (plusieurs films appréciés)
+def profile_weights(profiles, df):
+    """
+    Construit la matrice des poids des profils de goût.
+    Args:
+        profiles (list): Profils ; chacun est une liste de `tconst` (poids 1) ou un dict {tconst: poids}.
+        df (pd.DataFrame): Le DataFrame contenant les informations des films.
+    Returns:
+        np.ndarray: Matrice float32 P x N des poids par film ; les `tconst` inconnus sont ignorés.
+    """
+    positions = pd.Index(df['tconst'].astype(str))
+    weights = np.zeros((len(profiles), len(df)), dtype=np.float32)
+    for row, profile in enumerate(profiles):
+        if not isinstance(profile, dict):
+            profile = dict.fromkeys(profile, 1.0)
+        columns = positions.get_indexer(list(profile))
+        known = columns >= 0
+        np.add.at(weights[row], columns[known], np.asarray(list(profile.values()), dtype=np.float32)[known])
+    return weights
+
+def get_profiles_recommendations(profiles, df, features_df, n_recommendations=5, genre_weight=10):
+    """
+    Génère les recommandations de plusieurs profils de goût en une seule opération matricielle
+    (ex. précalcul des rangées de la page d’accueil pour de nombreux utilisateurs).
+    Les films identifiés par `tconst` (sans ambiguïté entre titres homonymes) et les films
+    de chaque profil sont exclus de ses recommandations.
+    Args:
+        profiles (list): Profils ; chacun est une liste de `tconst` (poids 1) ou un dict {tconst: poids}.
+        df (pd.DataFrame): Le DataFrame contenant les informations des films.
+        features_df (pd.DataFrame ou RecommendationIndex): Les caractéristiques de `prepare_features`,
+            ou l’index déjà construit par `get_recommendation_index`.
+        n_recommendations (int): Nombre de recommandations par profil.
+        genre_weight (int): Poids attribué aux genres du profil.
+    Returns:
+        list: Un DataFrame de films recommandés par profil (vide si aucun film du profil n’est connu).
+    """
+    index = features_df if isinstance(features_df, RecommendationIndex) else RecommendationIndex(features_df)
+    weights = profile_weights(profiles, df)
+    distances, indices = index.kneighbors_profiles(weights, n_recommendations, genre_weight)
+    empty = weights.sum(axis=1) <= 0
+    return [df.iloc[row_indices[np.isfinite(row_distances)]] if not is_empty else df.iloc[[]]
+            for row_distances, row_indices, is_empty in zip(distances, indices, empty)]
+
+def get_profile_recommendations(liked, df, features_df, n_recommendations=5, genre_weight=10):
+    """
+    Génère des recommandations à partir de plusieurs films appréciés par un utilisateur.
+    Args:
+        liked (list ou dict): Liste de `tconst` (poids 1) ou dict {tconst: poids}.
+        df (pd.DataFrame): Le DataFrame contenant les informations des films.
+        features_df (pd.DataFrame ou RecommendationIndex): Voir `get_profiles_recommendations`.
+        n_recommendations (int): Nombre de recommandations à générer.
+        genre_weight (int): Poids attribué aux genres du profil.
+    Returns:
+        pd.DataFrame: DataFrame contenant les informations des films recommandés.
+    """
+    return get_profiles_recommendations([liked], df, features_df, n_recommendations, genre_weight)[0]
 
 
 
 def format_movie_info(movie):
     try:
         return f"""### 🎬 {movie['title']}
-**⭐ Note:** {movie['averageRating']}/10
+**⭐ Note:** {movie['averageRating']:.1f}/10
 **📅 Année:** {movie['release_date'][:4] if pd.notna(movie['release_date']) else 'Non disponible'}
 **🎭 Genre:** {movie['genres'] if pd.notna(movie['genres']) else 'Non spécifié'}
 
@@ -136,51 +481,58 @@ def format_movie_info(movie):
         st.error(f"Erreur dans format_movie_info: {e}")
         return "Information non disponible"
 
-def search_movies(query, films_df, intervenants_df, lien_df, n_recommendations=5):
+def rows_by_tconst(films_df, tconsts):
+    """
+    Retourne les lignes de `films_df` correspondant aux `tconst` donnés, dans l’ordre de `tconsts`.
+    """
+    rows = films_df[films_df['tconst'].isin(tconsts)]
+    return rows.iloc[pd.Index(pd.unique(np.asarray(tconsts))).get_indexer(rows['tconst']).argsort(kind='stable')]
+
+def search_movies(query, films_df, intervenants_df, lien_df, n_recommendations=5, graph=None, text_index=None,
+                  tfidf_model=None, person_index=None):
     try:
         # Поиск по актёрам
-        actor_matches = intervenants_df[intervenants_df['primaryName'].str.contains(query, case=False, na=False)]
-        if not actor_matches.empty:
-            actor_nconst = actor_matches.iloc[0]['nconst']
-            actor_movies = lien_df[lien_df['nconst'] == actor_nconst]
-            return films_df[films_df['tconst'].isin(actor_movies['tconst'])].head(n_recommendations)
+        if person_index is not None:
+            # Индекс имён: префиксы слов без учёта акцентов и регистра, люди и фильмы по популярности
+            people, film_rows = person_index.search_films(query, limit=n_recommendations)
+            if len(people):
+                return rows_by_tconst(films_df, person_index.film_tconst[film_rows])
+        else:
+            actor_matches = intervenants_df[intervenants_df['primaryName'].str.contains(query, case=False, na=False)]
+            if not actor_matches.empty:
+                actor_nconst = actor_matches.iloc[0]['nconst']
+                if graph is not None:
+                    # Фильмография через индекс графа: O(степень) вместо полного прохода по lien
+                    actor_tconsts = graph.film_tconsts(graph.films_of(actor_nconst))
+                else:
+                    actor_tconsts = lien_df.loc[lien_df['nconst'] == actor_nconst, 'tconst']
+                return films_df[films_df['tconst'].isin(actor_tconsts)].head(n_recommendations)
         
         # Поиск по всем критериям
-        mask = (
-            films_df['title'].str.contains(query, case=False, na=False) |
-            films_df['overview'].str.contains(query, case=False, na=False) |
-            films_df['genres'].str.contains(query, case=False, na=False) |
-            films_df['keywords'].str.contains(query, case=False, na=False) |
-            films_df['tagline'].str.contains(query, case=False, na=False) |
-            films_df['origin_country'].str.contains(query, case=False, na=False)
-        )
-        
-        direct_matches = films_df[mask]
+        if text_index is not None:
+            # Инвертированный индекс: ранжированные совпадения без полного прохода по таблице
+            direct_matches = rows_by_tconst(films_df, text_index.search(query, limit=n_recommendations))
+        else:
+            mask = (
+                films_df['title'].str.contains(query, case=False, na=False) |
+                films_df['overview'].str.contains(query, case=False, na=False) |
+                films_df['genres'].str.contains(query, case=False, na=False) |
+                films_df['keywords'].str.contains(query, case=False, na=False) |
+                films_df['tagline'].str.contains(query, case=False, na=False) |
+                films_df['origin_country'].str.contains(query, case=False, na=False)
+            )
+            direct_matches = films_df[mask]
         if not direct_matches.empty:
             return direct_matches.head(n_recommendations)
             
-        # Поиск по TF-IDF если прямых совпадений нет
-        films_df['search_text'] = (
-            films_df['title'].fillna('') + ' ' +
-            films_df['overview'].fillna('') * 3 + ' ' +
-            films_df['keywords'].fillna('') + ' ' +
-            films_df['genres'].fillna('') + ' ' +
-            films_df['tagline'].fillna('') + ' ' +
-            films_df['origin_country'].fillna('')
-        )
-        
-        tfidf = TfidfVectorizer(
-            stop_words='english',
-            max_features=5000,
-            ngram_range=(1, 2)
-        )
-        
-        tfidf_matrix = tfidf.fit_transform(films_df['search_text'])
-        query_vec = tfidf.transform([query])
-        similarity = cosine_similarity(query_vec, tfidf_matrix)
-        top_indices = similarity[0].argsort()[-n_recommendations:][::-1]
-        
-        return films_df.iloc[top_indices]
+        # Поиск по TF-IDF если прямых совпадений нет (модель обучается один раз, films_df не изменяется)
+        if tfidf_model is None:
+            from utils.tfidf_model import TfidfSearchModel  # Import différé
+            tfidf_model = TfidfSearchModel.fit(films_df)
+        elif callable(tfidf_model):
+            # Chargeur paresseux (ex. `get_tfidf_model`) : le modèle n’est chargé que s’il sert
+            tfidf_model = tfidf_model()
+        return rows_by_tconst(films_df, tfidf_model.search(query, limit=n_recommendations))
         
     except Exception as e:
         st.error(f"Erreur dans search_movies: {str(e)}")